@@ -10,13 +10,19 @@ from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
 from channels.security.websocket import AllowedHostsOriginValidator
 import competencias.routing
+import users.routing
+from .middleware import TokenAuthMiddleware
 
 application = ProtocolTypeRouter({
     "http": get_asgi_application(),
     "websocket": AllowedHostsOriginValidator(
         AuthMiddlewareStack(
-            URLRouter(
-                competencias.routing.websocket_urlpatterns
+            # JWT (cookie de acceso o ?token=) para el canal de notificaciones
+            TokenAuthMiddleware(
+                URLRouter(
+                    competencias.routing.websocket_urlpatterns
+                    + users.routing.websocket_urlpatterns
+                )
             )
         )
     ),
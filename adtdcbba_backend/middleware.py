@@ -1,42 +1,53 @@
 # adtdcbba_backend/middleware.py
-import jwt
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qs
+
 from django.conf import settings
-from django.contrib.auth.models import User, AnonymousUser
+from django.contrib.auth.models import AnonymousUser
 from channels.db import database_sync_to_async
 from channels.middleware import BaseMiddleware
-from urllib.parse import parse_qs
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+from users.authentication import CustomJWTAuthentication
 
 @database_sync_to_async
 def get_user(token_key):
     """
-    Obtiene el usuario de la base de datos de forma asíncrona
-    basado en el token JWT.
+    Obtiene el usuario de forma asíncrona basado en el token JWT.
+    Usa la misma validación (y la misma caché de usuarios) que la API REST.
     """
+    auth = CustomJWTAuthentication()
     try:
-        # Decodifica el token (simplejwt usa la SECRET_KEY)
-        payload = jwt.decode(token_key, settings.SECRET_KEY, algorithms=["HS256"])
-        user = User.objects.get(id=payload['user_id'])
-        return user
-    except (jwt.ExpiredSignatureError, jwt.exceptions.DecodeError, User.DoesNotExist):
+        return auth.get_user(auth.get_validated_token(token_key))
+    except (InvalidToken, AuthenticationFailed):
         # Si el token es inválido o el usuario no existe, devuelve Anónimo.
         return AnonymousUser()
 
 class TokenAuthMiddleware(BaseMiddleware):
     """
-    Middleware de autenticación de Django Channels que lee un token
-    desde los query parameters de la URL.
+    Middleware de autenticación de Django Channels que lee el token JWT
+    desde los query parameters (?token=...) o desde la cookie de acceso
+    que deja el login (la que usa el navegador).
     """
     async def __call__(self, scope, receive, send):
-        # Busca el token en la URL (ej: ws://.../?token=...)
-        query_string = scope.get('query_string', b'').decode('utf-8')
-        query_params = parse_qs(query_string)
-        token = query_params.get('token', [None])[0]
+        query_params = parse_qs(scope.get('query_string', b'').decode('utf-8'))
+        token = query_params.get('token', [None])[0] or self._token_de_cookie(scope)
 
         if token:
             # Si hay token, obtiene el usuario y lo guarda en el 'scope'
-            scope['user'] = await get_user(token)
-        else:
-            scope['user'] = AnonymousUser()
+            scope = dict(scope, user=await get_user(token))
+        elif 'user' not in scope:
+            scope = dict(scope, user=AnonymousUser())
 
         # Continúa con la conexión
-        return await super().__call__(scope, receive, send)
\ No newline at end of file
+        return await super().__call__(scope, receive, send)
+
+    @staticmethod
+    def _token_de_cookie(scope):
+        for nombre, valor in scope.get('headers', []):
+            if nombre == b'cookie':
+                cookie = SimpleCookie(valor.decode('latin1'))
+                morsel = cookie.get(settings.AUTH_COOKIE)
+                return morsel.value if morsel else None
+        return None
@@ -29,6 +29,7 @@ DJANGO_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres', # Lookups de trigramas (búsqueda de deportistas)
 ]
 
 THIRD_PARTY_APPS = [
@@ -145,6 +146,8 @@ AUTH_COOKIE_SECURE = env.bool('AUTH_COOKIE_SECURE', default=False) # True en Pro
 AUTH_COOKIE_HTTP_ONLY = True
 AUTH_COOKIE_PATH = '/'
 AUTH_COOKIE_SAMESITE = 'Lax' # 'Lax' es necesario para que funcione la navegación normal
+# Segundos que CustomJWTAuthentication reutiliza el usuario cacheado (0 = siempre a la BD)
+AUTH_USER_CACHE_TTL = env.int('AUTH_USER_CACHE_TTL', default=120)
 
 # --- CHANNELS (REDIS) ---
 if env('REDIS_HOST', default=None):
@@ -156,6 +159,15 @@ if env('REDIS_HOST', default=None):
             },
         },
     }
+    # Leaderboard en vivo (sorted sets) en la misma instancia de Redis, base 1
+    LEADERBOARD_REDIS_URL = f"redis://{env('REDIS_HOST')}:6379/1"
+    # Caché compartida entre procesos (usuarios autenticados, etc.), base 2
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": f"redis://{env('REDIS_HOST')}:6379/2",
+        }
+    }
 else:
     # Fallback a memoria para desarrollo sin docker (aunque no recomendado para WS)
     CHANNEL_LAYERS = {
@@ -163,6 +175,32 @@ else:
             "BACKEND": "channels.layers.InMemoryChannelLayer"
         }
     }
+    # Sin Redis el leaderboard vive en memoria del proceso
+    LEADERBOARD_REDIS_URL = None
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Ventana (ms) en la que se agrupan los puntajes antes de difundirlos por WebSocket.
+# 0 = envío inmediato, sin agrupar.
+SCORE_BROADCAST_TICK_MS = env.int('SCORE_BROADCAST_TICK_MS', default=250)
+# Frames recientes que se conservan para reenviar a clientes que se reconectan (?since=<seq>)
+SCORE_DELTA_BUFFER = env.int('SCORE_DELTA_BUFFER', default=256)
+# Máximo de entradas por categoría en el snapshot inicial del marcador
+SCORE_SNAPSHOT_TOP = env.int('SCORE_SNAPSHOT_TOP', default=500)
+
+# Vida de las claves del leaderboard; al expirar se reconstruye desde la base de datos
+LEADERBOARD_TTL = env.int('LEADERBOARD_TTL', default=60 * 60 * 48)
+
+# Hilos que generan PDFs en segundo plano (competencias/trabajos.py).
+# 0 = se generan al confirmar la transacción, en el mismo hilo (desarrollo/tests).
+PDF_WORKERS = env.int('PDF_WORKERS', default=2)
+# Días que se conservan los PDFs cacheados en MEDIA_ROOT/pdf_cache (procesar_trabajos_pdf --purgar)
+PDF_CACHE_DIAS = env.int('PDF_CACHE_DIAS', default=30)
+# Memoria (MB) de la caché LRU de firmas y fotos ya decodificadas (competencias/imagenes.py)
+PDF_IMAGE_CACHE_MB = env.int('PDF_IMAGE_CACHE_MB', default=32)
 
 # --- CORS & CSRF ---
 # Permitimos credenciales (Cookies)
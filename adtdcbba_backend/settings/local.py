@@ -31,5 +31,12 @@ CHANNEL_LAYERS = {
         },
     },
 }
+LEADERBOARD_REDIS_URL = "redis://127.0.0.1:6380/1"
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": "redis://127.0.0.1:6380/2",
+    }
+}
 
 print("🔧 CARGADA CONFIGURACIÓN: LOCAL (DOCKER PORTS 5433/6380)")
\ No newline at end of file
@@ -40,5 +40,12 @@ CHANNEL_LAYERS = {
         },
     },
 }
+LEADERBOARD_REDIS_URL = f"redis://{env('REDIS_HOST')}:6379/1"
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": f"redis://{env('REDIS_HOST')}:6379/2",
+    }
+}
 
 print("🛡️ CARGADA CONFIGURACIÓN: PRODUCCIÓN (Docker Ready)")
\ No newline at end of file
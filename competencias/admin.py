@@ -2,7 +2,8 @@ from django.contrib import admin
 from .models import (
     Poligono, Juez, Modalidad, Categoria, Competencia, 
     CategoriaCompetencia, Inscripcion, Participacion, 
-    Resultado, Gasto, Record, AutoridadFirma
+    Resultado, Gasto, Record, AutoridadFirma, ResumenFinancieroMensual,
+    TrabajoPDF
 )
 
 # --- INLINES ---
@@ -106,4 +107,24 @@ class RecordAdmin(admin.ModelAdmin):
 
 @admin.register(AutoridadFirma)
 class AutoridadFirmaAdmin(admin.ModelAdmin):
-    list_display = ('nombre', 'cargo', 'activo')
\ No newline at end of file
+    list_display = ('nombre', 'cargo', 'activo')
+
+@admin.register(ResumenFinancieroMensual)
+class ResumenFinancieroMensualAdmin(admin.ModelAdmin):
+    # Solo lectura: lo mantiene finanzas.py
+    list_display = ('mes', 'competencia', 'poligono', 'inscripciones', 'ingresos', 'gastos')
+    list_filter = ('poligono',)
+    date_hierarchy = 'mes'
+    list_select_related = ('competencia', 'poligono')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(TrabajoPDF)
+class TrabajoPDFAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tipo', 'estado', 'intentos', 'creado_en', 'terminado_en')
+    list_filter = ('estado', 'tipo')
+    readonly_fields = [f.name for f in TrabajoPDF._meta.fields]
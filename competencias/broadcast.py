@@ -0,0 +1,249 @@
+"""
+Difusión agrupada de puntajes por WebSocket.
+
+En lugar de un mensaje por envío, los puntajes de cada competencia se acumulan
+durante una ventana (settings.SCORE_BROADCAST_TICK_MS, 250 ms por defecto),
+se deduplican por id de resultado y se emiten como un único frame 'score_batch'.
+El frame se codifica una sola vez por grupo; los consumers lo reenvían tal cual.
+
+Cada frame lleva un número de secuencia monótono por competencia y se guarda en
+un buffer circular (settings.SCORE_DELTA_BUFFER frames) para que un cliente que
+se reconecta con ?since=<seq> reciba solo lo que se perdió.
+
+Los clientes que negocian el subprotocolo 'adt.msgpack' (o ?format=msgpack)
+reciben frames binarios msgpack con claves cortas (ver CODIGOS_CORTOS).
+"""
+import abc
+import json
+import logging
+import threading
+import msgpack
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class DeltaLog(abc.ABC):
+    """Secuencia y buffer circular de frames por competencia."""
+
+    @abc.abstractmethod
+    def registrar(self, competencia_id: int, datos: List[Dict[str, Any]]) -> int:
+        """Asigna el siguiente número de secuencia al lote y lo guarda en el buffer."""
+
+    @abc.abstractmethod
+    def desde(self, competencia_id: int, since: int) -> Tuple[int, Optional[List[Tuple[int, List[Dict[str, Any]]]]]]:
+        """
+        Devuelve (secuencia_actual, deltas con seq > since).
+        Los deltas son None si el hueco es mayor que el buffer (hay que enviar un snapshot).
+        """
+
+    @staticmethod
+    def _filtrar(actual, items, since):
+        if since == actual:
+            return actual, []
+        # since > actual: la secuencia se reinició (proceso nuevo o clave de Redis
+        # expirada); el cliente descartaría todo lo nuevo, necesita un snapshot
+        if since > actual:
+            return actual, None
+        if not items or items[0][0] > since + 1:
+            return actual, None
+        return actual, [(seq, datos) for seq, datos in items if seq > since]
+
+
+class MemoriaDeltaLog(DeltaLog):
+    """Backend en memoria del proceso (desarrollo y tests)."""
+
+    def __init__(self, capacidad: int):
+        self.capacidad = capacidad
+        self._lock = threading.Lock()
+        self._secuencias: Dict[int, int] = {}
+        self._buffers: Dict[int, deque] = {}
+
+    def registrar(self, competencia_id, datos):
+        with self._lock:
+            seq = self._secuencias.get(competencia_id, 0) + 1
+            self._secuencias[competencia_id] = seq
+            self._buffers.setdefault(competencia_id, deque(maxlen=self.capacidad)).append((seq, datos))
+            return seq
+
+    def desde(self, competencia_id, since):
+        with self._lock:
+            actual = self._secuencias.get(competencia_id, 0)
+            items = list(self._buffers.get(competencia_id, ()))
+        return self._filtrar(actual, items, since)
+
+
+class RedisDeltaLog(DeltaLog):
+    """Backend en Redis, compartido por todos los procesos daphne."""
+
+    # INCR + RPUSH + LTRIM atómicos para que el orden del buffer siga a la secuencia
+    _REGISTRAR = """
+        local seq = redis.call('INCR', KEYS[1])
+        redis.call('RPUSH', KEYS[2], seq .. '|' .. ARGV[1])
+        redis.call('LTRIM', KEYS[2], -tonumber(ARGV[2]), -1)
+        redis.call('EXPIRE', KEYS[1], ARGV[3])
+        redis.call('EXPIRE', KEYS[2], ARGV[3])
+        return seq
+    """
+
+    def __init__(self, url: str, capacidad: int, ttl: int):
+        import redis
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+        self.capacidad = capacidad
+        self.ttl = ttl
+        self._script = self.redis.register_script(self._REGISTRAR)
+
+    @staticmethod
+    def _claves(competencia_id):
+        return [f"competencia_{competencia_id}:seq", f"competencia_{competencia_id}:deltas"]
+
+    def registrar(self, competencia_id, datos):
+        return int(self._script(
+            keys=self._claves(competencia_id),
+            args=[json.dumps(datos), self.capacidad, self.ttl]
+        ))
+
+    def desde(self, competencia_id, since):
+        clave_seq, clave_deltas = self._claves(competencia_id)
+        pipe = self.redis.pipeline()
+        pipe.get(clave_seq)
+        pipe.lrange(clave_deltas, 0, -1)
+        actual, crudos = pipe.execute()
+        items = []
+        for crudo in crudos:
+            seq, _, datos = crudo.partition('|')
+            items.append((int(seq), json.loads(datos)))
+        return self._filtrar(int(actual or 0), items, since)
+
+
+class ScoreBroadcaster:
+    """Buffer por competencia con un temporizador por ventana (tick)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pendientes: Dict[int, Dict[Any, Dict[str, Any]]] = {}
+        self._timers: Dict[int, threading.Timer] = {}
+
+    @staticmethod
+    def _tick() -> float:
+        return getattr(settings, 'SCORE_BROADCAST_TICK_MS', 250) / 1000.0
+
+    def publicar(self, competencia_id: int, datos: Iterable[Dict[str, Any]]) -> None:
+        """Encola puntajes para la próxima ventana (o los emite ya si el tick es 0)."""
+        tick = self._tick()
+        if tick <= 0:
+            self._emitir(competencia_id, list(self._deduplicar({}, datos).values()))
+            return
+
+        with self._lock:
+            buffer = self._pendientes.setdefault(competencia_id, {})
+            self._deduplicar(buffer, datos)
+            if competencia_id not in self._timers:
+                timer = threading.Timer(tick, self.vaciar, args=(competencia_id,))
+                timer.daemon = True
+                self._timers[competencia_id] = timer
+                timer.start()
+
+    def vaciar(self, competencia_id: int) -> None:
+        """Emite lo acumulado para una competencia (lo llama el temporizador)."""
+        with self._lock:
+            buffer = self._pendientes.pop(competencia_id, {})
+            timer = self._timers.pop(competencia_id, None)
+        if timer is not None:
+            timer.cancel()
+        if buffer:
+            self._emitir(competencia_id, list(buffer.values()))
+
+    @staticmethod
+    def _deduplicar(buffer: Dict[Any, Dict[str, Any]], datos: Iterable[Dict[str, Any]]) -> Dict[Any, Dict[str, Any]]:
+        for item in datos:
+            anterior = buffer.get(item['id'])
+            if anterior is not None and not anterior.get('is_update', True):
+                # Si en la ventana el resultado fue creado, sigue siendo "nuevo" para el cliente
+                item = dict(item, is_update=False)
+            buffer[item['id']] = item
+        return buffer
+
+    @staticmethod
+    def _emitir(competencia_id: int, datos: List[Dict[str, Any]]) -> None:
+        if not datos:
+            return
+        try:
+            seq = get_delta_log().registrar(competencia_id, datos)
+            # Ambas codificaciones se generan una sola vez por grupo
+            async_to_sync(get_channel_layer().group_send)(
+                f"competencia_{competencia_id}",
+                {"type": "score.batch", "text": frame_lote(seq, datos), "bytes": frame_lote(seq, datos, binario=True)}
+            )
+        except Exception:
+            # Corre post-commit o en el hilo del temporizador: los puntajes ya quedaron
+            # guardados y los clientes se ponen al día con el próximo snapshot
+            logger.warning("No se pudo difundir el lote de la competencia %s", competencia_id, exc_info=True)
+
+
+# --- CODIFICACIÓN DE FRAMES ---
+
+SUBPROTOCOLO_MSGPACK = 'adt.msgpack'
+
+# Claves cortas para los frames binarios
+CODIGOS_CORTOS = {
+    'type': 't', 'seq': 's', 'payload': 'p',
+    'id': 'i', 'deportista': 'd', 'deportista_id': 'di', 'club': 'c',
+    'puntaje_total': 'pt', 'x_count': 'x', 'is_update': 'u',
+    'categoria_id': 'k', 'categoria_nombre': 'kn', 'posicion': 'n',
+    'total': 'tt', 'resultados': 'r',
+}
+
+TIPOS_CORTOS = {'score_batch': 'b', 'snapshot': 's'}
+
+
+def _compactar(valor: Any) -> Any:
+    if isinstance(valor, dict):
+        return {CODIGOS_CORTOS.get(k, k): _compactar(v) for k, v in valor.items()}
+    if isinstance(valor, list):
+        return [_compactar(v) for v in valor]
+    return valor
+
+
+def codificar_frame(tipo: str, seq: int, payload: Any, binario: bool = False):
+    """Frame JSON (str) o msgpack con claves cortas (bytes)."""
+    if binario:
+        return msgpack.packb({'t': TIPOS_CORTOS[tipo], 's': seq, 'p': _compactar(payload)})
+    return json.dumps({'type': tipo, 'seq': seq, 'payload': payload})
+
+
+def frame_lote(seq: int, datos: List[Dict[str, Any]], binario: bool = False):
+    return codificar_frame('score_batch', seq, datos, binario)
+
+
+def frame_snapshot(seq: int, categorias: List[Dict[str, Any]], binario: bool = False):
+    return codificar_frame('snapshot', seq, categorias, binario)
+
+
+_broadcaster = ScoreBroadcaster()
+_delta_log = None
+_delta_log_lock = threading.Lock()
+
+
+def get_broadcaster() -> ScoreBroadcaster:
+    return _broadcaster
+
+
+def get_delta_log() -> DeltaLog:
+    """Backend configurado en settings (comparte Redis con el leaderboard si existe)."""
+    global _delta_log
+    if _delta_log is None:
+        with _delta_log_lock:
+            if _delta_log is None:
+                capacidad = getattr(settings, 'SCORE_DELTA_BUFFER', 256)
+                url = getattr(settings, 'LEADERBOARD_REDIS_URL', None)
+                if url:
+                    _delta_log = RedisDeltaLog(url, capacidad, getattr(settings, 'LEADERBOARD_TTL', 60 * 60 * 48))
+                else:
+                    _delta_log = MemoriaDeltaLog(capacidad)
+    return _delta_log
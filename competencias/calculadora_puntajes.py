@@ -1,5 +1,5 @@
 from decimal import Decimal, InvalidOperation
-from typing import List, Dict, Any, TypedDict
+from typing import List, Dict, Any, Sequence, Tuple, TypedDict
 import logging
 
 logger = logging.getLogger(__name__)
@@ -16,6 +16,13 @@ class SerieDict(TypedDict, total=False):
     puntaje: Any
     es_x: bool
 
+# Límite de dígitos del contexto Decimal por defecto: por encima el cálculo
+# escalar redondea, así que el lote delega en él para mantener resultados idénticos.
+_MAX_MANTISA = 10 ** 28
+
+class _FueraDePuntoFijo(Exception):
+    """Valor que no admite representación en punto fijo (NaN, Infinito, desborde)."""
+
 class CalculadoraPuntajes:
     """
     Motor de dominio para cálculos de precisión de alta fidelidad.
@@ -37,6 +44,18 @@ class CalculadoraPuntajes:
         'impactos_2': Decimal('2')
     }
 
+    # Claves por estrategia (conjuntos para detección rápida)
+    _CLAVES_SILUETAS = frozenset(FACTOR_SILUETAS)
+    _CLAVES_FBI = frozenset(FACTOR_FBI)
+
+    # Factores en punto fijo: (clave, mantisa, exponente) -> 1.5 == (15, -1)
+    _FIJO_SILUETAS = tuple(
+        (k, int(f.scaleb(-f.as_tuple().exponent)), f.as_tuple().exponent) for k, f in FACTOR_SILUETAS.items()
+    )
+    _FIJO_FBI = tuple(
+        (k, int(f.scaleb(-f.as_tuple().exponent)), f.as_tuple().exponent) for k, f in FACTOR_FBI.items()
+    )
+
     @staticmethod
     def _to_decimal(valor: Any) -> Decimal:
         """Convierte inputs a Decimal de forma segura."""
@@ -48,6 +67,92 @@ class CalculadoraPuntajes:
             logger.error(f"Error de conversión Decimal con valor: {valor}")
             return Decimal('0.0')
 
+    @classmethod
+    def _to_fijo(cls, valor: Any) -> Tuple[int, int]:
+        """
+        Convierte un input a punto fijo (mantisa, exponente), equivalente a _to_decimal.
+        Los enteros (caso habitual: conteo de impactos) no pasan por Decimal.
+        """
+        if type(valor) is int:
+            return valor, 0
+        if valor is None:
+            return 0, -1
+        dec = cls._to_decimal(valor)
+        if not dec.is_finite():
+            raise _FueraDePuntoFijo(valor)
+        exponente = dec.as_tuple().exponent
+        return int(dec.scaleb(-exponente)), exponente
+
+    @classmethod
+    def calcular_totales_lote(cls, lote: Sequence[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """
+        Calcula los totales de muchos deportistas en una sola pasada.
+
+        Recibe una secuencia con las series de cada deportista y devuelve, en el
+        mismo orden, lo mismo que calcular_total_competencia. Internamente aplana
+        todos los campos a columnas de enteros en punto fijo (mantisa, exponente,
+        índice de deportista) y acumula sin crear objetos Decimal intermedios.
+        """
+        n = len(lote)
+        mantisas: List[int] = []
+        exponentes: List[int] = []
+        indices: List[int] = []
+        totales_x = [0] * n
+        delegados = set()
+
+        # 1. Aplanado a columnas de punto fijo
+        for idx, series in enumerate(lote):
+            try:
+                for serie in series:
+                    if not cls._CLAVES_SILUETAS.isdisjoint(serie):
+                        factores = cls._FIJO_SILUETAS
+                    elif not cls._CLAVES_FBI.isdisjoint(serie):
+                        factores = cls._FIJO_FBI
+                    else:
+                        factores = None
+
+                    if factores is None:
+                        raw_score = serie.get('puntaje', serie.get('puntaje_total_ronda', 0))
+                        m, e = cls._to_fijo(raw_score)
+                        mantisas.append(m)
+                        exponentes.append(e)
+                        indices.append(idx)
+                    else:
+                        for key, m_factor, e_factor in factores:
+                            m, e = cls._to_fijo(serie.get(key))
+                            mantisas.append(m * m_factor)
+                            exponentes.append(e + e_factor)
+                            indices.append(idx)
+
+                    if serie.get('es_x', False):
+                        totales_x[idx] += 1
+            except _FueraDePuntoFijo:
+                delegados.add(idx)
+
+        # 2. Exponente común por deportista (Decimal conserva el menor; el acumulador parte de 0.0)
+        exp_min = [-1] * n
+        for e, idx in zip(exponentes, indices):
+            if e < exp_min[idx]:
+                exp_min[idx] = e
+
+        # 3. Suma entera alineada al exponente común
+        acumulado = [0] * n
+        for m, e, idx in zip(mantisas, exponentes, indices):
+            acumulado[idx] += m * 10 ** (e - exp_min[idx])
+
+        resultados = []
+        for idx in range(n):
+            if idx in delegados or abs(acumulado[idx]) >= _MAX_MANTISA:
+                resultados.append(cls.calcular_total_competencia(lote[idx]))
+                continue
+            total_puntos = Decimal(acumulado[idx]).scaleb(exp_min[idx])
+            resultados.append({
+                'total_puntos': total_puntos,
+                'total_x': totales_x[idx],
+                'detalle_precision': str(total_puntos)
+            })
+        return resultados
+
     @classmethod
     def calcular_total_competencia(cls, series: List[Dict[str, Any]]) -> Dict[str, Any]:
         total_puntos = Decimal('0.0')
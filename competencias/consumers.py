@@ -1,5 +1,10 @@
 import json
+from urllib.parse import parse_qs
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
+
+from .broadcast import SUBPROTOCOLO_MSGPACK, frame_lote, frame_snapshot, get_delta_log
 
 class CompetenciaConsumer(AsyncWebsocketConsumer):
     async def connect(self):
@@ -13,9 +18,20 @@ class CompetenciaConsumer(AsyncWebsocketConsumer):
             self.channel_name
         )
 
-        await self.accept()
+        # Formato de los frames: msgpack binario si el cliente lo negocia
+        # (subprotocolo 'adt.msgpack' o ?format=msgpack), JSON en otro caso.
+        query = parse_qs(self.scope.get('query_string', b'').decode('utf-8'))
+        subprotocolos = self.scope.get('subprotocols') or []
+        self.binario = SUBPROTOCOLO_MSGPACK in subprotocolos or query.get('format', [''])[0] == 'msgpack'
+
+        await self.accept(subprotocol=SUBPROTOCOLO_MSGPACK if SUBPROTOCOLO_MSGPACK in subprotocolos else None)
         print(f"🔌 WebSocket Conectado: {self.room_group_name}")
 
+        # Estado inicial: deltas perdidos desde ?since=<seq> o un snapshot compacto.
+        # Se lee después de unirse al grupo, así no queda ningún hueco; el cliente
+        # descarta por 'seq' lo que pudiera llegarle repetido.
+        await self.enviar_estado_inicial()
+
     async def disconnect(self, close_code):
         # Salirse del grupo de la sala
         await self.channel_layer.group_discard(
@@ -24,7 +40,49 @@ class CompetenciaConsumer(AsyncWebsocketConsumer):
         )
         print(f"🔌 WebSocket Desconectado: {self.room_group_name}")
 
-    # Este método recibe el mensaje desde services.py
+    async def enviar_estado_inicial(self):
+        if not str(self.competencia_id).isdigit():
+            return
+        competencia_id = int(self.competencia_id)
+        query = parse_qs(self.scope.get('query_string', b'').decode('utf-8'))
+        since = query.get('since', [None])[0]
+
+        if since is not None and since.isdigit():
+            actual, deltas = await database_sync_to_async(get_delta_log().desde)(competencia_id, int(since))
+            if deltas is not None:
+                for seq, datos in deltas:
+                    await self.enviar_frame(frame_lote(seq, datos, self.binario))
+                return
+
+        actual, _ = await database_sync_to_async(get_delta_log().desde)(competencia_id, 0)
+        snapshot = await self.obtener_snapshot(competencia_id)
+        if snapshot is not None:
+            await self.enviar_frame(frame_snapshot(actual, snapshot, self.binario))
+
+    async def enviar_frame(self, frame):
+        if isinstance(frame, bytes):
+            await self.send(bytes_data=frame)
+        else:
+            await self.send(text_data=frame)
+
+    @database_sync_to_async
+    def obtener_snapshot(self, competencia_id):
+        from .models import Competencia
+        from .services import RankingService
+        competencia = Competencia.objects.filter(pk=competencia_id).first()
+        if not competencia:
+            return None
+        top = getattr(settings, 'SCORE_SNAPSHOT_TOP', 500)
+        return RankingService.get_leaderboard_top(competencia, top)['categorias']
+
+    # Lote de puntajes agrupado por ScoreBroadcaster (ya codificado una vez por grupo)
+    async def score_batch(self, event):
+        if self.binario and 'bytes' in event:
+            await self.send(bytes_data=event['bytes'])
+        else:
+            await self.send(text_data=event['text'])
+
+    # Compatibilidad: mensaje individual con el formato anterior
     async def update_score(self, event):
         data = event['data']
 
@@ -32,4 +90,4 @@ class CompetenciaConsumer(AsyncWebsocketConsumer):
         await self.send(text_data=json.dumps({
             'type': 'score_update',
             'payload': data
-        }))
\ No newline at end of file
+        }))
@@ -0,0 +1,122 @@
+"""
+Resumen financiero mensual (ResumenFinancieroMensual).
+
+Una fila por competencia, en el mes de su fecha de inicio, con ingresos
+(Inscripcion.monto_pagado), gastos (Gasto.monto) e inscripciones. Las señales
+solo anotan la competencia afectada; al confirmar la transacción sus filas se
+recalculan juntas, con una consulta agregada y una escritura en bloque.
+Los reportes trimestrales y anuales leen estas filas en lugar de las
+inscripciones.
+"""
+import threading
+from datetime import date
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Optional
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Competencia, Gasto, Inscripcion, ResumenFinancieroMensual
+
+_CERO = Decimal('0.00')
+
+
+def _primer_dia(fecha: date) -> date:
+    return fecha.replace(day=1)
+
+
+def _totales(modelo):
+    """Subconsulta agregada por competencia (OuterRef('pk')) sobre 'modelo'."""
+    return modelo.objects.filter(competencia=OuterRef('pk')).order_by().values('competencia')
+
+
+def recalcular_resumenes(competencia_ids: Iterable[int]) -> int:
+    """Reescribe el resumen de varias competencias: una lectura agregada y una escritura en bloque."""
+    ids = set(competencia_ids)
+    if not ids:
+        return 0
+    moneda = DecimalField(max_digits=12, decimal_places=2)
+    filas = Competencia.objects.filter(id__in=ids).annotate(
+        total_ingresos=Coalesce(Subquery(_totales(Inscripcion).annotate(s=Sum('monto_pagado')).values('s'), output_field=moneda),
+                                Value(_CERO), output_field=moneda),
+        total_inscripciones=Coalesce(Subquery(_totales(Inscripcion).annotate(c=Count('id')).values('c'), output_field=IntegerField()), 0),
+        total_gastos=Coalesce(Subquery(_totales(Gasto).annotate(s=Sum('monto')).values('s'), output_field=moneda),
+                              Value(_CERO), output_field=moneda),
+    ).values('id', 'start_date', 'poligono_id', 'total_ingresos', 'total_inscripciones', 'total_gastos')
+    filas = list(filas)
+
+    # Solo sobran las filas de un mes que ya no corresponde (cambió la fecha de inicio)
+    vigentes = Q()
+    for f in filas:
+        vigentes |= Q(competencia_id=f['id'], mes=_primer_dia(f['start_date']))
+
+    with transaction.atomic():
+        ResumenFinancieroMensual.objects.filter(competencia_id__in=ids).exclude(vigentes).delete()
+        # Upsert: dos recálculos concurrentes de la misma competencia no chocan con la restricción única
+        creadas = ResumenFinancieroMensual.objects.bulk_create([
+            ResumenFinancieroMensual(
+                mes=_primer_dia(f['start_date']), competencia_id=f['id'], poligono_id=f['poligono_id'],
+                ingresos=f['total_ingresos'], gastos=f['total_gastos'], inscripciones=f['total_inscripciones'],
+            )
+            for f in filas
+        ], update_conflicts=True, unique_fields=['mes', 'competencia'],
+            update_fields=['poligono', 'ingresos', 'gastos', 'inscripciones'])
+    return len(creadas)
+
+
+# --- RECÁLCULO DIFERIDO (igual que precios.programar_recalculo) ---
+
+_pendientes = threading.local()
+
+
+def programar_resumen(competencia_ids: Iterable[int], using: Optional[str] = None) -> None:
+    """Recalcula el resumen de las competencias al confirmar la transacción en curso."""
+    ids = {i for i in competencia_ids if i is not None}
+    if not ids:
+        return
+    if not transaction.get_connection(using).in_atomic_block:
+        recalcular_resumenes(ids)
+        return
+    if not hasattr(_pendientes, 'ids'):
+        _pendientes.ids = set()
+    _pendientes.ids |= ids
+    transaction.on_commit(_vaciar_pendientes, using=using)
+
+
+def _vaciar_pendientes() -> None:
+    ids = getattr(_pendientes, 'ids', None)
+    if ids:
+        _pendientes.ids = set()
+        recalcular_resumenes(ids)
+
+
+# --- LECTURA PARA REPORTES ---
+
+def resumen_periodo(desde: date, hasta: date, poligono_id: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Totales y detalle por competencia de los meses [desde, hasta] (fechas de
+    cualquier día del mes) leyendo solo las filas precalculadas.
+    """
+    filas = ResumenFinancieroMensual.objects.filter(mes__range=(_primer_dia(desde), _primer_dia(hasta)))
+    if poligono_id is not None:
+        filas = filas.filter(poligono_id=poligono_id)
+    filas = list(filas.select_related('competencia').order_by('mes', 'competencia__start_date', 'competencia_id'))
+
+    ingresos = sum((f.ingresos for f in filas), _CERO)
+    gastos = sum((f.gastos for f in filas), _CERO)
+    por_mes: Dict[date, Dict[str, Any]] = {}
+    for f in filas:
+        mes = por_mes.setdefault(f.mes, {'mes': f.mes, 'ingresos': _CERO, 'gastos': _CERO, 'inscripciones': 0})
+        mes['ingresos'] += f.ingresos
+        mes['gastos'] += f.gastos
+        mes['inscripciones'] += f.inscripciones
+
+    return {
+        'ingresos': ingresos,
+        'gastos': gastos,
+        'balance': ingresos - gastos,
+        'inscripciones': sum(f.inscripciones for f in filas),
+        'por_mes': list(por_mes.values()),
+        'filas': filas,
+    }
@@ -0,0 +1,145 @@
+"""
+Caché de imágenes ya decodificadas para los PDFs (firmas y fotos de deportistas).
+
+Cada entrada es un ImageReader construido sobre una imagen PIL ya cargada (y
+reducida si se pide un tamaño máximo), así ReportLab no vuelve a leer ni a
+decodificar el PNG/JPEG en cada documento. El límite es de memoria
+(settings.PDF_IMAGE_CACHE_MB) con expulsión LRU.
+
+La clave incluye la fecha de modificación del archivo: si otro proceso reemplaza
+la imagen, aquí simplemente deja de coincidir. Las señales de AutoridadFirma y
+Deportista además liberan las entradas en el proceso actual, y la lista de
+firmas activas se invalida en todos los procesos con un sello en la caché de Django.
+"""
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from PIL import Image
+from reportlab.lib.utils import ImageReader
+
+from .models import AutoridadFirma
+
+_CLAVE_VERSION_FIRMAS = "pdf_firmas_version"
+
+# Resolución suficiente para cómo se dibujan: firma a 80x40 pt, foto a 40x40 pt
+MAX_PX_FIRMA = 600
+MAX_PX_FOTO = 240
+
+
+class CacheImagenes:
+    """LRU de ImageReader acotado por bytes decodificados."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entradas: "OrderedDict[tuple, Tuple[ImageReader, int]]" = OrderedDict()
+        self.bytes = 0
+
+    def obtener(self, ruta_relativa: Optional[str], max_px: Optional[int] = None) -> Optional[ImageReader]:
+        if not ruta_relativa:
+            return None
+        ruta = os.path.join(settings.MEDIA_ROOT, ruta_relativa)
+        try:
+            mtime = os.stat(ruta).st_mtime_ns
+        except OSError:
+            return None
+        clave = (ruta_relativa, max_px, mtime)
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
+                self._entradas.move_to_end(clave)
+                return entrada[0]
+
+        # Decodificar fuera del lock: si dos hilos lo hacen a la vez, gana el último
+        try:
+            with Image.open(ruta) as original:
+                # copy()/convert() decodifican y sueltan el archivo
+                imagen = original.copy() if original.mode in ('RGB', 'RGBA', 'L') else original.convert('RGBA')
+            if max_px:
+                imagen.thumbnail((max_px, max_px))
+        except Exception:
+            return None
+        lector = ImageReader(imagen)
+        tamano = imagen.width * imagen.height * len(imagen.getbands())
+
+        with self._lock:
+            self._quitar_ruta_locked(ruta_relativa, max_px)
+            self._entradas[clave] = (lector, tamano)
+            self.bytes += tamano
+            while self.bytes > self.max_bytes and len(self._entradas) > 1:
+                _, (_, liberado) = self._entradas.popitem(last=False)
+                self.bytes -= liberado
+        return lector
+
+    def _quitar_ruta_locked(self, ruta_relativa: str, max_px=...) -> None:
+        for clave in [c for c in self._entradas if c[0] == ruta_relativa and (max_px is ... or c[1] == max_px)]:
+            self.bytes -= self._entradas.pop(clave)[1]
+
+    def invalidar(self, ruta_relativa: Optional[str]) -> None:
+        if ruta_relativa:
+            with self._lock:
+                self._quitar_ruta_locked(ruta_relativa)
+
+    def limpiar(self) -> None:
+        with self._lock:
+            self._entradas.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._entradas)
+
+
+_cache: Optional[CacheImagenes] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache_imagenes() -> CacheImagenes:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = CacheImagenes(getattr(settings, 'PDF_IMAGE_CACHE_MB', 32) * 1024 * 1024)
+        return _cache
+
+
+def imagen_firma(ruta_relativa: Optional[str]) -> Optional[ImageReader]:
+    return get_cache_imagenes().obtener(ruta_relativa, MAX_PX_FIRMA)
+
+
+def imagen_foto(ruta_relativa: Optional[str]) -> Optional[ImageReader]:
+    return get_cache_imagenes().obtener(ruta_relativa, MAX_PX_FOTO)
+
+
+# --- FIRMAS ACTIVAS ---
+# La consulta a AutoridadFirma también se evita: la lista se guarda en el proceso
+# junto con el sello de versión vigente al leerla.
+
+_firmas_lock = threading.Lock()
+_firmas: Optional[Tuple[Optional[str], List[Tuple[str, str, Optional[str]]]]] = None
+
+
+def invalidar_firmas(ruta_relativa: Optional[str] = None) -> None:
+    """Lo llaman las señales de AutoridadFirma."""
+    global _firmas
+    cache.set(_CLAVE_VERSION_FIRMAS, uuid.uuid4().hex, None)
+    with _firmas_lock:
+        _firmas = None
+    get_cache_imagenes().invalidar(ruta_relativa)
+
+
+def firmas_activas() -> List[Tuple[str, str, Optional[ImageReader]]]:
+    """Hasta 3 autoridades activas como (nombre, cargo, ImageReader o None)."""
+    global _firmas
+    version = cache.get(_CLAVE_VERSION_FIRMAS)
+    with _firmas_lock:
+        vigente = _firmas if _firmas is not None and _firmas[0] == version else None
+    if vigente is None:
+        filas = list(AutoridadFirma.objects.filter(activo=True).values_list('nombre', 'cargo', 'firma')[:3])
+        vigente = (version, filas)
+        with _firmas_lock:
+            _firmas = vigente
+    return [(nombre, cargo, imagen_firma(firma)) for nombre, cargo, firma in vigente[1]]
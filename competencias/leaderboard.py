@@ -0,0 +1,276 @@
+"""
+Leaderboard en vivo por competencia y categoría.
+
+Vive en la capa Channels/Redis para que el marcador en vivo y los endpoints de
+ranking no consulten Postgres en cada refresco. Estructura en Redis:
+
+    competencia_<id>:<categoria>   ZSET  resultado -> puntaje (O(log n) por actualización)
+    competencia_<id>:datos         HASH  resultado -> payload JSON
+    competencia_<id>:deportistas   HASH  deportista -> resultado
+    competencia_<id>:categorias    SET   categorías presentes
+    competencia_<id>:cargado       STR   marca de que el leaderboard está completo
+
+Sin Redis (desarrollo / tests) se usa una implementación en memoria del proceso.
+La reconstrucción desde la base de datos la hace RankingService.
+"""
+import abc
+import json
+import threading
+from bisect import bisect_left, insort
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.conf import settings
+
+# Los ids se invierten en el miembro para que, a igual puntaje y X,
+# el orden descendente de Redis deje primero al resultado registrado antes.
+_ID_MAX = 10 ** 15
+
+
+def _token_categoria(categoria_id: Optional[int]) -> str:
+    return str(categoria_id) if categoria_id is not None else 'general'
+
+
+def _clave(competencia_id: int, sufijo: str) -> str:
+    return f"competencia_{competencia_id}:{sufijo}"
+
+
+def _orden(datos: Dict[str, Any]):
+    """(centésimas, X, id) de una entrada; mayor es mejor salvo el id."""
+    centesimas = int(Decimal(str(datos['puntaje_total'])) * 100)
+    return centesimas, int(datos.get('x_count') or 0), int(datos['id'])
+
+
+def _score(datos: Dict[str, Any]) -> float:
+    centesimas, x_count, _ = _orden(datos)
+    # Puntaje (hasta 10 dígitos) y X en un único score exacto en coma flotante
+    return float(centesimas * 1000 + min(x_count, 999))
+
+
+def _miembro(resultado_id: int) -> str:
+    return f"{_ID_MAX - resultado_id:015d}"
+
+
+class Leaderboard(abc.ABC):
+    """Interfaz común de los backends."""
+
+    @abc.abstractmethod
+    def esta_cargado(self, competencia_id: int) -> bool:
+        ...
+
+    @abc.abstractmethod
+    def cargar(self, competencia_id: int, entradas: Iterable[Dict[str, Any]]) -> None:
+        ...
+
+    @abc.abstractmethod
+    def actualizar(self, competencia_id: int, datos: Dict[str, Any]) -> None:
+        ...
+
+    @abc.abstractmethod
+    def invalidar(self, competencia_id: int) -> None:
+        ...
+
+    @abc.abstractmethod
+    def categorias(self, competencia_id: int) -> List[Optional[int]]:
+        ...
+
+    @abc.abstractmethod
+    def top(self, competencia_id: int, categoria_id: Optional[int], n: int) -> List[Dict[str, Any]]:
+        ...
+
+    @abc.abstractmethod
+    def total(self, competencia_id: int, categoria_id: Optional[int]) -> int:
+        ...
+
+    @abc.abstractmethod
+    def posicion_deportista(self, competencia_id: int, deportista_id: int) -> Optional[Dict[str, Any]]:
+        """Entrada del deportista con 'posicion' y 'total' de su categoría, o None."""
+
+    @staticmethod
+    def _categoria_id(token: str) -> Optional[int]:
+        return None if token == 'general' else int(token)
+
+
+class MemoriaLeaderboard(Leaderboard):
+    """Backend en memoria del proceso (desarrollo y tests, un solo proceso)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._competencias: Dict[int, Dict[str, Any]] = {}
+
+    def _estado(self, competencia_id: int) -> Dict[str, Any]:
+        return self._competencias.setdefault(competencia_id, {
+            'cargado': False, 'tablas': {}, 'datos': {}, 'deportistas': {}
+        })
+
+    @staticmethod
+    def _llave(datos: Dict[str, Any]):
+        centesimas, x_count, resultado_id = _orden(datos)
+        return (-centesimas, -x_count, resultado_id)
+
+    def _quitar(self, estado, datos) -> None:
+        tabla = estado['tablas'].get(_token_categoria(datos.get('categoria_id')), [])
+        llave = self._llave(datos)
+        i = bisect_left(tabla, llave)
+        if i < len(tabla) and tabla[i] == llave:
+            del tabla[i]
+
+    def _poner(self, estado, datos) -> None:
+        anterior = estado['datos'].get(datos['id'])
+        if anterior:
+            self._quitar(estado, anterior)
+        insort(estado['tablas'].setdefault(_token_categoria(datos.get('categoria_id')), []), self._llave(datos))
+        estado['datos'][datos['id']] = datos
+        if datos.get('deportista_id') is not None:
+            estado['deportistas'][datos['deportista_id']] = datos['id']
+
+    def esta_cargado(self, competencia_id):
+        with self._lock:
+            return self._competencias.get(competencia_id, {}).get('cargado', False)
+
+    def cargar(self, competencia_id, entradas):
+        with self._lock:
+            self._competencias.pop(competencia_id, None)
+            estado = self._estado(competencia_id)
+            for datos in entradas:
+                self._poner(estado, datos)
+            estado['cargado'] = True
+
+    def actualizar(self, competencia_id, datos):
+        with self._lock:
+            self._poner(self._estado(competencia_id), datos)
+
+    def invalidar(self, competencia_id):
+        with self._lock:
+            self._competencias.pop(competencia_id, None)
+
+    def categorias(self, competencia_id):
+        with self._lock:
+            tablas = self._competencias.get(competencia_id, {}).get('tablas', {})
+            return [self._categoria_id(token) for token, tabla in tablas.items() if tabla]
+
+    def top(self, competencia_id, categoria_id, n):
+        with self._lock:
+            estado = self._competencias.get(competencia_id)
+            if not estado:
+                return []
+            tabla = estado['tablas'].get(_token_categoria(categoria_id), [])
+            return [
+                dict(estado['datos'][llave[2]], posicion=i)
+                for i, llave in enumerate(tabla[:n], 1)
+            ]
+
+    def total(self, competencia_id, categoria_id):
+        with self._lock:
+            estado = self._competencias.get(competencia_id, {})
+            return len(estado.get('tablas', {}).get(_token_categoria(categoria_id), []))
+
+    def posicion_deportista(self, competencia_id, deportista_id):
+        with self._lock:
+            estado = self._competencias.get(competencia_id)
+            if not estado or deportista_id not in estado['deportistas']:
+                return None
+            datos = estado['datos'][estado['deportistas'][deportista_id]]
+            tabla = estado['tablas'][_token_categoria(datos.get('categoria_id'))]
+            return dict(datos, posicion=bisect_left(tabla, self._llave(datos)) + 1, total=len(tabla))
+
+
+class RedisLeaderboard(Leaderboard):
+    """Backend en Redis: sorted sets compartidos por todos los procesos."""
+
+    def __init__(self, url: str, ttl: int):
+        import redis
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+        self.ttl = ttl
+
+    def _tabla(self, competencia_id, categoria_id):
+        return _clave(competencia_id, _token_categoria(categoria_id))
+
+    def _claves_fijas(self, competencia_id):
+        return [_clave(competencia_id, s) for s in ('datos', 'deportistas', 'categorias', 'cargado')]
+
+    def esta_cargado(self, competencia_id):
+        return bool(self.redis.exists(_clave(competencia_id, 'cargado')))
+
+    def _escribir(self, pipe, competencia_id, datos, anterior=None):
+        miembro = _miembro(int(datos['id']))
+        token = _token_categoria(datos.get('categoria_id'))
+        if anterior and _token_categoria(anterior.get('categoria_id')) != token:
+            pipe.zrem(self._tabla(competencia_id, anterior.get('categoria_id')), miembro)
+        tabla = _clave(competencia_id, token)
+        pipe.zadd(tabla, {miembro: _score(datos)})
+        pipe.hset(_clave(competencia_id, 'datos'), datos['id'], json.dumps(datos))
+        if datos.get('deportista_id') is not None:
+            pipe.hset(_clave(competencia_id, 'deportistas'), datos['deportista_id'], datos['id'])
+        pipe.sadd(_clave(competencia_id, 'categorias'), token)
+        pipe.expire(tabla, self.ttl)
+
+    def cargar(self, competencia_id, entradas):
+        tokens = self.redis.smembers(_clave(competencia_id, 'categorias'))
+        pipe = self.redis.pipeline()
+        pipe.delete(*self._claves_fijas(competencia_id), *[_clave(competencia_id, t) for t in tokens])
+        for datos in entradas:
+            self._escribir(pipe, competencia_id, datos)
+        pipe.set(_clave(competencia_id, 'cargado'), 1)
+        for clave in self._claves_fijas(competencia_id):
+            pipe.expire(clave, self.ttl)
+        pipe.execute()
+
+    def actualizar(self, competencia_id, datos):
+        crudo = self.redis.hget(_clave(competencia_id, 'datos'), datos['id'])
+        pipe = self.redis.pipeline()
+        self._escribir(pipe, competencia_id, datos, json.loads(crudo) if crudo else None)
+        pipe.execute()
+
+    def invalidar(self, competencia_id):
+        tokens = self.redis.smembers(_clave(competencia_id, 'categorias'))
+        self.redis.delete(*self._claves_fijas(competencia_id), *[_clave(competencia_id, t) for t in tokens])
+
+    def categorias(self, competencia_id):
+        return [self._categoria_id(t) for t in self.redis.smembers(_clave(competencia_id, 'categorias'))]
+
+    def top(self, competencia_id, categoria_id, n):
+        miembros = self.redis.zrevrange(self._tabla(competencia_id, categoria_id), 0, n - 1)
+        if not miembros:
+            return []
+        ids = [str(_ID_MAX - int(m)) for m in miembros]
+        crudos = self.redis.hmget(_clave(competencia_id, 'datos'), ids)
+        return [dict(json.loads(c), posicion=i) for i, c in enumerate(crudos, 1) if c]
+
+    def total(self, competencia_id, categoria_id):
+        return self.redis.zcard(self._tabla(competencia_id, categoria_id))
+
+    def posicion_deportista(self, competencia_id, deportista_id):
+        resultado_id = self.redis.hget(_clave(competencia_id, 'deportistas'), deportista_id)
+        if resultado_id is None:
+            return None
+        crudo = self.redis.hget(_clave(competencia_id, 'datos'), resultado_id)
+        if crudo is None:
+            return None
+        datos = json.loads(crudo)
+        tabla = self._tabla(competencia_id, datos.get('categoria_id'))
+        pipe = self.redis.pipeline()
+        pipe.zrevrank(tabla, _miembro(int(resultado_id)))
+        pipe.zcard(tabla)
+        rank, total = pipe.execute()
+        if rank is None:
+            return None
+        return dict(datos, posicion=rank + 1, total=total)
+
+
+_leaderboard = None
+_leaderboard_lock = threading.Lock()
+
+
+def get_leaderboard() -> Leaderboard:
+    """Backend configurado en settings (Redis si LEADERBOARD_REDIS_URL está definido)."""
+    global _leaderboard
+    if _leaderboard is None:
+        with _leaderboard_lock:
+            if _leaderboard is None:
+                url = getattr(settings, 'LEADERBOARD_REDIS_URL', None)
+                if url:
+                    _leaderboard = RedisLeaderboard(url, getattr(settings, 'LEADERBOARD_TTL', 60 * 60 * 48))
+                else:
+                    _leaderboard = MemoriaLeaderboard()
+    return _leaderboard
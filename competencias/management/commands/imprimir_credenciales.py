@@ -0,0 +1,63 @@
+"""
+Credenciales de inicio de temporada, varias por hoja, generadas por lotes.
+
+    python manage.py imprimir_credenciales --status ACTIVO --salida /tmp/credenciales
+    python manage.py imprimir_credenciales --club 3 --hoja carta
+    python manage.py imprimir_credenciales --ids 10,11,12
+
+Los lotes se generan en el pool de PDFs (settings.PDF_WORKERS); para repartirlos
+entre más núcleos se pueden levantar procesos 'procesar_trabajos_pdf --loop' en paralelo.
+"""
+import os
+import shutil
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from competencias import trabajos
+from competencias.models import TrabajoPDF
+
+
+class Command(BaseCommand):
+    help = 'Genera las credenciales de un club o de todos los deportistas en hojas de varias tarjetas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--club', type=int, default=None, help='Solo los deportistas de este club.')
+        parser.add_argument('--status', default=None, help='Filtrar por estado (p. ej. ACTIVO).')
+        parser.add_argument('--ids', default=None, help='Ids de deportistas separados por coma.')
+        parser.add_argument('--hoja', default='A4', choices=sorted(trabajos.HOJAS), help='Tamaño de hoja.')
+        parser.add_argument('--salida', default=None, help='Directorio donde copiar los PDFs generados.')
+        parser.add_argument('--espera-max', type=int, default=3600, help='Segundos máximos de espera.')
+
+    def handle(self, *args, **options):
+        try:
+            ids = [int(i) for i in options['ids'].split(',') if i.strip()] if options['ids'] else None
+        except ValueError:
+            raise CommandError('--ids debe ser una lista de números separados por coma.')
+
+        seleccion = trabajos.seleccionar_credenciales(options['club'], options['status'], ids)
+        if not seleccion:
+            raise CommandError('No hay deportistas para esa selección.')
+        etiqueta = f"club_{options['club']}" if options['club'] else 'seleccion'
+        lotes = trabajos.solicitar_credenciales(seleccion, options['hoja'], etiqueta)
+        self.stdout.write(f"{len(seleccion)} credenciales en {len(lotes)} lotes.")
+
+        terminados = {TrabajoPDF.Estados.LISTO, TrabajoPDF.Estados.ERROR}
+        limite = time.monotonic() + options['espera_max']
+        while True:
+            estados = dict(TrabajoPDF.objects.filter(id__in=[t.id for t in lotes]).values_list('id', 'estado'))
+            if all(e in terminados for e in estados.values()):
+                break
+            if time.monotonic() > limite:
+                raise CommandError('Se agotó la espera; los lotes siguen en la cola.')
+            time.sleep(0.5)
+
+        fallidos = [t for t in lotes if estados[t.id] == TrabajoPDF.Estados.ERROR]
+        if options['salida']:
+            os.makedirs(options['salida'], exist_ok=True)
+            for t in lotes:
+                if estados[t.id] == TrabajoPDF.Estados.LISTO:
+                    shutil.copyfile(trabajos.ruta_absoluta(t.archivo), os.path.join(options['salida'], t.nombre_archivo))
+        if fallidos:
+            raise CommandError(f"{len(fallidos)} lotes fallaron: {', '.join(str(t.id) for t in fallidos)}")
+        self.stdout.write(self.style.SUCCESS(f"{len(lotes)} PDFs de credenciales listos."))
@@ -0,0 +1,240 @@
+"""
+Prueba de carga del canal ws/competencia/<id>/.
+
+Abre miles de clientes WebSocket concurrentes contra la app ASGI en el mismo
+proceso (sin red), genera envíos de puntajes sintéticos con ResultsService y
+reporta latencia de conexión, percentiles de latencia de difusión (fan-out)
+y memoria por conexión.
+
+    python manage.py loadtest_ws --clientes 2000 --envios 100
+    python manage.py loadtest_ws --redis redis://127.0.0.1:6380/0 --tick-ms 250
+
+Los datos sintéticos (competencia, deportistas, inscripciones) se escriben en
+DATABASES['default'] y disparan sus señales (ranking, resumen financiero,
+reportes cacheados); se borran al terminar salvo que se pase --conservar.
+Por eso el comando se niega a correr con DEBUG desactivado salvo que se pase
+--allow-db-writes: no usarlo contra la base de producción.
+"""
+import asyncio
+import json
+import random
+import time
+import tracemalloc
+from datetime import date
+
+import msgpack
+from asgiref.sync import sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from deportistas.models import Deportista
+from competencias.broadcast import SUBPROTOCOLO_MSGPACK, get_delta_log
+from competencias.consumers import CompetenciaConsumer
+from competencias.models import Competencia, Inscripcion
+from competencias.services import ResultsService
+
+
+def _percentiles(valores, puntos=(50, 90, 99)):
+    if not valores:
+        return {p: 0.0 for p in puntos}
+    ordenados = sorted(valores)
+    return {p: ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))] for p in puntos}
+
+
+class Command(BaseCommand):
+    help = ('Prueba de carga del WebSocket de competencia: conexión, fan-out y memoria por cliente. '
+            'Escribe datos sintéticos en la base configurada: solo corre con DEBUG o con --allow-db-writes.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', type=int, default=1000, help='Clientes WebSocket concurrentes.')
+        parser.add_argument('--envios', type=int, default=50, help='Envíos de puntajes a generar.')
+        parser.add_argument('--lote', type=int, default=10, help='Puntajes por envío (ruta por lote).')
+        parser.add_argument('--deportistas', type=int, default=200, help='Inscripciones sintéticas.')
+        parser.add_argument('--intervalo-ms', type=int, default=20, help='Pausa entre envíos.')
+        parser.add_argument('--concurrencia', type=int, default=200, help='Conexiones abiertas en paralelo.')
+        parser.add_argument('--formato', choices=['json', 'msgpack'], default='json')
+        parser.add_argument('--redis', help='URL de Redis para la capa de canales (por defecto InMemoryChannelLayer).')
+        parser.add_argument('--tick-ms', type=int, default=0, help='Ventana de agrupación (solo con --redis).')
+        parser.add_argument('--conservar', action='store_true', help='No borrar los datos sintéticos.')
+        parser.add_argument('--allow-db-writes', action='store_true',
+                            help='Permitir escribir datos sintéticos con DEBUG desactivado (nunca en producción).')
+
+    def handle(self, *args, **options):
+        if options['clientes'] < 1 or options['envios'] < 1:
+            raise CommandError('--clientes y --envios deben ser mayores que cero.')
+        if not settings.DEBUG and not options['allow_db_writes']:
+            raise CommandError(
+                f"DEBUG está desactivado y la prueba escribiría en la base '{settings.DATABASES['default'].get('NAME')}'. "
+                "Use una base de pruebas o pase --allow-db-writes."
+            )
+
+        if options['redis']:
+            capa = {
+                "BACKEND": "channels_redis.core.RedisChannelLayer",
+                "CONFIG": {"hosts": [options['redis']], "capacity": options['envios'] * 2 + 10},
+            }
+            tick = options['tick_ms']
+        else:
+            # En memoria el temporizador correría en otro event loop: se difunde sin agrupar
+            capa = {"BACKEND": "channels.layers.InMemoryChannelLayer",
+                    "CONFIG": {"capacity": options['envios'] * 2 + 10}}
+            if options['tick_ms']:
+                self.stdout.write(self.style.WARNING('InMemoryChannelLayer: se ignora --tick-ms (difusión inmediata).'))
+            tick = 0
+
+        with override_settings(
+            CHANNEL_LAYERS={"default": capa},
+            SCORE_BROADCAST_TICK_MS=tick,
+            LEADERBOARD_REDIS_URL=None if not options['redis'] else options['redis'],
+        ):
+            competencia, inscripciones = self._crear_datos(options['deportistas'])
+            try:
+                reporte = asyncio.run(self._ejecutar(competencia, inscripciones, options))
+            finally:
+                if not options['conservar']:
+                    self._borrar_datos(competencia)
+
+        self._imprimir(reporte, options)
+
+    # --- DATOS SINTÉTICOS ---
+
+    def _crear_datos(self, cantidad):
+        sello = int(time.time() * 1000)
+        competencia = Competencia.objects.create(name=f"Carga WS {sello}", start_date=date.today())
+        deportistas = Deportista.objects.bulk_create([
+            Deportista(
+                first_name=f"Carga{i}", apellido_paterno="WS", fecha_nacimiento=date(1990, 1, 1),
+                ci=f"WS{sello}-{i}"
+            )
+            for i in range(cantidad)
+        ])
+        inscripciones = Inscripcion.objects.bulk_create([
+            Inscripcion(competencia=competencia, deportista=d) for d in deportistas
+        ])
+        return competencia, [i.id for i in inscripciones]
+
+    def _borrar_datos(self, competencia):
+        deportistas = Deportista.objects.filter(inscripciones__competencia=competencia)
+        ids = list(deportistas.values_list('id', flat=True))
+        competencia.delete()
+        Deportista.objects.filter(id__in=ids).delete()
+
+    # --- EJECUCIÓN ---
+
+    async def _ejecutar(self, competencia, inscripciones, options):
+        binario = options['formato'] == 'msgpack'
+        ruta = f"/ws/competencia/{competencia.id}/"
+        subprotocolos = [SUBPROTOCOLO_MSGPACK] if binario else None
+
+        tracemalloc.start()
+        memoria_base = tracemalloc.get_traced_memory()[0]
+
+        clientes, latencias_conexion, fallidos = [], [], 0
+        semaforo = asyncio.Semaphore(options['concurrencia'])
+
+        async def conectar():
+            nonlocal fallidos
+            communicator = WebsocketCommunicator(CompetenciaConsumer.as_asgi(), ruta, subprotocols=subprotocolos)
+            communicator.scope['url_route'] = {'kwargs': {'competencia_id': str(competencia.id)}}
+            async with semaforo:
+                inicio = time.perf_counter()
+                conectado, _ = await communicator.connect(timeout=30)
+                if conectado:
+                    # El snapshot inicial forma parte del costo de conexión
+                    await communicator.receive_output(timeout=30)
+            if not conectado:
+                fallidos += 1
+                return
+            latencias_conexion.append(time.perf_counter() - inicio)
+            clientes.append(communicator)
+
+        inicio_conexion = time.perf_counter()
+        await asyncio.gather(*(conectar() for _ in range(options['clientes'])))
+        duracion_conexion = time.perf_counter() - inicio_conexion
+
+        memoria_conectados = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        # Lectores: registran (seq, instante de llegada) de cada frame
+        recepciones = []
+        activos = True
+
+        async def leer(communicator):
+            while activos:
+                try:
+                    salida = await communicator.receive_output(timeout=1)
+                except asyncio.TimeoutError:
+                    continue
+                llegada = time.perf_counter()
+                if 'bytes' in salida and salida['bytes'] is not None:
+                    seq = msgpack.unpackb(salida['bytes'])['s']
+                elif salida.get('text'):
+                    seq = json.loads(salida['text']).get('seq')
+                else:
+                    continue
+                recepciones.append((seq, llegada))
+
+        lectores = [asyncio.ensure_future(leer(c)) for c in clientes]
+
+        # Envíos: se guarda la secuencia vigente antes de cada envío; el primer frame
+        # con seq > esa secuencia es el que lleva el puntaje al cliente.
+        envios = {}
+        log = get_delta_log()
+        enviar = sync_to_async(ResultsService.procesar_envio_puntajes_lote)
+        secuencia = sync_to_async(lambda: log.desde(competencia.id, 0)[0])
+        for _ in range(options['envios']):
+            muestra = random.sample(inscripciones, min(options['lote'], len(inscripciones)))
+            data = [
+                {'inscripcion': ins, 'series': [{'puntaje': random.randint(5, 10), 'es_x': random.random() < 0.1}
+                                                for _ in range(10)]}
+                for ins in muestra
+            ]
+            previa = await secuencia()
+            envios.setdefault(previa + 1, time.perf_counter())
+            await enviar(data, {})
+            await asyncio.sleep(options['intervalo_ms'] / 1000.0)
+
+        # Margen para que llegue la última ventana
+        final = await secuencia()
+        limite = time.perf_counter() + max(5.0, options['tick_ms'] / 1000.0 * 4)
+        esperados = len(clientes) * len([s for s in envios if s <= final])
+        while len(recepciones) < esperados and time.perf_counter() < limite:
+            await asyncio.sleep(0.05)
+
+        activos = False
+        await asyncio.gather(*lectores, return_exceptions=True)
+        await asyncio.gather(*(c.disconnect() for c in clientes), return_exceptions=True)
+
+        latencias_fanout = [llegada - envios[seq] for seq, llegada in recepciones if seq in envios]
+        return {
+            'conectados': len(clientes),
+            'fallidos': fallidos,
+            'duracion_conexion': duracion_conexion,
+            'latencias_conexion': latencias_conexion,
+            'latencias_fanout': latencias_fanout,
+            'frames': final,
+            'recibidos': len(recepciones),
+            'esperados': esperados,
+            'memoria_por_conexion': (memoria_conectados - memoria_base) / max(1, len(clientes)),
+        }
+
+    # --- REPORTE ---
+
+    def _imprimir(self, r, options):
+        ms = lambda s: f"{s * 1000:.1f} ms"
+        conexion = _percentiles(r['latencias_conexion'])
+        fanout = _percentiles(r['latencias_fanout'])
+
+        capa = 'Redis' if options['redis'] else 'InMemoryChannelLayer'
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Prueba de carga WebSocket ({capa}, {options['formato']})"))
+        self.stdout.write(f"  Clientes conectados : {r['conectados']} (fallidos: {r['fallidos']}) en {r['duracion_conexion']:.2f} s")
+        self.stdout.write(f"  Latencia conexión   : p50 {ms(conexion[50])} | p90 {ms(conexion[90])} | p99 {ms(conexion[99])}")
+        self.stdout.write(f"  Frames emitidos     : {r['frames']} para {options['envios']} envíos")
+        self.stdout.write(f"  Frames recibidos    : {r['recibidos']} de {r['esperados']} esperados")
+        self.stdout.write(f"  Latencia fan-out    : p50 {ms(fanout[50])} | p90 {ms(fanout[90])} | p99 {ms(fanout[99])}")
+        # Incluye el lado cliente del communicator: es una cota superior
+        self.stdout.write(f"  Memoria/conexión    : {r['memoria_por_conexion'] / 1024:.1f} KiB (tracemalloc, cota superior)")
+        if r['recibidos'] < r['esperados']:
+            self.stdout.write(self.style.WARNING('  Hubo frames perdidos: capacidad de canal o lectores saturados.'))
@@ -0,0 +1,41 @@
+"""
+Procesa la cola de PDFs (TrabajoPDF) fuera del servidor web.
+
+    python manage.py procesar_trabajos_pdf             # drena lo pendiente y termina
+    python manage.py procesar_trabajos_pdf --loop 5    # worker: revisa la cola cada 5 s
+    python manage.py procesar_trabajos_pdf --purgar    # borra PDFs cacheados viejos
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from competencias import trabajos
+
+
+class Command(BaseCommand):
+    help = 'Genera los PDFs pendientes de la cola y depura los archivos cacheados.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limite', type=int, default=None, help='Máximo de trabajos por pasada.')
+        parser.add_argument('--loop', type=float, default=0, help='Segundos entre pasadas (0 = una sola pasada).')
+        parser.add_argument('--atascados-min', type=int, default=trabajos.ATASCADOS_MIN,
+                            help='Minutos tras los cuales un trabajo en PROCESANDO vuelve a la cola.')
+        parser.add_argument('--purgar', action='store_true', help='Borrar PDFs con más de PDF_CACHE_DIAS días.')
+
+    def handle(self, *args, **options):
+        if options['limite'] is not None and options['limite'] < 1:
+            raise CommandError('--limite debe ser mayor que cero.')
+
+        if options['purgar']:
+            borrados = trabajos.purgar(settings.PDF_CACHE_DIAS)
+            self.stdout.write(self.style.SUCCESS(f"{borrados} PDFs cacheados eliminados."))
+            return
+
+        while True:
+            hechos = trabajos.drenar(options['limite'], options['atascados_min'])
+            if hechos or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(f"{hechos} PDFs generados."))
+            if not options['loop']:
+                return
+            time.sleep(options['loop'])
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def poblar_ranking(apps, schema_editor):
+    """Construye el ranking materializado para los resultados ya registrados."""
+    Resultado = apps.get_model('competencias', 'Resultado')
+    PosicionRanking = apps.get_model('competencias', 'PosicionRanking')
+
+    grupos = {}
+    filas = Resultado.objects.values(
+        'id', 'puntaje', 'detalles_json', 'inscripcion__competencia_id', 'participacion__categoria_id'
+    )
+    for fila in filas:
+        try:
+            x_count = max(int((fila['detalles_json'] or {}).get('x_count', 0)), 0)
+        except (TypeError, ValueError, AttributeError):
+            x_count = 0
+        clave = (fila['inscripcion__competencia_id'], fila['participacion__categoria_id'])
+        grupos.setdefault(clave, []).append((fila['puntaje'], x_count, fila['id']))
+
+    nuevas = []
+    for (competencia_id, categoria_id), items in grupos.items():
+        items.sort(key=lambda item: (-item[0], -item[1], item[2]))
+        for posicion, (puntaje, x_count, resultado_id) in enumerate(items, 1):
+            nuevas.append(PosicionRanking(
+                competencia_id=competencia_id, categoria_id=categoria_id, resultado_id=resultado_id,
+                posicion=posicion, puntaje=puntaje, x_count=x_count
+            ))
+    PosicionRanking.objects.bulk_create(nuevas, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('competencias', '0010_alter_autoridadfirma_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PosicionRanking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posicion', models.PositiveIntegerField()),
+                ('puntaje', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('x_count', models.PositiveIntegerField(default=0)),
+                ('categoria', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='competencias.categoria')),
+                ('competencia', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='posiciones_ranking', to='competencias.competencia')),
+                ('resultado', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='posicion_ranking', to='competencias.resultado')),
+            ],
+            options={
+                'verbose_name': 'Posición de Ranking',
+                'verbose_name_plural': 'Posiciones de Ranking',
+                'indexes': [models.Index(fields=['competencia', 'categoria', 'posicion'], name='ranking_posicion_idx'), models.Index(fields=['competencia', 'categoria', 'puntaje'], name='ranking_puntaje_idx')],
+            },
+        ),
+        migrations.RunPython(poblar_ranking, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:50
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def poblar_totales(apps, schema_editor):
+    """Calcula el total a pagar de las inscripciones existentes con un único UPDATE."""
+    Inscripcion = apps.get_model('competencias', 'Inscripcion')
+    Participacion = apps.get_model('competencias', 'Participacion')
+    CategoriaCompetencia = apps.get_model('competencias', 'CategoriaCompetencia')
+
+    moneda = models.DecimalField(max_digits=12, decimal_places=2)
+    costo_categoria = CategoriaCompetencia.objects.filter(
+        competencia_id=OuterRef('inscripcion__competencia_id'),
+        categoria_id=OuterRef('categoria_id'),
+        costo_especifico__gt=0,
+    ).order_by('id').values('costo_especifico')[:1]
+    precios = Participacion.objects.filter(inscripcion=OuterRef('pk')).annotate(
+        precio=Coalesce(Subquery(costo_categoria), F('inscripcion__competencia__costo_inscripcion_base'), output_field=moneda)
+    ).values('inscripcion').annotate(total=Sum('precio')).values('total')
+    Inscripcion.objects.update(
+        costo_inscripcion=Coalesce(Subquery(precios, output_field=moneda), Value(0), output_field=moneda)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('competencias', '0011_posicionranking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inscripcion',
+            name='costo_inscripcion',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10, verbose_name='Total a Pagar'),
+        ),
+        migrations.RunPython(poblar_totales, migrations.RunPython.noop),
+    ]
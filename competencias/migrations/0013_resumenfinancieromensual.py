@@ -0,0 +1,65 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:02
+
+import django.db.models.deletion
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def poblar_resumenes(apps, schema_editor):
+    """Resumen inicial de todas las competencias (mismo cálculo que finanzas.recalcular_resumenes)."""
+    Competencia = apps.get_model('competencias', 'Competencia')
+    Inscripcion = apps.get_model('competencias', 'Inscripcion')
+    Gasto = apps.get_model('competencias', 'Gasto')
+    Resumen = apps.get_model('competencias', 'ResumenFinancieroMensual')
+
+    moneda = DecimalField(max_digits=12, decimal_places=2)
+    inscripciones = Inscripcion.objects.filter(competencia=OuterRef('pk')).order_by().values('competencia')
+    gastos = Gasto.objects.filter(competencia=OuterRef('pk')).order_by().values('competencia')
+    filas = Competencia.objects.annotate(
+        total_ingresos=Coalesce(Subquery(inscripciones.annotate(s=Sum('monto_pagado')).values('s'), output_field=moneda),
+                                Value(Decimal('0.00')), output_field=moneda),
+        total_inscripciones=Coalesce(Subquery(inscripciones.annotate(c=Count('id')).values('c'), output_field=IntegerField()), 0),
+        total_gastos=Coalesce(Subquery(gastos.annotate(s=Sum('monto')).values('s'), output_field=moneda),
+                              Value(Decimal('0.00')), output_field=moneda),
+    ).values('id', 'start_date', 'poligono_id', 'total_ingresos', 'total_inscripciones', 'total_gastos')
+
+    Resumen.objects.bulk_create([
+        Resumen(
+            mes=f['start_date'].replace(day=1), competencia_id=f['id'], poligono_id=f['poligono_id'],
+            ingresos=f['total_ingresos'], gastos=f['total_gastos'], inscripciones=f['total_inscripciones'],
+        )
+        for f in filas.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('competencias', '0012_inscripcion_costo_inscripcion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenFinancieroMensual',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(help_text='Primer día del mes de inicio de la competencia.')),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('gastos', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('inscripciones', models.PositiveIntegerField(default=0)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+                ('competencia', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_financieros', to='competencias.competencia')),
+                ('poligono', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='resumenes_financieros', to='competencias.poligono')),
+            ],
+            options={
+                'verbose_name': 'Resumen Financiero Mensual',
+                'verbose_name_plural': 'Resúmenes Financieros Mensuales',
+                'indexes': [models.Index(fields=['mes', 'poligono'], name='resumen_financiero_mes_idx')],
+                'constraints': [models.UniqueConstraint(fields=('mes', 'competencia'), name='resumen_financiero_mes_competencia_uniq')],
+            },
+        ),
+        migrations.RunPython(poblar_resumenes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:04
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('competencias', '0013_resumenfinancieromensual'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoPDF',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('tipo', models.CharField(max_length=30)),
+                ('parametros', models.JSONField(default=dict)),
+                ('clave', models.CharField(db_index=True, help_text='SHA-256 de los datos de entrada del documento.', max_length=64)),
+                ('nombre_archivo', models.CharField(help_text='Nombre con el que se descarga.', max_length=150)),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('PROCESANDO', 'Procesando'), ('LISTO', 'Listo'), ('ERROR', 'Error')], default='PENDIENTE', max_length=12)),
+                ('archivo', models.CharField(blank=True, help_text='Ruta relativa a MEDIA_ROOT.', max_length=255)),
+                ('error', models.TextField(blank=True)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('iniciado_en', models.DateTimeField(blank=True, null=True)),
+                ('terminado_en', models.DateTimeField(blank=True, null=True)),
+                ('solicitado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Trabajo PDF',
+                'verbose_name_plural': 'Trabajos PDF',
+                'indexes': [models.Index(fields=['estado', 'creado_en'], name='trabajopdf_estado_idx')],
+            },
+        ),
+    ]
@@ -94,6 +94,12 @@ class CategoriaCompetencia(models.Model):
 
 # --- GESTIÓN DE INSCRIPCIONES Y RESULTADOS ---
 
+class InscripcionQuerySet(models.QuerySet):
+    def con_costo_total(self):
+        """Anota 'costo_total_anotado' calculado en SQL (ver precios.py)."""
+        from .precios import anotar_costo_total
+        return anotar_costo_total(self)
+
 class Inscripcion(models.Model):
     ESTADOS_PAGO = [
         ('PENDIENTE', 'Pendiente'),
@@ -109,9 +115,12 @@ class Inscripcion(models.Model):
     fecha_inscripcion = models.DateTimeField(auto_now_add=True)
     estado = models.CharField(max_length=20, choices=ESTADOS_PAGO, default='PENDIENTE')
     
+    costo_inscripcion = models.DecimalField("Total a Pagar", max_digits=10, decimal_places=2, default=0, editable=False)
     monto_pagado = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     comprobante_pago = models.FileField(upload_to='comprobantes/', null=True, blank=True)
 
+    objects = InscripcionQuerySet.as_manager()
+
     class Meta:
         unique_together = ('competencia', 'deportista')
         verbose_name = "Inscripción"
@@ -122,17 +131,48 @@ class Inscripcion(models.Model):
 
     @property
     def costo_total(self):
-        total = 0
-        for part in self.participaciones.all():
-            cat_comp = CategoriaCompetencia.objects.filter(
-                competencia=self.competencia, 
-                categoria=part.categoria
-            ).first()
-            if cat_comp and cat_comp.costo_especifico:
-                total += cat_comp.costo_especifico
-            else:
-                total += self.competencia.costo_inscripcion_base
-        return total
+        # Si el queryset ya lo anotó (con_costo_total) no hace falta consultar nada
+        anotado = getattr(self, 'costo_total_anotado', None)
+        if anotado is not None:
+            return anotado
+        # Matriz de precios cacheada por competencia: sin consultas por participación
+        from .precios import costos_totales
+        return costos_totales([self])[self.id]
+
+    def actualizar_total(self):
+        """Recalcula costo_inscripcion; dentro de una transacción se difiere al commit."""
+        from .precios import programar_recalculo
+        programar_recalculo([self.id])
+
+class ParticipacionQuerySet(models.QuerySet):
+    """
+    Las operaciones masivas no disparan post_save/post_delete: programan aquí
+    el recálculo del total de las inscripciones afectadas.
+    """
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        from .precios import programar_recalculo
+        programar_recalculo({o.inscripcion_id for o in objs}, using=self.db)
+        return objs
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        filas = super().bulk_update(objs, fields, *args, **kwargs)
+        if 'categoria' in fields or 'inscripcion' in fields:
+            from .precios import programar_recalculo
+            programar_recalculo({o.inscripcion_id for o in objs}, using=self.db)
+        return filas
+
+    def update(self, **kwargs):
+        if 'categoria' not in kwargs and 'inscripcion' not in kwargs:
+            return super().update(**kwargs)
+        afectadas = set(self.values_list('inscripcion_id', flat=True))
+        filas = super().update(**kwargs)
+        nueva = kwargs.get('inscripcion')
+        if nueva is not None:
+            afectadas.add(getattr(nueva, 'pk', nueva))
+        from .precios import programar_recalculo
+        programar_recalculo(afectadas, using=self.db)
+        return filas
 
 class Participacion(models.Model):
     """Detalle de en qué categorías participa una inscripción"""
@@ -141,6 +181,8 @@ class Participacion(models.Model):
     categoria = models.ForeignKey(Categoria, on_delete=models.CASCADE, null=True, blank=True)    
     arma_utilizada = models.ForeignKey('deportistas.Arma', on_delete=models.SET_NULL, null=True, blank=True)
 
+    objects = ParticipacionQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.categoria} ({self.inscripcion.deportista})"
 
@@ -159,11 +201,40 @@ class Resultado(models.Model):
     fecha_registro = models.DateTimeField(auto_now=True)
     codigo_verificacion = models.CharField(max_length=50, unique=True, null=True, blank=True)
 
+    @staticmethod
+    def generar_codigo_verificacion():
+        return str(uuid.uuid4())[:8].upper()
+
     def save(self, *args, **kwargs):
         if not self.codigo_verificacion:
-            self.codigo_verificacion = str(uuid.uuid4())[:8].upper()
+            self.codigo_verificacion = self.generar_codigo_verificacion()
         super().save(*args, **kwargs)
 
+class PosicionRanking(models.Model):
+    """
+    Ranking materializado por (competencia, categoría).
+    Lo mantiene RankingService de forma incremental al registrar puntajes,
+    así la lectura del ranking es un recorrido por índice y no un ordenamiento completo.
+    Orden: mayor puntaje, luego más X, luego el resultado registrado primero.
+    """
+    competencia = models.ForeignKey(Competencia, on_delete=models.CASCADE, related_name='posiciones_ranking')
+    categoria = models.ForeignKey(Categoria, on_delete=models.CASCADE, null=True, blank=True)
+    resultado = models.OneToOneField(Resultado, on_delete=models.CASCADE, related_name='posicion_ranking')
+    posicion = models.PositiveIntegerField()
+    puntaje = models.DecimalField(max_digits=10, decimal_places=2)
+    x_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Posición de Ranking"
+        verbose_name_plural = "Posiciones de Ranking"
+        indexes = [
+            models.Index(fields=['competencia', 'categoria', 'posicion'], name='ranking_posicion_idx'),
+            models.Index(fields=['competencia', 'categoria', 'puntaje'], name='ranking_puntaje_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.posicion}. {self.resultado.inscripcion.deportista} ({self.puntaje})"
+
 # --- NUEVOS MODELOS PARA REPORTES Y GESTIÓN ---
 
 class Gasto(models.Model):
@@ -173,6 +244,69 @@ class Gasto(models.Model):
     fecha = models.DateField(auto_now_add=True)
     registrado_por = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
 
+class ResumenFinancieroMensual(models.Model):
+    """
+    Totales precalculados por (mes, competencia, polígono); el mes es el de inicio
+    de la competencia. Lo mantiene finanzas.py al confirmar cambios en
+    inscripciones, pagos y gastos; los reportes trimestrales y anuales leen de aquí.
+    """
+    mes = models.DateField(help_text="Primer día del mes de inicio de la competencia.")
+    competencia = models.ForeignKey(Competencia, on_delete=models.CASCADE, related_name='resumenes_financieros')
+    poligono = models.ForeignKey(Poligono, on_delete=models.SET_NULL, null=True, blank=True, related_name='resumenes_financieros')
+    ingresos = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    gastos = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    inscripciones = models.PositiveIntegerField(default=0)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Resumen Financiero Mensual"
+        verbose_name_plural = "Resúmenes Financieros Mensuales"
+        constraints = [
+            models.UniqueConstraint(fields=['mes', 'competencia'], name='resumen_financiero_mes_competencia_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['mes', 'poligono'], name='resumen_financiero_mes_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.mes:%Y-%m} | {self.competencia_id}"
+
+class TrabajoPDF(models.Model):
+    """
+    Cola de generación de PDFs en la base de datos (ver trabajos.py).
+    El archivo final vive en MEDIA_ROOT bajo un nombre derivado de 'clave',
+    el hash de los datos de entrada: si ya existe, se sirve sin generar nada.
+    """
+    class Estados(models.TextChoices):
+        PENDIENTE = 'PENDIENTE', 'Pendiente'
+        PROCESANDO = 'PROCESANDO', 'Procesando'
+        LISTO = 'LISTO', 'Listo'
+        ERROR = 'ERROR', 'Error'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    tipo = models.CharField(max_length=30)
+    parametros = models.JSONField(default=dict)
+    clave = models.CharField(max_length=64, db_index=True, help_text="SHA-256 de los datos de entrada del documento.")
+    nombre_archivo = models.CharField(max_length=150, help_text="Nombre con el que se descarga.")
+    estado = models.CharField(max_length=12, choices=Estados.choices, default=Estados.PENDIENTE)
+    archivo = models.CharField(max_length=255, blank=True, help_text="Ruta relativa a MEDIA_ROOT.")
+    error = models.TextField(blank=True)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    solicitado_por = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    creado_en = models.DateTimeField(auto_now_add=True)
+    iniciado_en = models.DateTimeField(null=True, blank=True)
+    terminado_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Trabajo PDF"
+        verbose_name_plural = "Trabajos PDF"
+        indexes = [
+            models.Index(fields=['estado', 'creado_en'], name='trabajopdf_estado_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo} {self.id} ({self.estado})"
+
 class Record(models.Model):
     modalidad = models.ForeignKey(Modalidad, on_delete=models.CASCADE)
     categoria = models.ForeignKey(Categoria, on_delete=models.CASCADE)
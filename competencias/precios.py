@@ -0,0 +1,175 @@
+"""
+Matriz de precios por competencia.
+
+Los costos de inscripción salen de CategoriaCompetencia.costo_especifico y, si
+no está definido (o es 0), de Competencia.costo_inscripcion_base. La matriz de
+una competencia se arma con una sola consulta, se guarda en la caché de Django
+y se invalida desde signals.py cuando cambian las categorías habilitadas o el
+costo base. Con ella se cotizan muchas inscripciones en una sola pasada.
+
+El total guardado en Inscripcion.costo_inscripcion se recalcula de forma
+diferida (programar_recalculo) al confirmar la transacción.
+"""
+import threading
+from decimal import Decimal
+from typing import Dict, Iterable, Optional
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import CategoriaCompetencia, Competencia, Inscripcion, Participacion
+
+_CERO = Decimal('0.00')
+_TTL = 60 * 60
+
+
+def _clave(competencia_id: int) -> str:
+    return f"precios_competencia:{competencia_id}"
+
+
+class MatrizPrecios:
+    """Precio por categoría de una competencia."""
+
+    def __init__(self, competencia_id: int, base: Decimal, costos: Dict[int, Decimal]):
+        self.competencia_id = competencia_id
+        self.base = base
+        self.costos = costos
+
+    def precio(self, categoria_id: Optional[int]) -> Decimal:
+        return self.costos.get(categoria_id) or self.base
+
+    def total(self, categoria_ids: Iterable[Optional[int]]) -> Decimal:
+        return sum((self.precio(c) for c in categoria_ids), _CERO)
+
+
+def get_matrices(competencia_ids: Iterable[int]) -> Dict[int, MatrizPrecios]:
+    """Matrices de varias competencias: caché primero, una consulta para las que falten."""
+    ids = set(competencia_ids)
+    if not ids:
+        return {}
+    cacheadas = cache.get_many([_clave(cid) for cid in ids])
+    matrices = {}
+    for cid in ids:
+        crudo = cacheadas.get(_clave(cid))
+        if crudo is not None:
+            matrices[cid] = MatrizPrecios(cid, *crudo)
+
+    faltantes = ids - matrices.keys()
+    if faltantes:
+        bases = dict(Competencia.objects.filter(id__in=faltantes).values_list('id', 'costo_inscripcion_base'))
+        costos = {cid: {} for cid in bases}
+        # Ante filas repetidas gana la primera, igual que el antiguo .first()
+        filas = CategoriaCompetencia.objects.filter(
+            competencia_id__in=bases.keys(), costo_especifico__gt=0
+        ).order_by('id').values_list('competencia_id', 'categoria_id', 'costo_especifico')
+        for cid, categoria_id, costo in filas:
+            costos[cid].setdefault(categoria_id, costo)
+        cache.set_many({_clave(cid): (bases[cid], costos[cid]) for cid in bases}, _TTL)
+        for cid in bases:
+            matrices[cid] = MatrizPrecios(cid, bases[cid], costos[cid])
+    return matrices
+
+
+def get_matriz(competencia_id: int) -> Optional[MatrizPrecios]:
+    return get_matrices([competencia_id]).get(competencia_id)
+
+
+def invalidar_matriz(competencia_id: int) -> None:
+    cache.delete(_clave(competencia_id))
+
+
+def costos_totales(inscripciones: Iterable[Inscripcion]) -> Dict[int, Decimal]:
+    """
+    Costo total de muchas inscripciones en una pasada: una consulta para las
+    participaciones (o ninguna si vienen prefetcheadas) y una por las matrices faltantes.
+    """
+    inscripciones = list(inscripciones)
+    if not inscripciones:
+        return {}
+
+    categorias: Dict[int, list] = {}
+    sin_prefetch = []
+    for ins in inscripciones:
+        prefetch = getattr(ins, '_prefetched_objects_cache', {}).get('participaciones')
+        if prefetch is not None:
+            categorias[ins.id] = [p.categoria_id for p in prefetch]
+        else:
+            categorias[ins.id] = []
+            sin_prefetch.append(ins.id)
+
+    if sin_prefetch:
+        filas = Participacion.objects.filter(inscripcion_id__in=sin_prefetch).values_list('inscripcion_id', 'categoria_id')
+        for inscripcion_id, categoria_id in filas:
+            categorias[inscripcion_id].append(categoria_id)
+
+    matrices = get_matrices(ins.competencia_id for ins in inscripciones)
+    return {
+        ins.id: matrices[ins.competencia_id].total(categorias[ins.id]) if ins.competencia_id in matrices else _CERO
+        for ins in inscripciones
+    }
+
+
+def _expresion_costo_total():
+    """Costo total de la inscripción externa (OuterRef('pk')) con las reglas de la matriz."""
+    moneda = DecimalField(max_digits=12, decimal_places=2)
+    costo_categoria = CategoriaCompetencia.objects.filter(
+        competencia_id=OuterRef('inscripcion__competencia_id'),
+        categoria_id=OuterRef('categoria_id'),
+        costo_especifico__gt=0,
+    ).order_by('id').values('costo_especifico')[:1]
+    precios = Participacion.objects.filter(inscripcion=OuterRef('pk')).annotate(
+        precio=Coalesce(Subquery(costo_categoria), F('inscripcion__competencia__costo_inscripcion_base'), output_field=moneda)
+    ).values('inscripcion').annotate(total=Sum('precio')).values('total')
+    return Coalesce(Subquery(precios, output_field=moneda), Value(_CERO), output_field=moneda)
+
+
+def anotar_costo_total(queryset, nombre: str = 'costo_total_anotado'):
+    """
+    Anota el costo total calculado en SQL (mismas reglas que la matriz),
+    útil para ordenar, filtrar o agregar sin traer las participaciones.
+    """
+    return queryset.annotate(**{nombre: _expresion_costo_total()})
+
+
+# --- RECÁLCULO DIFERIDO DEL TOTAL GUARDADO ---
+# Las señales de Participacion (y las operaciones masivas del queryset) solo anotan
+# la inscripción afectada; al confirmar la transacción se recalculan todas juntas
+# con un único UPDATE, una vez por inscripción aunque cambien varias participaciones.
+
+_pendientes = threading.local()
+
+
+def recalcular_totales(inscripcion_ids: Iterable[int]) -> int:
+    """Guarda Inscripcion.costo_inscripcion de varias inscripciones con un solo UPDATE."""
+    ids = set(inscripcion_ids)
+    if not ids:
+        return 0
+    return Inscripcion.objects.filter(id__in=ids).update(costo_inscripcion=_expresion_costo_total())
+
+
+def programar_recalculo(inscripcion_ids: Iterable[int], using: Optional[str] = None) -> None:
+    """
+    Recalcula el total de las inscripciones al confirmar la transacción en curso
+    (o en el acto si no hay transacción abierta).
+    """
+    ids = {i for i in inscripcion_ids if i is not None}
+    if not ids:
+        return
+    if not transaction.get_connection(using).in_atomic_block:
+        recalcular_totales(ids)
+        return
+    if not hasattr(_pendientes, 'ids'):
+        _pendientes.ids = set()
+    _pendientes.ids |= ids
+    # Se registra en cada llamada: si un savepoint se revierte con su callback,
+    # el de otra llamada igual vacía el conjunto; los que sobren no hacen nada.
+    transaction.on_commit(_vaciar_pendientes, using=using)
+
+
+def _vaciar_pendientes() -> None:
+    ids = getattr(_pendientes, 'ids', None)
+    if ids:
+        _pendientes.ids = set()
+        recalcular_totales(ids)
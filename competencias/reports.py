@@ -1,45 +1,58 @@
 from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter, landscape
+from reportlab.lib.pagesizes import A4, letter, landscape
 from reportlab.lib import colors
 from reportlab.lib.units import inch, cm
-from django.conf import settings
-import os
-from .models import AutoridadFirma
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import Flowable, LongTable, Paragraph, SimpleDocTemplate, Spacer, TableStyle
+from asgiref.sync import sync_to_async
+from itertools import chain, groupby
+from xml.sax.saxutils import escape
+from operator import itemgetter
+import io
+import zipfile
+from .imagenes import firmas_activas, imagen_foto
 
 # --- UTILIDADES ---
 
-def dibujar_firmas(c, width, y_position):
+def cargar_firmas():
+    """
+    Hasta 3 autoridades activas como (nombre, cargo, imagen), con la firma ya
+    decodificada desde la caché de imágenes (imagenes.py).
+    """
+    return firmas_activas()
+
+def dibujar_firmas(c, width, y_position, firmas=None):
     """Dibuja hasta 3 firmas activas al pie del documento."""
-    autoridades = AutoridadFirma.objects.filter(activo=True)[:3]
-    if not autoridades: return
+    if firmas is None:
+        firmas = cargar_firmas()
+    if not firmas: return
 
     ancho_zona = width - 100
-    espacio = ancho_zona / len(autoridades)
+    espacio = ancho_zona / len(firmas)
     start_x = 50
 
-    for i, aut in enumerate(autoridades):
+    for i, (nombre, cargo, imagen) in enumerate(firmas):
         center_x = start_x + (i * espacio) + (espacio / 2)
         
         # Firma (Imagen)
-        if aut.firma:
+        if imagen is not None:
             try:
-                path = os.path.join(settings.MEDIA_ROOT, aut.firma.name)
                 # Aspecto 2:1 para firma
-                c.drawImage(path, center_x - 40, y_position + 15, width=80, height=40, mask='auto', preserveAspectRatio=True)
-            except: pass
+                c.drawImage(imagen, center_x - 40, y_position + 15, width=80, height=40, mask='auto', preserveAspectRatio=True)
+            except Exception: pass
         
         # Línea y Cargo
         c.setLineWidth(1)
         c.line(center_x - 60, y_position + 15, center_x + 60, y_position + 15)
         c.setFont("Helvetica-Bold", 9)
-        c.drawCentredString(center_x, y_position + 5, aut.nombre)
+        c.drawCentredString(center_x, y_position + 5, nombre)
         c.setFont("Helvetica", 8)
-        c.drawCentredString(center_x, y_position - 5, aut.cargo)
+        c.drawCentredString(center_x, y_position - 5, cargo)
 
 # --- REPORTES PRINCIPALES ---
 
-def generar_diploma_pdf(response, resultado):
-    c = canvas.Canvas(response, pagesize=landscape(letter))
+def dibujar_diploma(c, nombre, competencia_nombre, puntaje, codigo_verificacion, firmas):
+    """Una página de diploma en el canvas 'c' (carta apaisada)."""
     width, height = landscape(letter)
 
     # Marco
@@ -56,55 +69,145 @@ def generar_diploma_pdf(response, resultado):
     
     # Nombre Atleta
     c.setFont("Helvetica-Bold", 24)
-    nombre = "Atleta Desconocido"
-    if resultado.inscripcion and resultado.inscripcion.deportista:
-        nombre = f"{resultado.inscripcion.deportista.first_name} {resultado.inscripcion.deportista.last_name}"
-    
     c.drawCentredString(width/2, height - 160, nombre.upper())
     
     # Detalle
     c.setFont("Helvetica", 14)
-    competencia_nombre = resultado.inscripcion.competencia.name if resultado.inscripcion else "Competencia"
     texto = f"Por su destacada participación en {competencia_nombre}"
     c.drawCentredString(width/2, height - 200, texto)
     
     c.setFont("Helvetica-Bold", 16)
-    c.drawCentredString(width/2, height - 230, f"PUNTAJE: {resultado.puntaje}")
+    c.drawCentredString(width/2, height - 230, f"PUNTAJE: {puntaje}")
 
     # Código QR / Verificación
     c.setFont("Courier", 10)
-    c.drawString(40, 40, f"ID Verificación: {resultado.codigo_verificacion}")
+    c.drawString(40, 40, f"ID Verificación: {codigo_verificacion}")
 
     # Firmas
-    dibujar_firmas(c, width, 60)
+    dibujar_firmas(c, width, 60, firmas)
 
     c.showPage()
+
+def generar_diploma_pdf(response, resultado, firmas=None):
+    c = canvas.Canvas(response, pagesize=landscape(letter))
+
+    nombre = "Atleta Desconocido"
+    if resultado.inscripcion and resultado.inscripcion.deportista:
+        nombre = f"{resultado.inscripcion.deportista.first_name} {resultado.inscripcion.deportista.apellido_paterno}"
+    competencia_nombre = resultado.inscripcion.competencia.name if resultado.inscripcion else "Competencia"
+
+    dibujar_diploma(c, nombre, competencia_nombre, resultado.puntaje, resultado.codigo_verificacion,
+                    cargar_firmas() if firmas is None else firmas)
     c.save()
 
-def generar_credencial_pdf(response, deportista):
-    """Genera un carnet de deportista en tamaño tarjeta."""
-    card_width = 8.56 * cm
-    card_height = 5.4 * cm
-    
-    c = canvas.Canvas(response, pagesize=(card_width, card_height))
-    
+def generar_diplomas_pdf(destino, competencia_nombre, filas, firmas):
+    """
+    Todos los diplomas en un solo PDF, una página por fila
+    (dicts con first_name, apellido_paterno, puntaje, codigo_verificacion).
+    Las páginas van comprimidas y cada firma se incrusta una sola vez.
+    """
+    c = canvas.Canvas(destino, pagesize=landscape(letter), pageCompression=1)
+    for fila in filas:
+        dibujar_diploma(c, f"{fila['first_name']} {fila['apellido_paterno']}", competencia_nombre,
+                        fila['puntaje'], fila['codigo_verificacion'], firmas)
+    c.save()
+
+# --- SALIDA INCREMENTAL (StreamingHttpResponse) ---
+
+class _Tubo(io.RawIOBase):
+    """Destino no buscable para zipfile: acumula lo escrito hasta que se vacía."""
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        self._buffer += datos
+        return len(datos)
+
+    def vaciar(self):
+        datos = bytes(self._buffer)
+        self._buffer.clear()
+        return datos
+
+def zip_diplomas(competencia_nombre, filas, firmas):
+    """Genera el ZIP diploma por diploma: en memoria solo hay uno a la vez."""
+    tubo = _Tubo()
+    with zipfile.ZipFile(tubo, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for fila in filas:
+            pdf = io.BytesIO()
+            c = canvas.Canvas(pdf, pagesize=landscape(letter))
+            dibujar_diploma(c, f"{fila['first_name']} {fila['apellido_paterno']}", competencia_nombre,
+                            fila['puntaje'], fila['codigo_verificacion'], firmas)
+            c.save()
+            zf.writestr(f"Diploma_{fila['id']}_{fila['apellido_paterno']}.pdf", pdf.getvalue())
+            yield tubo.vaciar()
+    yield tubo.vaciar()
+
+def bloques_archivo(archivo, tam=64 * 1024):
+    archivo.seek(0)
+    with archivo:
+        while True:
+            bloque = archivo.read(tam)
+            if not bloque:
+                return
+            yield bloque
+
+async def iterar_async(generador):
+    """
+    Bajo ASGI (daphne) Django acumula en memoria los iteradores síncronos;
+    con uno asíncrono cada trozo se produce en el hilo de la BD y se envía al momento.
+    """
+    siguiente = sync_to_async(next, thread_sensitive=True)
+    while True:
+        trozo = await siguiente(generador, None)
+        if trozo is None:
+            return
+        yield trozo
+
+# --- CREDENCIALES ---
+
+CARD_WIDTH = 8.56 * cm
+CARD_HEIGHT = 5.4 * cm
+
+def datos_credencial(deportista):
+    """Lo que imprime dibujar_credencial, tomado de un Deportista."""
+    cat = None
+    # Ajuste por si el modelo Deportista no tiene 'categoria_nombre' directamente
+    if hasattr(deportista, 'categoria') and deportista.categoria:
+        cat = deportista.categoria.name
+    return {
+        'nombre': f"{deportista.first_name} {deportista.apellido_paterno}",
+        'ci': deportista.ci,
+        'club': deportista.club.name if deportista.club else None,
+        'categoria': cat or deportista.get_tipo_modalidad_display(),
+        'vence': deportista.vencimiento_credencial,
+        'foto': deportista.foto.name if deportista.foto else None,
+    }
+
+def dibujar_credencial(c, x, y, datos):
+    """Un carnet con su esquina inferior izquierda en (x, y)."""
+    c.saveState()
+    c.translate(x, y)
+
     # Fondo / Diseño
     c.setFillColor(colors.navy)
-    c.rect(0, 0, card_width, card_height, fill=1)
-    
+    c.rect(0, 0, CARD_WIDTH, CARD_HEIGHT, fill=1)
+
     # Cabecera
     c.setFillColor(colors.white)
     c.setFont("Helvetica-Bold", 10)
-    c.drawCentredString(card_width/2, card_height - 15, "FEDERACIÓN DE TIRO")
+    c.drawCentredString(CARD_WIDTH/2, CARD_HEIGHT - 15, "FEDERACIÓN DE TIRO")
     c.setFont("Helvetica", 6)
-    c.drawCentredString(card_width/2, card_height - 25, "CREDENCIAL DE ATLETA")
-    
-    # Foto (Placeholder o Real)
-    if deportista.foto:
-        try:
-            path_foto = os.path.join(settings.MEDIA_ROOT, deportista.foto.name)
-            c.drawImage(path_foto, 5, 20, width=40, height=40, preserveAspectRatio=True)
-        except:
+    c.drawCentredString(CARD_WIDTH/2, CARD_HEIGHT - 25, "CREDENCIAL DE ATLETA")
+
+    # Foto (miniatura cacheada, o placeholder)
+    if datos.get('foto'):
+        foto = imagen_foto(datos['foto'])
+        if foto is not None:
+            c.drawImage(foto, 5, 20, width=40, height=40, preserveAspectRatio=True)
+        else:
             c.setFillColor(colors.white)
             c.rect(5, 20, 40, 40, fill=1)
     else:
@@ -114,76 +217,145 @@ def generar_credencial_pdf(response, deportista):
     # Datos
     c.setFillColor(colors.white)
     c.setFont("Helvetica-Bold", 9)
-    nombre_completo = f"{deportista.first_name} {deportista.last_name}"
-    if len(nombre_completo) > 20: c.setFont("Helvetica-Bold", 7)
-    
-    c.drawString(50, 50, nombre_completo.upper())
-    
+    if len(datos['nombre']) > 20: c.setFont("Helvetica-Bold", 7)
+    c.drawString(50, 50, datos['nombre'].upper())
+
     c.setFont("Helvetica", 6)
-    c.drawString(50, 40, f"CI: {deportista.ci}")
-    
-    club_nombre = deportista.club.name if deportista.club else "PARTICULAR"
-    c.drawString(50, 32, f"CLUB: {club_nombre}")
-    
-    # Ajuste por si el modelo Deportista no tiene 'categoria_nombre' directamente
-    cat = "GENERAL"
-    if hasattr(deportista, 'categoria') and deportista.categoria:
-        cat = deportista.categoria.name
-    c.drawString(50, 24, f"CATEGORÍA: {cat}")
+    c.drawString(50, 40, f"CI: {datos['ci']}")
+    c.drawString(50, 32, f"CLUB: {datos.get('club') or 'PARTICULAR'}")
+    c.drawString(50, 24, f"CATEGORÍA: {datos.get('categoria') or 'GENERAL'}")
+    if datos.get('vence'):
+        c.drawString(50, 16, f"VENCE: {datos['vence'].strftime('%d/%m/%Y')}")
+
+    c.restoreState()
 
+def generar_credencial_pdf(response, deportista):
+    """Genera un carnet de deportista en tamaño tarjeta."""
+    c = canvas.Canvas(response, pagesize=(CARD_WIDTH, CARD_HEIGHT))
+    dibujar_credencial(c, 0, 0, datos_credencial(deportista))
     c.showPage()
     c.save()
 
-def generar_pdf_ranking(response, competencia, ranking_data):
+def generar_credenciales_pdf(destino, filas, pagesize=A4, margen=0.5 * cm):
     """
-    Genera el reporte de ranking para una competencia.
-    ranking_data viene del RankingService.get_ranking_competencia_pdf
+    Varias credenciales por hoja (2x5 en A4 o carta), en el orden de 'filas'
+    (dicts como los de datos_credencial), con líneas de corte grises.
+    Devuelve la cantidad de credenciales dibujadas.
     """
-    c = canvas.Canvas(response, pagesize=letter)
-    width, height = letter
-    y = height - 50
+    ancho, alto = pagesize
+    columnas = int((ancho - 2 * margen) // CARD_WIDTH)
+    filas_hoja = int((alto - 2 * margen) // CARD_HEIGHT)
+    if columnas < 1 or filas_hoja < 1:
+        raise ValueError("La hoja es más chica que una credencial.")
+    por_hoja = columnas * filas_hoja
+    # Grilla centrada en la hoja
+    x0 = (ancho - columnas * CARD_WIDTH) / 2
+    y0 = alto - (alto - filas_hoja * CARD_HEIGHT) / 2
 
-    # Título
-    c.setFont("Helvetica-Bold", 16)
-    c.drawString(50, y, f"RANKING OFICIAL: {competencia.name}")
-    y -= 25
-    c.setFont("Helvetica", 12)
-    c.drawString(50, y, f"Fecha: {competencia.start_date} | Estado: {competencia.status}")
-    y -= 30
-
-    # Cabecera Tabla
-    c.setFont("Helvetica-Bold", 10)
-    c.drawString(50, y, "PUESTO")
-    c.drawString(100, y, "ATLETA")
-    c.drawString(300, y, "CLUB")
-    c.drawString(450, y, "PUNTAJE")
-    y -= 5
-    c.line(50, y, 550, y)
-    y -= 15
-
-    # Contenido (ranking_data es un diccionario con 'items' que es el QuerySet)
-    resultados = ranking_data.get('items', [])
-    
-    c.setFont("Helvetica", 10)
-    for i, res in enumerate(resultados, 1):
-        if y < 100: # Nueva página si se acaba el espacio
+    c = canvas.Canvas(destino, pagesize=pagesize, pageCompression=1)
+    total = 0
+    for total, datos in enumerate(filas, 1):
+        i = (total - 1) % por_hoja
+        if i == 0 and total > 1:
             c.showPage()
-            y = height - 50
-        
-        nombre = f"{res.inscripcion.deportista.first_name} {res.inscripcion.deportista.last_name}"
-        club = res.inscripcion.club.name if res.inscripcion.club else "Sin Club"
-        
-        c.drawString(60, y, str(i))
-        c.drawString(100, y, nombre)
-        c.drawString(300, y, club)
-        c.drawString(450, y, str(res.puntaje))
-        y -= 20
-
-    # Firmas al final
-    dibujar_firmas(c, width, 50)
-    
+        x = x0 + (i % columnas) * CARD_WIDTH
+        y = y0 - (i // columnas + 1) * CARD_HEIGHT
+        dibujar_credencial(c, x, y, datos)
+        c.setStrokeColor(colors.lightgrey)
+        c.setLineWidth(0.3)
+        c.rect(x, y, CARD_WIDTH, CARD_HEIGHT)
     c.showPage()
     c.save()
+    return total
+
+# --- RANKING (platypus) ---
+# Tablas LongTable de a lo sumo FILAS_POR_TABLA filas con la cabecera repetida
+# en cada página: el costo de partir tablas entre páginas crece con el tamaño
+# de cada tabla, así que miles de filas se maquetan en tiempo lineal.
+
+FILAS_POR_TABLA = 500
+_CABECERA_RANKING = ["PUESTO", "ATLETA", "CLUB", "PUNTAJE", "X"]
+_ANCHOS_RANKING = [50, 190, 170, 60, 42]
+_ESTILO_RANKING = TableStyle([
+    ('FONT', (0, 0), (-1, 0), 'Helvetica-Bold', 9),
+    ('FONT', (0, 1), (-1, -1), 'Helvetica', 9),
+    ('LINEBELOW', (0, 0), (-1, 0), 1, colors.black),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#F2F2F2')]),
+    ('ALIGN', (0, 0), (0, -1), 'CENTER'),
+    ('ALIGN', (3, 0), (-1, -1), 'RIGHT'),
+    ('TOPPADDING', (0, 0), (-1, -1), 2),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+])
+
+
+class _FirmasFlowable(Flowable):
+    """Bloque de firmas al final del documento, con dibujar_firmas."""
+    def __init__(self, firmas, margen_izquierdo):
+        super().__init__()
+        self.firmas = firmas
+        self.margen_izquierdo = margen_izquierdo
+
+    def wrap(self, ancho_disponible, alto_disponible):
+        self.ancho = ancho_disponible
+        return ancho_disponible, 90
+
+    def draw(self):
+        # dibujar_firmas trabaja en coordenadas de página
+        self.canv.translate(-self.margen_izquierdo, 0)
+        dibujar_firmas(self.canv, self.ancho + 2 * self.margen_izquierdo, 20, self.firmas)
+
+
+def _tabla_ranking(filas):
+    return LongTable([_CABECERA_RANKING] + filas, colWidths=_ANCHOS_RANKING, repeatRows=1, style=_ESTILO_RANKING)
+
+
+def _historia_ranking(items, estilos):
+    """Título por categoría y sus tablas, leyendo las filas una sola vez."""
+    for _, filas in groupby(items, key=itemgetter('categoria_id')):
+        primera = next(filas)
+        yield Paragraph(escape(primera['categoria_nombre'] or "Sin categoría"), estilos['Heading2'])
+        bloque = []
+        for fila in chain([primera], filas):
+            bloque.append([
+                str(fila['posicion']),
+                f"{fila['first_name']} {fila['apellido_paterno']}"[:40],
+                (fila['club'] or "Sin Club")[:36],
+                str(fila['puntaje']),
+                str(fila.get('x_count', '')),
+            ])
+            if len(bloque) == FILAS_POR_TABLA:
+                yield _tabla_ranking(bloque)
+                bloque = []
+        if bloque:
+            yield _tabla_ranking(bloque)
+        yield Spacer(1, 12)
+
+
+def generar_pdf_ranking(response, competencia, ranking_data, firmas=None):
+    """
+    Genera el reporte de ranking para una competencia.
+    ranking_data viene del RankingService.get_ranking_competencia_pdf: 'items'
+    son filas (dicts) ordenadas por categoría y posición.
+    """
+    margen = 50
+    estilos = getSampleStyleSheet()
+    doc = SimpleDocTemplate(response, pagesize=letter, leftMargin=margen, rightMargin=margen,
+                            topMargin=margen, bottomMargin=margen, pageCompression=1,
+                            title=ranking_data.get('titulo', ''))
+
+    def pie(c, d):
+        c.setFont("Helvetica", 8)
+        c.drawString(margen, 30, competencia.name)
+        c.drawRightString(letter[0] - margen, 30, f"Página {d.page}")
+
+    historia = [
+        Paragraph(f"RANKING OFICIAL: {escape(competencia.name)}", estilos['Title']),
+        Paragraph(f"Fecha: {competencia.start_date} | Estado: {competencia.status}", estilos['Normal']),
+        Spacer(1, 12),
+    ]
+    historia.extend(_historia_ranking(ranking_data.get('items', []), estilos))
+    historia.append(_FirmasFlowable(cargar_firmas() if firmas is None else firmas, margen))
+    doc.build(historia, onFirstPage=pie, onLaterPages=pie)
 
 def generar_recibo_pdf(response, inscripcion):
     """Genera un recibo simple de inscripción."""
@@ -195,7 +367,7 @@ def generar_recibo_pdf(response, inscripcion):
     
     c.setFont("Helvetica", 12)
     c.drawString(50, height - 100, f"Fecha: {inscripcion.fecha_inscripcion.strftime('%d/%m/%Y')}")
-    c.drawString(50, height - 120, f"Recibí de: {inscripcion.deportista.first_name} {inscripcion.deportista.last_name}")
+    c.drawString(50, height - 120, f"Recibí de: {inscripcion.deportista.first_name} {inscripcion.deportista.apellido_paterno}")
     
     monto = inscripcion.monto_pagado
     c.drawString(50, height - 140, f"La suma de: {monto} Bolivianos")
@@ -1,8 +1,9 @@
 from rest_framework import serializers
+from django.urls import reverse
 from django.db import transaction
 from .models import (
     Competencia, Modalidad, Categoria, Poligono, Juez, 
-    Inscripcion, Resultado, Gasto, CategoriaCompetencia, Participacion
+    Inscripcion, Resultado, Gasto, CategoriaCompetencia, Participacion, TrabajoPDF
 )
 
 # --- SERIALIZADORES AUXILIARES ---
@@ -71,6 +72,7 @@ class InscripcionSerializer(serializers.ModelSerializer):
     club_nombre = serializers.ReadOnlyField(source='club.name')
     competencia_nombre = serializers.ReadOnlyField(source='competencia.name')
     participaciones = ParticipacionSerializer(many=True, read_only=True)
+    costo_total = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
 
     class Meta:
         model = Inscripcion
@@ -92,28 +94,16 @@ class InscripcionCreateSerializer(serializers.ModelSerializer):
         with transaction.atomic():
             inscripcion = Inscripcion.objects.create(**validated_data)
             
-            for item in participaciones_data:
-                categoria = item['categoria']
-                # Buscamos el costo configurado para esta competencia
-                try:
-                    cat_comp = CategoriaCompetencia.objects.get(
-                        competencia=inscripcion.competencia,
-                        categoria=categoria
-                    )
-                    costo = cat_comp.costo
-                except CategoriaCompetencia.DoesNotExist:
-                    costo = 0 
-                
-                # Creamos la participación
-                Participacion.objects.create(
+            # Una sola inserción; el costo sale de la matriz de precios de la competencia
+            # y el total se recalcula una vez al confirmar la transacción
+            Participacion.objects.bulk_create([
+                Participacion(
                     inscripcion=inscripcion,
-                    categoria=categoria,
-                    modalidad=categoria.modalidad,
-                    costo_cobrado=costo
+                    categoria=item['categoria'],
+                    modalidad_id=item['categoria'].modalidad_id
                 )
-            
-            # Recalcular totales con las reglas de negocio (Techo máximo)
-            inscripcion.actualizar_total()
+                for item in participaciones_data
+            ])
             
         return inscripcion
 
@@ -132,4 +122,35 @@ class ScoreSubmissionSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Resultado
-        fields = ['inscripcion', 'ronda_o_serie', 'series', 'juez_que_registro']
\ No newline at end of file
+        fields = ['inscripcion', 'ronda_o_serie', 'series', 'juez_que_registro']
+
+class ScoreBulkItemSerializer(serializers.Serializer):
+    """Un elemento del envío masivo de puntajes (planilla de una tanda)."""
+    inscripcion = serializers.IntegerField(min_value=1)
+    participacion = serializers.IntegerField(min_value=1, required=False, allow_null=True)
+    series = serializers.ListField(child=serializers.DictField(), allow_empty=True)
+
+class RosterItemSerializer(serializers.Serializer):
+    """Un tirador de la nómina: deportista, categorías y arma (opcional)."""
+    deportista = serializers.IntegerField(min_value=1)
+    categorias = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False)
+    arma = serializers.IntegerField(min_value=1, required=False, allow_null=True)
+
+class RosterSerializer(serializers.Serializer):
+    """Nómina completa de un club para una competencia."""
+    competencia = serializers.PrimaryKeyRelatedField(queryset=Competencia.objects.all())
+    inscripciones = RosterItemSerializer(many=True, allow_empty=False)
+    parcial = serializers.BooleanField(default=False, help_text="Inscribir las filas válidas aunque otras tengan errores.")
+
+class TrabajoPDFSerializer(serializers.ModelSerializer):
+    """Estado de un PDF encolado; 'descarga' queda disponible cuando estado es LISTO."""
+    descarga = serializers.SerializerMethodField()
+
+    class Meta:
+        model = TrabajoPDF
+        fields = ['id', 'tipo', 'estado', 'nombre_archivo', 'error', 'creado_en', 'terminado_en', 'descarga']
+
+    def get_descarga(self, obj):
+        request = self.context.get('request')
+        ruta = reverse('trabajos-pdf-descargar', args=[obj.id])
+        return request.build_absolute_uri(ruta) if request else ruta
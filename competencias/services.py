@@ -1,19 +1,29 @@
 from django.db import transaction
-from django.db.models import Sum, Q
+from django.core.cache import cache
+from django.db.models import Count, DecimalField, F, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.core.exceptions import ValidationError
-from typing import Dict, Any
+from django.utils import timezone
+from typing import Dict, Any, List, Optional
 from decimal import Decimal
 from datetime import date
+import logging
 
-# Channels
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from redis.exceptions import RedisError
 
 # Modelos
-from .models import Competencia, Resultado, Inscripcion, Participacion
+from .models import Categoria, Competencia, Resultado, Inscripcion, Participacion, PosicionRanking
 from deportistas.models import Arma, Deportista
-from .serializers import ResultadoSerializer
+from deportistas.services import GestionDeportistaService
+from deportistas.busqueda import buscar as buscar_deportistas
+from .serializers import ResultadoSerializer, RosterSerializer, ScoreBulkItemSerializer
 from .calculadora_puntajes import CalculadoraPuntajes
+from .leaderboard import get_leaderboard
+from .broadcast import get_broadcaster
+from .precios import get_matriz
+from .finanzas import programar_resumen, resumen_periodo
+
+logger = logging.getLogger(__name__)
 
 class CompetitionService:
     @staticmethod
@@ -38,8 +48,12 @@ class ResultsService:
         validated_data = serializer.validated_data
 
         inscripcion = validated_data['inscripcion']
+        participacion = validated_data.get('participacion')
         series = validated_data.get('series', [])
 
+        if participacion and participacion.inscripcion_id != inscripcion.id:
+            raise ValidationError("La participación no corresponde a la inscripción.")
+
         # 2. Cálculo
         calculo = CalculadoraPuntajes.calcular_total_competencia(series)
         puntaje_final = calculo['total_puntos']
@@ -52,83 +66,615 @@ class ResultsService:
                 'meta': 'Calculado via ResultsService v2'
             }
             
+            defaults = {
+                'puntaje': puntaje_final,
+                'detalles_json': detalles
+            }
+            if participacion:
+                defaults['participacion'] = participacion
+
             # IDEMPOTENCIA: Si ya existe un resultado para esta inscripción, lo actualizamos
             resultado, created = Resultado.objects.update_or_create(
                 inscripcion=inscripcion,
-                defaults={
-                    'puntaje': puntaje_final,
-                    'detalles_json': detalles
-                }
+                defaults=defaults
             )
-            
+
+            # La señal post_save ya lo reubicó en el ranking y publicó en el leaderboard
             # 4. Preparar notificación WebSocket (Para ejecutar post-commit)
-            channel_layer = get_channel_layer()
-            group_name = f"competencia_{inscripcion.competencia.id}"
+            competencia_id = inscripcion.competencia_id
+            datos_ws = ResultsService._datos_ws(resultado, inscripcion, calculo['total_x'], not created)
             
-            deportista = inscripcion.deportista
-            nombre_dep = f"{deportista.first_name} {deportista.apellido_paterno}"
-            
-            payload = {
-                "type": "update_score",
-                "data": {
-                    "id": resultado.id,
-                    "deportista": nombre_dep,
-                    "club": inscripcion.club.name if inscripcion.club else "Sin Club",
-                    "puntaje_total": str(resultado.puntaje),
-                    "x_count": calculo['total_x'],
-                    "is_update": not created
-                }
-            }
-            
-            # Enviamos el mensaje SOLO si la transacción se confirma exitosamente
+            # Enviamos el mensaje SOLO si la transacción se confirma exitosamente.
+            # El broadcaster agrupa los envíos de una misma ventana en un solo frame.
             transaction.on_commit(
-                lambda: async_to_sync(channel_layer.group_send)(group_name, payload)
+                lambda: get_broadcaster().publicar(competencia_id, [datos_ws])
             )
 
         return resultado
 
+    @staticmethod
+    def procesar_envio_puntajes_lote(data: List[Dict[str, Any]], context: Dict[str, Any]) -> List[Resultado]:
+        """
+        Versión masiva de procesar_envio_puntajes para la planilla completa de una tanda.
+        Valida todo junto, escribe en una sola transacción y entrega un único
+        lote por competencia al broadcaster de WebSocket.
+        """
+        # 1. Validación (si una fila es inválida se rechaza el envío completo)
+        serializer = ScoreBulkItemSerializer(data=data, many=True, context=context)
+        serializer.is_valid(raise_exception=True)
+
+        # Si una inscripción viene repetida, prevalece la última fila
+        filas = {item['inscripcion']: item for item in serializer.validated_data}
+        envios = {pk: item['series'] for pk, item in filas.items()}
+        if not envios:
+            raise ValidationError("No se enviaron puntajes.")
+
+        inscripciones = Inscripcion.objects.select_related(
+            'deportista', 'club', 'competencia'
+        ).in_bulk(list(envios))
+        faltantes = [str(pk) for pk in envios if pk not in inscripciones]
+        if faltantes:
+            raise ValidationError(f"Inscripciones inexistentes: {', '.join(faltantes)}.")
+
+        # Participaciones (categoría) opcionales, verificadas en una sola consulta
+        participaciones = {pk: item['participacion'] for pk, item in filas.items() if item.get('participacion')}
+        if participaciones:
+            validas = set(Participacion.objects.filter(
+                pk__in=participaciones.values(), inscripcion_id__in=participaciones.keys()
+            ).values_list('pk', 'inscripcion_id'))
+            invalidas = [str(pk) for pk, part in participaciones.items() if (part, pk) not in validas]
+            if invalidas:
+                raise ValidationError(f"Participación inválida para las inscripciones: {', '.join(invalidas)}.")
+
+        # 2. Cálculo en lote
+        ids = list(envios)
+        calculos = dict(zip(ids, CalculadoraPuntajes.calcular_totales_lote([envios[pk] for pk in ids])))
+
+        # 3. Guardado Transaccional (un UPDATE masivo + un INSERT masivo)
+        with transaction.atomic():
+            existentes = {
+                r.inscripcion_id: r
+                for r in Resultado.objects.select_for_update().filter(inscripcion_id__in=ids)
+            }
+            ahora = timezone.now()
+            actualizar, crear = [], []
+
+            for pk in ids:
+                calculo = calculos[pk]
+                detalles = {
+                    'series': envios[pk],
+                    'x_count': calculo['total_x'],
+                    'meta': 'Calculado via ResultsService v2 (lote)'
+                }
+                resultado = existentes.get(pk)
+                if resultado:
+                    resultado.puntaje = calculo['total_puntos']
+                    resultado.detalles_json = detalles
+                    resultado.fecha_registro = ahora
+                    if pk in participaciones:
+                        resultado.participacion_id = participaciones[pk]
+                    actualizar.append(resultado)
+                else:
+                    crear.append(Resultado(
+                        inscripcion=inscripciones[pk],
+                        participacion_id=participaciones.get(pk),
+                        puntaje=calculo['total_puntos'],
+                        detalles_json=detalles,
+                        codigo_verificacion=Resultado.generar_codigo_verificacion()
+                    ))
+
+            if actualizar:
+                Resultado.objects.bulk_update(
+                    actualizar, ['puntaje', 'detalles_json', 'fecha_registro', 'participacion']
+                )
+            if crear:
+                Resultado.objects.bulk_create(crear)
+
+            # Ranking: se recalcula por competencia escribiendo solo las filas que cambian.
+            # El leaderboard en vivo se invalida y se reconstruye en la próxima lectura.
+            for competencia_id in {ins.competencia_id for ins in inscripciones.values()}:
+                RankingService.reconstruir(competencia_id)
+                transaction.on_commit(
+                    lambda cid=competencia_id: RankingService.invalidar_leaderboard(cid)
+                )
+
+            # 4. Un solo lote WebSocket por competencia (post-commit)
+            lotes_ws: Dict[int, List[Dict[str, Any]]] = {}
+            resultados = []
+            for resultado in actualizar + crear:
+                inscripcion = inscripciones[resultado.inscripcion_id]
+                resultado.inscripcion = inscripcion
+                resultados.append(resultado)
+                lotes_ws.setdefault(inscripcion.competencia_id, []).append(
+                    ResultsService._datos_ws(
+                        resultado, inscripcion, calculos[inscripcion.pk]['total_x'],
+                        inscripcion.pk in existentes
+                    )
+                )
+
+            def enviar_lotes():
+                for competencia_id, datos in lotes_ws.items():
+                    get_broadcaster().publicar(competencia_id, datos)
+
+            transaction.on_commit(enviar_lotes)
+
+        return resultados
+
+    @staticmethod
+    def _datos_ws(resultado: Resultado, inscripcion: Inscripcion, x_count: int, is_update: bool) -> Dict[str, Any]:
+        """Payload de un puntaje para el marcador en vivo."""
+        deportista = inscripcion.deportista
+        return {
+            "id": resultado.id,
+            "deportista": f"{deportista.first_name} {deportista.apellido_paterno}",
+            "club": inscripcion.club.name if inscripcion.club else "Sin Club",
+            "puntaje_total": str(resultado.puntaje),
+            "x_count": x_count,
+            "is_update": is_update
+        }
+
     @staticmethod
     def get_official_results_data(competencia: Competencia) -> Dict[str, Any]:
-        resultados = Resultado.objects.filter(
-            inscripcion__competencia=competencia
-        ).select_related('inscripcion__deportista', 'inscripcion__club').order_by('-puntaje')
-        
+        """Resultados oficiales leídos del ranking materializado, por categoría y posición."""
+        posiciones = list(
+            PosicionRanking.objects.filter(competencia=competencia).select_related(
+                'categoria',
+                'resultado__inscripcion__deportista',
+                'resultado__inscripcion__club',
+                'resultado__inscripcion__competencia'
+            ).order_by('categoria_id', 'posicion')
+        )
+        datos = ResultadoSerializer([fila.resultado for fila in posiciones], many=True).data
+        for fila, item in zip(posiciones, datos):
+            item['posicion'] = fila.posicion
+            item['categoria_id'] = fila.categoria_id
+            item['categoria_nombre'] = fila.categoria.name if fila.categoria else "General"
+
         return {
             "competencia": competencia.name,
-            "total_participantes": resultados.count(),
-            "resultados": ResultadoSerializer(resultados, many=True).data
+            "total_participantes": len(posiciones),
+            "resultados": datos
         }
 
-# ... (Mantén las clases RankingService y ReportService igual que antes, son seguras)
+    @staticmethod
+    def get_filas_diplomas(competencia: Competencia, categoria_id: Optional[int] = None, podio: bool = False):
+        """
+        Datos de todos los diplomas de la competencia en una sola consulta,
+        leídos por tandas (iterator) para no cargar la lista completa.
+        """
+        resultados = Resultado.objects.filter(inscripcion__competencia=competencia, es_descalificado=False)
+        if categoria_id is not None:
+            resultados = resultados.filter(posicion_ranking__categoria_id=categoria_id)
+        if podio:
+            resultados = resultados.filter(posicion_ranking__posicion__lte=3)
+        return resultados.order_by(
+            'posicion_ranking__categoria_id', 'posicion_ranking__posicion', 'inscripcion__deportista__apellido_paterno'
+        ).values(
+            'id', 'puntaje', 'codigo_verificacion',
+            first_name=F('inscripcion__deportista__first_name'),
+            apellido_paterno=F('inscripcion__deportista__apellido_paterno'),
+        ).iterator(chunk_size=200)
+
+class InscripcionService:
+
+    @staticmethod
+    def inscribir_nomina(data: Dict[str, Any], user) -> Dict[str, Any]:
+        """
+        Inscribe la nómina completa de un club en una competencia.
+        Valida todas las filas con unas pocas consultas (deportistas con su
+        elegibilidad anotada, categorías, armas e inscripciones previas), cotiza con la matriz de precios y crea
+        Inscripcion/Participacion con bulk_create en una sola transacción.
+        Devuelve {'creadas': [...], 'errores': [{'fila', 'deportista', 'errores'}]}.
+        Sin 'parcial', cualquier error cancela la nómina completa.
+        """
+        serializer = RosterSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        competencia = serializer.validated_data['competencia']
+        filas = serializer.validated_data['inscripciones']
+        parcial = serializer.validated_data['parcial']
+
+        if competencia.status != 'Abierta':
+            raise ValidationError("La competencia no está abierta a inscripciones.")
+
+        deportista_ids = {f['deportista'] for f in filas}
+        # Elegibilidad calculada en SQL para toda la nómina
+        deportistas = Deportista.objects.con_elegibilidad(competencia.start_date).in_bulk(deportista_ids)
+        ya_inscritos = set(Inscripcion.objects.filter(
+            competencia=competencia, deportista_id__in=deportista_ids
+        ).values_list('deportista_id', flat=True))
+        habilitadas = dict(Categoria.objects.filter(
+            categoriacompetencia__competencia=competencia
+        ).values_list('id', 'modalidad_id'))
+        arma_ids = {f['arma'] for f in filas if f.get('arma')}
+        armas = dict(Arma.objects.filter(id__in=arma_ids).values_list('id', 'deportista_id')) if arma_ids else {}
+        matriz = get_matriz(competencia.id)
+
+        # Un representante de club solo inscribe a sus propios deportistas
+        club_usuario = None
+        if getattr(user, 'role', None) == 'CLUB':
+            club_usuario = getattr(user, 'club_id', None)
+            if not club_usuario:
+                # Sin club asignado no es "sin restricción": no puede inscribir a nadie
+                raise ValidationError("Su usuario no tiene un club asignado.")
+
+        validas, errores, vistos = [], [], set()
+        for i, fila in enumerate(filas):
+            problemas = []
+            deportista = deportistas.get(fila['deportista'])
+            if deportista is None:
+                problemas.append("El deportista no existe.")
+            else:
+                motivo = GestionDeportistaService.motivo_no_elegible(deportista)
+                if motivo:
+                    problemas.append(motivo)
+                if club_usuario and deportista.club_id != club_usuario:
+                    problemas.append("El deportista no pertenece a su club.")
+            if fila['deportista'] in ya_inscritos:
+                problemas.append("El deportista ya está inscrito en esta competencia.")
+            if fila['deportista'] in vistos:
+                problemas.append("El deportista está repetido en la nómina.")
+            vistos.add(fila['deportista'])
+
+            no_habilitadas = [str(c) for c in fila['categorias'] if c not in habilitadas]
+            if no_habilitadas:
+                problemas.append(f"Categorías no habilitadas en la competencia: {', '.join(no_habilitadas)}.")
+            if fila.get('arma') and armas.get(fila['arma']) != fila['deportista']:
+                problemas.append("El arma no existe o no pertenece al deportista.")
+
+            if problemas:
+                errores.append({'fila': i, 'deportista': fila['deportista'], 'errores': problemas})
+            else:
+                validas.append((deportista, fila))
+
+        if errores and not parcial:
+            return {'creadas': [], 'errores': errores}
+
+        with transaction.atomic():
+            inscripciones = Inscripcion.objects.bulk_create([
+                Inscripcion(
+                    competencia=competencia,
+                    deportista=deportista,
+                    club_id=deportista.club_id,
+                    costo_inscripcion=matriz.total(dict.fromkeys(fila['categorias'])) if matriz else 0
+                )
+                for deportista, fila in validas
+            ])
+            Participacion.objects.bulk_create([
+                Participacion(
+                    inscripcion=inscripcion,
+                    categoria_id=categoria_id,
+                    modalidad_id=habilitadas[categoria_id],
+                    arma_utilizada_id=fila.get('arma')
+                )
+                for inscripcion, (_, fila) in zip(inscripciones, validas)
+                for categoria_id in dict.fromkeys(fila['categorias'])
+            ])
+            # bulk_create no dispara señales: resumen financiero y reporte del polígono a mano
+            if inscripciones:
+                programar_resumen([competencia.id])
+                transaction.on_commit(lambda: ReportService.invalidar_reporte_poligono(
+                    competencia.poligono_id, competencia.start_date.year
+                ))
+
+        return {
+            'creadas': [
+                {'id': ins.id, 'deportista': ins.deportista_id, 'costo_inscripcion': ins.costo_inscripcion}
+                for ins in inscripciones
+            ],
+            'errores': errores,
+        }
+
+
 class RankingService:
+    """
+    Mantiene el ranking materializado (PosicionRanking) por competencia y categoría.
+    Orden: mayor puntaje, luego más X, luego el resultado registrado primero.
+    """
+
+    @staticmethod
+    def _x_count(detalles: Any) -> int:
+        try:
+            return max(int((detalles or {}).get('x_count', 0)), 0)
+        except (TypeError, ValueError, AttributeError):
+            return 0
+
+    @staticmethod
+    def _tabla(competencia_id: int, categoria_id: Optional[int]):
+        return PosicionRanking.objects.filter(competencia_id=competencia_id, categoria_id=categoria_id)
+
+    @staticmethod
+    def _cerrar_hueco(fila: PosicionRanking) -> None:
+        """Sube una posición a todas las filas que estaban detrás de 'fila'."""
+        RankingService._tabla(fila.competencia_id, fila.categoria_id).filter(
+            posicion__gt=fila.posicion
+        ).update(posicion=F('posicion') - 1)
+
+    @staticmethod
+    def actualizar_posicion(resultado: Resultado, x_count: int) -> PosicionRanking:
+        """
+        Reubica un resultado en el ranking de su categoría.
+        Solo se reescriben su fila y las filas entre su posición anterior y la nueva.
+        Debe llamarse dentro de la transacción que guardó el resultado.
+        """
+        competencia_id = resultado.inscripcion.competencia_id
+        categoria_id = resultado.participacion.categoria_id if resultado.participacion_id else None
+        puntaje = Decimal(resultado.puntaje).quantize(Decimal('0.01'))
+
+        # Serializa las actualizaciones de ranking de una misma competencia
+        list(Competencia.objects.select_for_update().filter(pk=competencia_id).values_list('pk', flat=True))
+
+        actual = PosicionRanking.objects.filter(resultado=resultado).first()
+        if actual and (actual.competencia_id, actual.categoria_id) != (competencia_id, categoria_id):
+            # Cambió de categoría: se retira de la tabla anterior
+            RankingService._cerrar_hueco(actual)
+            actual.delete()
+            actual = None
+
+        tabla = RankingService._tabla(competencia_id, categoria_id)
+        delante = tabla.exclude(resultado_id=resultado.id).filter(
+            Q(puntaje__gt=puntaje)
+            | Q(puntaje=puntaje, x_count__gt=x_count)
+            | Q(puntaje=puntaje, x_count=x_count, resultado_id__lt=resultado.id)
+        ).count()
+        nueva = delante + 1
+
+        if actual is None:
+            tabla.filter(posicion__gte=nueva).update(posicion=F('posicion') + 1)
+            return PosicionRanking.objects.create(
+                competencia_id=competencia_id, categoria_id=categoria_id, resultado=resultado,
+                posicion=nueva, puntaje=puntaje, x_count=x_count
+            )
+
+        vieja = actual.posicion
+        if nueva < vieja:
+            tabla.filter(posicion__gte=nueva, posicion__lt=vieja).update(posicion=F('posicion') + 1)
+        elif nueva > vieja:
+            tabla.filter(posicion__gt=vieja, posicion__lte=nueva).update(posicion=F('posicion') - 1)
+
+        actual.posicion, actual.puntaje, actual.x_count = nueva, puntaje, x_count
+        actual.save(update_fields=['posicion', 'puntaje', 'x_count'])
+        actual.resultado = resultado
+        return actual
+
+    @staticmethod
+    def retirar_resultado(resultado: Resultado) -> None:
+        """Cierra el hueco que deja un resultado eliminado (su fila se borra en cascada)."""
+        fila = PosicionRanking.objects.filter(resultado=resultado).first()
+        if fila:
+            RankingService._cerrar_hueco(fila)
+
+    @staticmethod
+    @transaction.atomic
+    def reconstruir(competencia_id: int) -> None:
+        """
+        Recalcula en memoria el ranking completo de una competencia y escribe
+        solo las filas cuya posición o puntaje cambió. Usado por los envíos masivos.
+        """
+        # Mismo bloqueo que actualizar_posicion, antes de leer: no se intercala con un envío individual
+        list(Competencia.objects.select_for_update().filter(pk=competencia_id).values_list('pk', flat=True))
+
+        grupos: Dict[Optional[int], List[tuple]] = {}
+        for fila in Resultado.objects.filter(inscripcion__competencia_id=competencia_id).values(
+            'id', 'puntaje', 'detalles_json', 'participacion__categoria_id'
+        ):
+            grupos.setdefault(fila['participacion__categoria_id'], []).append(
+                (fila['puntaje'], RankingService._x_count(fila['detalles_json']), fila['id'])
+            )
+
+        existentes = {
+            fila.resultado_id: fila
+            for fila in PosicionRanking.objects.filter(competencia_id=competencia_id)
+        }
+        actualizar, crear, vigentes = [], [], set()
+
+        for categoria_id, items in grupos.items():
+            items.sort(key=lambda item: (-item[0], -item[1], item[2]))
+            for posicion, (puntaje, x_count, resultado_id) in enumerate(items, 1):
+                vigentes.add(resultado_id)
+                fila = existentes.get(resultado_id)
+                if fila is None:
+                    crear.append(PosicionRanking(
+                        competencia_id=competencia_id, categoria_id=categoria_id, resultado_id=resultado_id,
+                        posicion=posicion, puntaje=puntaje, x_count=x_count
+                    ))
+                elif (fila.categoria_id, fila.posicion, fila.puntaje, fila.x_count) != (categoria_id, posicion, puntaje, x_count):
+                    fila.categoria_id, fila.posicion, fila.puntaje, fila.x_count = categoria_id, posicion, puntaje, x_count
+                    actualizar.append(fila)
+
+        sobrantes = [fila.pk for resultado_id, fila in existentes.items() if resultado_id not in vigentes]
+        if sobrantes:
+            PosicionRanking.objects.filter(pk__in=sobrantes).delete()
+        if actualizar:
+            PosicionRanking.objects.bulk_update(actualizar, ['categoria', 'posicion', 'puntaje', 'x_count'], batch_size=500)
+        if crear:
+            PosicionRanking.objects.bulk_create(crear, batch_size=500)
+
+    # --- LEADERBOARD EN VIVO (Redis) ---
+
+    @staticmethod
+    def _datos_leaderboard(fila: PosicionRanking) -> Dict[str, Any]:
+        """Entrada compacta del leaderboard a partir de una fila del ranking materializado."""
+        resultado = fila.resultado
+        inscripcion = resultado.inscripcion
+        datos = ResultsService._datos_ws(resultado, inscripcion, fila.x_count, False)
+        del datos['is_update']
+        datos.update({
+            "puntaje_total": str(fila.puntaje),
+            "deportista_id": inscripcion.deportista_id,
+            "categoria_id": fila.categoria_id,
+            "categoria_nombre": fila.categoria.name if fila.categoria else "General",
+        })
+        return datos
+
+    @staticmethod
+    def publicar_en_leaderboard(competencia_id: int, datos: Dict[str, Any]) -> None:
+        """Actualiza una entrada del leaderboard (O(log n)); se llama post-commit."""
+        try:
+            get_leaderboard().actualizar(competencia_id, datos)
+        except RedisError:
+            logger.warning("Leaderboard no disponible; se reconstruirá en la próxima lectura.", exc_info=True)
+
+    @staticmethod
+    def invalidar_leaderboard(competencia_id: int) -> None:
+        try:
+            get_leaderboard().invalidar(competencia_id)
+        except RedisError:
+            logger.warning("No se pudo invalidar el leaderboard de la competencia %s.", competencia_id, exc_info=True)
+
+    @staticmethod
+    def _leaderboard_cargado(competencia_id: int):
+        """Devuelve el leaderboard de la competencia, reconstruyéndolo desde la BD si está frío."""
+        board = get_leaderboard()
+        if not board.esta_cargado(competencia_id):
+            filas = PosicionRanking.objects.filter(competencia_id=competencia_id).select_related(
+                'categoria', 'resultado__inscripcion__deportista', 'resultado__inscripcion__club'
+            )
+            board.cargar(competencia_id, (RankingService._datos_leaderboard(f) for f in filas.iterator()))
+        return board
+
+    @staticmethod
+    def get_leaderboard_top(competencia: Competencia, n: int = 10, categoria_ids: Optional[List[Optional[int]]] = None) -> Dict[str, Any]:
+        """Top-N por categoría servido desde el leaderboard en vivo."""
+        try:
+            board = RankingService._leaderboard_cargado(competencia.id)
+            if categoria_ids is None:
+                categoria_ids = board.categorias(competencia.id)
+            categorias = []
+            for categoria_id in categoria_ids:
+                top = board.top(competencia.id, categoria_id, n)
+                categorias.append({
+                    "categoria_id": categoria_id,
+                    "categoria_nombre": top[0]['categoria_nombre'] if top else "General",
+                    "total": board.total(competencia.id, categoria_id),
+                    "resultados": top
+                })
+        except RedisError:
+            logger.warning("Leaderboard no disponible; se sirve desde el ranking materializado.", exc_info=True)
+            categorias = RankingService._top_desde_bd(competencia, n, categoria_ids)
+
+        return {"competencia": competencia.name, "categorias": categorias}
+
+    @staticmethod
+    def _top_desde_bd(competencia: Competencia, n: int, categoria_ids: Optional[List[Optional[int]]]) -> List[Dict[str, Any]]:
+        filas = PosicionRanking.objects.filter(competencia=competencia, posicion__lte=n).select_related(
+            'categoria', 'resultado__inscripcion__deportista', 'resultado__inscripcion__club'
+        ).order_by('categoria_id', 'posicion')
+        categorias: Dict[Optional[int], Dict[str, Any]] = {}
+        for fila in filas:
+            if categoria_ids is not None and fila.categoria_id not in categoria_ids:
+                continue
+            datos = RankingService._datos_leaderboard(fila)
+            grupo = categorias.setdefault(fila.categoria_id, {
+                "categoria_id": fila.categoria_id,
+                "categoria_nombre": datos['categoria_nombre'],
+                "resultados": []
+            })
+            grupo['resultados'].append(dict(datos, posicion=fila.posicion))
+        for categoria_id, grupo in categorias.items():
+            grupo['total'] = RankingService._tabla(competencia.id, categoria_id).count()
+        return list(categorias.values())
+
+    @staticmethod
+    def get_posicion_deportista(competencia: Competencia, deportista_id: int) -> Optional[Dict[str, Any]]:
+        """Posición de un deportista en su categoría, servida desde el leaderboard en vivo."""
+        try:
+            return RankingService._leaderboard_cargado(competencia.id).posicion_deportista(competencia.id, deportista_id)
+        except RedisError:
+            logger.warning("Leaderboard no disponible; se consulta el ranking materializado.", exc_info=True)
+        fila = PosicionRanking.objects.filter(
+            competencia=competencia, resultado__inscripcion__deportista_id=deportista_id
+        ).select_related('categoria', 'resultado__inscripcion__deportista', 'resultado__inscripcion__club').first()
+        if not fila:
+            return None
+        total = RankingService._tabla(competencia.id, fila.categoria_id).count()
+        return dict(RankingService._datos_leaderboard(fila), posicion=fila.posicion, total=total)
+
+    @staticmethod
+    def get_filas_ranking_pdf(competencia_id: int):
+        """
+        Filas planas del ranking materializado, agrupables por categoría
+        (ordenadas por nombre de categoría y posición). Una sola consulta.
+        """
+        return PosicionRanking.objects.filter(competencia_id=competencia_id).order_by(
+            'categoria__name', 'categoria_id', 'posicion'
+        ).values(
+            'categoria_id', 'posicion', 'puntaje', 'x_count',
+            categoria_nombre=F('categoria__name'),
+            first_name=F('resultado__inscripcion__deportista__first_name'),
+            apellido_paterno=F('resultado__inscripcion__deportista__apellido_paterno'),
+            club=F('resultado__inscripcion__club__name'),
+        )
+
     @staticmethod
     def get_ranking_competencia_pdf(competencia: Competencia) -> Dict[str, Any]:
-        resultados = Resultado.objects.filter(inscripcion__competencia=competencia).order_by('-puntaje')
+        # 'items' se lee en bloques: el PDF no mantiene modelos en memoria
         return {
             "titulo": f"Ranking - {competencia.name}",
-            "items": resultados
+            "items": RankingService.get_filas_ranking_pdf(competencia.id).iterator(chunk_size=500)
         }
 
 class ReportService:
+    _TTL_REPORTE_POLIGONO = 60 * 15
+
+    @staticmethod
+    def _clave_reporte_poligono(poligono_id: int, year: int) -> str:
+        return f"reporte_poligono:{poligono_id}:{year}"
+
+    @staticmethod
+    def invalidar_reporte_poligono(poligono_id: Optional[int], year: Optional[int]) -> None:
+        """Lo llaman las señales de Competencia, Inscripcion y Participacion."""
+        if poligono_id and year:
+            cache.delete(ReportService._clave_reporte_poligono(poligono_id, year))
+
     @staticmethod
     def get_poligono_report(poligono_user, year: int = None) -> Dict[str, Any]:
         if not year: year = date.today().year
-        competencias = Competencia.objects.filter(poligono__user=poligono_user, start_date__year=year).order_by('-start_date')
-        total_ingresos = Inscripcion.objects.filter(competencia__in=competencias).aggregate(total=Sum('monto_pagado'))['total'] or 0
-        armas_count = Participacion.objects.filter(inscripcion__competencia__in=competencias).exclude(arma_utilizada__isnull=True).count()
-        
-        nombre_poligono = "N/A"
-        if hasattr(poligono_user, 'poligono_administrado') and poligono_user.poligono_administrado:
-            nombre_poligono = poligono_user.poligono_administrado.name
+        poligono = getattr(poligono_user, 'poligono_administrado', None)
+        if poligono is None:
+            return {
+                "poligono": "N/A", "anio": year,
+                "stats": {"total_competencias": 0, "total_inscritos": 0, "ingresos_generados": 0, "armas_utilizadas": 0},
+                "detalle_competencias": []
+            }
+
+        clave = ReportService._clave_reporte_poligono(poligono.id, year)
+        reporte = cache.get(clave)
+        if reporte is None:
+            reporte = ReportService._calcular_reporte_poligono(poligono, year)
+            cache.set(clave, reporte, ReportService._TTL_REPORTE_POLIGONO)
+        return reporte
+
+    @staticmethod
+    def _calcular_reporte_poligono(poligono, year: int) -> Dict[str, Any]:
+        """
+        Una sola consulta: cada competencia del año trae sus totales como
+        subconsultas agregadas (sin JOIN que multiplique los montos) y los
+        totales del polígono se suman sobre esas filas.
+        """
+        por_competencia = Inscripcion.objects.filter(competencia=OuterRef('pk')).order_by().values('competencia')
+        armas = Participacion.objects.filter(
+            inscripcion__competencia=OuterRef('pk'), arma_utilizada__isnull=False
+        ).order_by().values('inscripcion__competencia')
+        moneda = DecimalField(max_digits=12, decimal_places=2)
+
+        detalle = list(
+            Competencia.objects.filter(poligono=poligono, start_date__year=year).annotate(
+                inscritos=Coalesce(Subquery(por_competencia.annotate(c=Count('id')).values('c'), output_field=IntegerField()), 0),
+                ingresos=Coalesce(Subquery(por_competencia.annotate(s=Sum('monto_pagado')).values('s'), output_field=moneda),
+                                  Value(Decimal('0.00')), output_field=moneda),
+                armas=Coalesce(Subquery(armas.annotate(c=Count('id')).values('c'), output_field=IntegerField()), 0),
+            ).order_by('-start_date').values('id', 'name', 'start_date', 'status', 'inscritos', 'ingresos', 'armas')
+        )
 
         return {
-            "poligono": nombre_poligono, "anio": year,
+            "poligono": poligono.name, "anio": year,
             "stats": {
-                "total_competencias": competencias.count(),
-                "total_inscritos": Inscripcion.objects.filter(competencia__in=competencias).count(),
-                "ingresos_generados": total_ingresos, "armas_utilizadas": armas_count 
+                "total_competencias": len(detalle),
+                "total_inscritos": sum(c['inscritos'] for c in detalle),
+                "ingresos_generados": sum((c['ingresos'] for c in detalle), Decimal('0.00')),
+                "armas_utilizadas": sum(c['armas'] for c in detalle)
             },
-            "detalle_competencias": list(competencias.values('id', 'name', 'start_date', 'status'))
+            "detalle_competencias": detalle
         }
 
     @staticmethod
@@ -158,6 +704,10 @@ class ReportService:
     @staticmethod
     def get_reafuc_deportista_kardex(busqueda: str) -> Dict[str, Any]:
         deportista = Deportista.objects.filter(Q(ci=busqueda) | Q(codigo_unico=busqueda)).select_related('club').first()
+        if not deportista:
+            # Sin coincidencia exacta: el mejor resultado de la búsqueda por nombre
+            encontrados = buscar_deportistas(busqueda, 1, Deportista.objects.select_related('club'))
+            deportista = encontrados[0] if encontrados else None
         if not deportista: return None
         inscripciones = Inscripcion.objects.filter(deportista=deportista).select_related('competencia').order_by('-competencia__start_date')
         historial_list = []
@@ -175,14 +725,29 @@ class ReportService:
         }
 
     @staticmethod
-    def get_quarterly_report(year: int, quarter: int) -> Dict[str, Any]:
-        quarters = {1: [1, 2, 3], 2: [4, 5, 6], 3: [7, 8, 9], 4: [10, 11, 12]}
-        months = quarters.get(quarter, [])
-        competencias = Competencia.objects.filter(start_date__year=year, start_date__month__in=months)
-        total_ingresos = Inscripcion.objects.filter(competencia__in=competencias).aggregate(total=Sum('monto_pagado'))['total'] or 0
-        total_gastos = 0 
+    def _reporte_financiero(periodo: str, desde: date, hasta: date) -> Dict[str, Any]:
+        resumen = resumen_periodo(desde, hasta)
         return {
-            "periodo": f"Trimestre {quarter} - {year}", "competencias_realizadas": competencias.count(),
-            "resumen_financiero": { "ingresos_brutos": total_ingresos, "gastos_registrados": total_gastos, "balance_neto": total_ingresos - total_gastos },
-            "actividad": list(competencias.values('name', 'start_date', 'status', 'type'))
-        }
\ No newline at end of file
+            "periodo": periodo, "competencias_realizadas": len(resumen['filas']),
+            "resumen_financiero": {
+                "ingresos_brutos": resumen['ingresos'], "gastos_registrados": resumen['gastos'],
+                "balance_neto": resumen['balance'], "total_inscripciones": resumen['inscripciones']
+            },
+            "por_mes": resumen['por_mes'],
+            "actividad": [
+                {"name": f.competencia.name, "start_date": f.competencia.start_date, "status": f.competencia.status,
+                 "type": f.competencia.type, "ingresos": f.ingresos, "gastos": f.gastos, "inscripciones": f.inscripciones}
+                for f in resumen['filas']
+            ]
+        }
+
+    @staticmethod
+    def get_quarterly_report(year: int, quarter: int) -> Dict[str, Any]:
+        if quarter not in (1, 2, 3, 4):
+            raise ValueError("El trimestre debe estar entre 1 y 4.")
+        inicio = date(year, 3 * quarter - 2, 1)
+        return ReportService._reporte_financiero(f"Trimestre {quarter} - {year}", inicio, date(year, 3 * quarter, 1))
+
+    @staticmethod
+    def get_annual_report(year: int) -> Dict[str, Any]:
+        return ReportService._reporte_financiero(f"Gestión {year}", date(year, 1, 1), date(year, 12, 1))
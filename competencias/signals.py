@@ -1,6 +1,11 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
 from django.dispatch import receiver
-from .models import Participacion
+from django.db import transaction
+from deportistas.models import Deportista
+from .models import AutoridadFirma, CategoriaCompetencia, Competencia, Gasto, Inscripcion, Participacion, Resultado
+from .finanzas import programar_resumen
+from .imagenes import get_cache_imagenes, invalidar_firmas
+from .precios import invalidar_matriz, programar_recalculo
 
 @receiver(post_save, sender=Participacion)
 @receiver(post_delete, sender=Participacion)
@@ -8,7 +13,130 @@ def recalcular_costo_inscripcion(sender, instance, **kwargs):
     """
     Cada vez que se crea, modifica o borra una participación,
     recalculamos el total de la inscripción padre.
+    Dentro de una transacción se agrupa: un solo recálculo por inscripción al commit.
     """
-    inscripcion = instance.inscripcion
-    # Llamamos al método inteligente que creamos en el modelo
-    inscripcion.actualizar_total()
\ No newline at end of file
+    programar_recalculo([instance.inscripcion_id], using=kwargs.get('using'))
+
+@receiver(post_save, sender=Resultado)
+def ubicar_resultado_en_ranking(sender, instance, raw=False, using=None, **kwargs):
+    """
+    Todo resultado guardado (envío de puntajes, API REST, admin) se reubica en el
+    ranking materializado. La fila queda en instance.posicion_ranking.
+    Los envíos masivos usan bulk_create/bulk_update y RankingService.reconstruir.
+    """
+    if raw:
+        return
+    from .services import RankingService
+    with transaction.atomic(using=using):
+        fila = RankingService.actualizar_posicion(instance, RankingService._x_count(instance.detalles_json))
+    instance.posicion_ranking = fila
+    datos = RankingService._datos_leaderboard(fila)
+    transaction.on_commit(lambda: RankingService.publicar_en_leaderboard(fila.competencia_id, datos), using=using)
+
+@receiver(post_save, sender=Participacion)
+def reubicar_por_cambio_de_categoria(sender, instance, created, raw=False, using=None, **kwargs):
+    """Si la participación cambia de categoría, sus resultados pasan a la tabla de la nueva."""
+    if created or raw:
+        return
+    from .services import RankingService
+    resultados = Resultado.objects.filter(participacion=instance).exclude(
+        posicion_ranking__categoria_id=instance.categoria_id
+    ).select_related('inscripcion', 'participacion')
+    movidos = False
+    with transaction.atomic(using=using):
+        for resultado in resultados:
+            RankingService.actualizar_posicion(resultado, RankingService._x_count(resultado.detalles_json))
+            movidos = True
+    if movidos:
+        competencia_id = instance.inscripcion.competencia_id
+        transaction.on_commit(lambda: RankingService.invalidar_leaderboard(competencia_id), using=using)
+
+@receiver(pre_delete, sender=Resultado)
+def retirar_resultado_del_ranking(sender, instance, **kwargs):
+    """
+    Antes de borrar un resultado, cerramos el hueco que deja en el ranking
+    materializado (la fila de PosicionRanking se elimina en cascada).
+    """
+    from .services import RankingService
+    RankingService.retirar_resultado(instance)
+    competencia_id = instance.inscripcion.competencia_id
+    transaction.on_commit(lambda: RankingService.invalidar_leaderboard(competencia_id))
+
+
+@receiver(post_save, sender=CategoriaCompetencia)
+@receiver(post_delete, sender=CategoriaCompetencia)
+def invalidar_precios_categoria(sender, instance, **kwargs):
+    """Un costo específico cambió: la matriz de precios de la competencia ya no vale."""
+    invalidar_matriz(instance.competencia_id)
+    transaction.on_commit(lambda: invalidar_matriz(instance.competencia_id))
+
+@receiver(post_save, sender=Competencia)
+def invalidar_precios_competencia(sender, instance, created, **kwargs):
+    # El costo base puede haber cambiado
+    if not created:
+        invalidar_matriz(instance.id)
+        transaction.on_commit(lambda: invalidar_matriz(instance.id))
+
+@receiver(m2m_changed, sender=Competencia.categorias.through)
+def invalidar_precios_m2m(sender, instance, action, reverse, pk_set, **kwargs):
+    # competencia.categorias.add/remove/clear no dispara post_save en la tabla intermedia
+    if not action.startswith('post_'):
+        return
+    ids = pk_set if reverse else [instance.id]
+    if reverse and action == 'post_clear':
+        ids = Competencia.objects.filter(categorias=instance).values_list('id', flat=True)
+    for competencia_id in ids or ():
+        invalidar_matriz(competencia_id)
+
+
+# --- CACHÉ DEL REPORTE DE POLÍGONO (por polígono y año) ---
+
+def _invalidar_reporte(poligono_id, start_date):
+    from .services import ReportService
+    if start_date:
+        ReportService.invalidar_reporte_poligono(poligono_id, start_date.year)
+        transaction.on_commit(lambda: ReportService.invalidar_reporte_poligono(poligono_id, start_date.year))
+
+@receiver(post_save, sender=Competencia)
+@receiver(post_delete, sender=Competencia)
+def invalidar_reporte_competencia(sender, instance, **kwargs):
+    _invalidar_reporte(instance.poligono_id, instance.start_date)
+
+@receiver(post_save, sender=Inscripcion)
+@receiver(post_delete, sender=Inscripcion)
+@receiver(post_save, sender=Participacion)
+@receiver(post_delete, sender=Participacion)
+def invalidar_reporte_inscripcion(sender, instance, **kwargs):
+    # Inscripciones, pagos (monto_pagado) y armas utilizadas entran en el reporte
+    filtro = {'pk': instance.competencia_id} if sender is Inscripcion else {'inscripciones__pk': instance.inscripcion_id}
+    fila = Competencia.objects.filter(**filtro).values_list('poligono_id', 'start_date').first()
+    if fila and fila[0]:
+        _invalidar_reporte(*fila)
+
+
+# --- RESUMEN FINANCIERO MENSUAL ---
+
+@receiver(post_save, sender=Competencia)
+@receiver(post_save, sender=Inscripcion)
+@receiver(post_delete, sender=Inscripcion)
+@receiver(post_save, sender=Gasto)
+@receiver(post_delete, sender=Gasto)
+def actualizar_resumen_financiero(sender, instance, **kwargs):
+    # Pagos, inscripciones y gastos; la competencia puede cambiar de mes o de polígono
+    competencia_id = instance.id if sender is Competencia else instance.competencia_id
+    programar_resumen([competencia_id], using=kwargs.get('using'))
+
+
+# --- CACHÉ DE IMÁGENES PARA PDFs ---
+
+@receiver(post_save, sender=AutoridadFirma)
+@receiver(post_delete, sender=AutoridadFirma)
+def invalidar_firmas_pdf(sender, instance, **kwargs):
+    invalidar_firmas(instance.firma.name if instance.firma else None)
+    transaction.on_commit(invalidar_firmas)
+
+@receiver(post_save, sender=Deportista)
+@receiver(post_delete, sender=Deportista)
+def invalidar_foto_pdf(sender, instance, **kwargs):
+    if instance.foto:
+        get_cache_imagenes().invalidar(instance.foto.name)
@@ -1,5 +1,39 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.core.management import CommandError, call_command
+from django.core.cache import cache
+from rest_framework.test import APIClient
+from PIL import Image
+from django.core.exceptions import ValidationError
+from datetime import date, timedelta
+from django.utils import timezone
+import io
+import json
+import tempfile
+import warnings
+import os
+import zipfile
+from unittest import mock
+import msgpack
+from decimal import Decimal
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+from clubs.models import Club
+from deportistas.models import Arma, Deportista
 from .calculadora_puntajes import CalculadoraPuntajes
+from users.models import User
+from .models import (
+    Categoria, CategoriaCompetencia, Competencia, Gasto, Inscripcion, Modalidad, Participacion, Poligono, PosicionRanking,
+    ResumenFinancieroMensual, Resultado, TrabajoPDF, AutoridadFirma
+)
+from . import precios, trabajos
+from .reports import generar_credenciales_pdf, generar_pdf_ranking, zip_diplomas
+from .imagenes import CacheImagenes, firmas_activas, get_cache_imagenes, invalidar_firmas
+from .services import ResultsService, RankingService, InscripcionService, ReportService
+from .leaderboard import MemoriaLeaderboard, get_leaderboard
+from .broadcast import ScoreBroadcaster, MemoriaDeltaLog, SUBPROTOCOLO_MSGPACK, get_delta_log
+from .consumers import CompetenciaConsumer
+from channels.testing import WebsocketCommunicator
 
 class CalculadoraPuntajesTestCase(TestCase):
     
@@ -48,6 +82,24 @@ class CalculadoraPuntajesTestCase(TestCase):
         self.assertEqual(resultado['total_puntos'], 47.0)
         self.assertEqual(resultado['total_x'], 1)
 
+    def test_calculo_por_lote_identico(self):
+        """
+        El cálculo por lote debe devolver exactamente lo mismo que el cálculo individual.
+        """
+        lote = [
+            [{'pajaros': 10, 'chanchos': 10, 'pavas': 10, 'carneros': 10}],
+            [{'impactos_5': 5, 'impactos_4': '2', 'impactos_3': 1.5}, {'puntaje': '9.75', 'es_x': True}],
+            [{'puntaje': 24, 'es_x': False}, {'puntaje_total_ronda': 23}],
+            [{'pajaros': 'texto', 'chanchos': None}],
+            [{'puntaje': 'NaN'}],
+            [],
+        ]
+        resultados = CalculadoraPuntajes.calcular_totales_lote(lote)
+        self.assertEqual(len(resultados), len(lote))
+        for series, resultado in zip(lote, resultados):
+            esperado = CalculadoraPuntajes.calcular_total_competencia(series)
+            self.assertEqual(repr(resultado), repr(esperado))
+
     def test_validacion_puntajes(self):
         """
         Prueba el método estático de validación.
@@ -56,4 +108,715 @@ class CalculadoraPuntajesTestCase(TestCase):
         self.assertTrue(CalculadoraPuntajes.validar_puntaje(0))
         self.assertFalse(CalculadoraPuntajes.validar_puntaje(101)) # Fuera de rango
         self.assertFalse(CalculadoraPuntajes.validar_puntaje(-1))  # Negativo
-        self.assertFalse(CalculadoraPuntajes.validar_puntaje("texto")) # Inválido
\ No newline at end of file
+        self.assertFalse(CalculadoraPuntajes.validar_puntaje("texto")) # Inválido
+
+
+class EnvioPuntajesLoteTestCase(TestCase):
+
+    def setUp(self):
+        self.competencia = Competencia.objects.create(name="Copa Test", start_date=date(2025, 5, 1))
+        self.inscripciones = []
+        for i in range(3):
+            deportista = Deportista.objects.create(
+                first_name=f"Tirador{i}", apellido_paterno="Lote",
+                fecha_nacimiento=date(1990, 1, 1), ci=f"LOT{i}"
+            )
+            self.inscripciones.append(
+                Inscripcion.objects.create(competencia=self.competencia, deportista=deportista)
+            )
+        # Un resultado previo para verificar la actualización (idempotencia)
+        Resultado.objects.create(inscripcion=self.inscripciones[0], puntaje=Decimal('1.00'))
+
+    @override_settings(SCORE_BROADCAST_TICK_MS=0)
+    def test_lote_crea_actualiza_y_emite_un_mensaje(self):
+        channel_layer = get_channel_layer()
+        canal = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)(f"competencia_{self.competencia.id}", canal)
+
+        data = [
+            {'inscripcion': ins.id, 'series': [{'puntaje': 10 + i, 'es_x': i == 0}]}
+            for i, ins in enumerate(self.inscripciones)
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            resultados = ResultsService.procesar_envio_puntajes_lote(data, context={})
+
+        self.assertEqual(len(resultados), 3)
+        self.assertEqual(Resultado.objects.filter(inscripcion__competencia=self.competencia).count(), 3)
+        self.assertEqual(Resultado.objects.get(inscripcion=self.inscripciones[0]).puntaje, Decimal('10.00'))
+        self.assertTrue(all(r.codigo_verificacion for r in Resultado.objects.all()))
+
+        mensaje = async_to_sync(channel_layer.receive)(canal)
+        self.assertEqual(mensaje['type'], 'score.batch')
+        frame = json.loads(mensaje['text'])
+        self.assertEqual(frame['type'], 'score_batch')
+        self.assertEqual(len(frame['payload']), 3)
+        self.assertEqual(sum(1 for d in frame['payload'] if d['is_update']), 1)
+
+    def test_lote_rechaza_inscripcion_inexistente(self):
+        with self.assertRaises(ValidationError):
+            ResultsService.procesar_envio_puntajes_lote(
+                [{'inscripcion': 999999, 'series': []}], context={}
+            )
+
+
+class RankingMaterializadoTestCase(TestCase):
+
+    def setUp(self):
+        self.competencia = Competencia.objects.create(name="Copa Ranking", start_date=date(2025, 6, 1))
+        self.resultados = []
+        for i, puntaje in enumerate(['50.00', '40.00', '30.00', '20.00']):
+            deportista = Deportista.objects.create(
+                first_name=f"Tirador{i}", apellido_paterno="Ranking",
+                fecha_nacimiento=date(1990, 1, 1), ci=f"RNK{i}"
+            )
+            inscripcion = Inscripcion.objects.create(competencia=self.competencia, deportista=deportista)
+            # La señal post_save lo ubica en el ranking
+            self.resultados.append(Resultado.objects.create(inscripcion=inscripcion, puntaje=Decimal(puntaje)))
+
+    def _orden(self):
+        return list(
+            PosicionRanking.objects.filter(competencia=self.competencia)
+            .order_by('posicion').values_list('resultado_id', 'posicion')
+        )
+
+    def test_subida_y_bajada_incremental(self):
+        ultimo, primero = self.resultados[3], self.resultados[0]
+
+        ultimo.puntaje = Decimal('45.00')
+        ultimo.save()
+        self.assertEqual(self._orden(), [
+            (primero.id, 1), (ultimo.id, 2), (self.resultados[1].id, 3), (self.resultados[2].id, 4)
+        ])
+
+        primero.puntaje = Decimal('10.00')
+        primero.save()
+        self.assertEqual([pos for _, pos in self._orden()], [1, 2, 3, 4])
+        self.assertEqual(self._orden()[-1], (primero.id, 4))
+
+        # El recálculo completo no debe encontrar diferencias
+        antes = self._orden()
+        RankingService.reconstruir(self.competencia.id)
+        self.assertEqual(self._orden(), antes)
+
+    def test_leaderboard_se_reconstruye_y_actualiza(self):
+        get_leaderboard().invalidar(self.competencia.id)
+        data = RankingService.get_leaderboard_top(self.competencia, n=2)
+        self.assertEqual(len(data['categorias']), 1)
+        self.assertEqual(data['categorias'][0]['total'], 4)
+        self.assertEqual([r['id'] for r in data['categorias'][0]['resultados']],
+                         [self.resultados[0].id, self.resultados[1].id])
+
+        ultimo = self.resultados[3]
+        ultimo.puntaje = Decimal('60.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            ultimo.save()
+
+        posicion = RankingService.get_posicion_deportista(self.competencia, ultimo.inscripcion.deportista_id)
+        self.assertEqual((posicion['posicion'], posicion['total']), (1, 4))
+
+    def test_resultado_por_api_y_cambio_de_categoria(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username='juez_ranking', password='x'))
+        modalidad = Modalidad.objects.create(name='Escopeta')
+        juvenil, mayores = (Categoria.objects.create(name=n, modalidad=modalidad) for n in ('Juvenil', 'Mayores'))
+        deportista = Deportista.objects.create(
+            first_name='Nuevo', apellido_paterno='Api', fecha_nacimiento=date(1990, 1, 1), ci='RNKAPI'
+        )
+        inscripcion = Inscripcion.objects.create(competencia=self.competencia, deportista=deportista)
+        participacion = Participacion.objects.create(inscripcion=inscripcion, modalidad=modalidad, categoria=juvenil)
+
+        respuesta = client.post('/api/competencias/resultados/', {
+            'inscripcion': inscripcion.id, 'participacion': participacion.id, 'puntaje': '35.00'
+        }, format='json')
+        self.assertEqual(respuesta.status_code, 201)
+        oficiales = client.get(f'/api/competencias/competencias/{self.competencia.id}/official_results/').data
+        fila = next(r for r in oficiales['resultados'] if r['id'] == respuesta.data['id'])
+        self.assertEqual((fila['categoria_id'], fila['posicion']), (juvenil.id, 1))
+
+        participacion.categoria = mayores
+        participacion.save()
+        fila = PosicionRanking.objects.get(resultado_id=respuesta.data['id'])
+        self.assertEqual((fila.categoria_id, fila.posicion), (mayores.id, 1))
+
+    def test_borrar_resultado_cierra_hueco(self):
+        self.resultados[1].delete()
+        self.assertEqual([pos for _, pos in self._orden()], [1, 2, 3])
+
+
+class MemoriaLeaderboardTestCase(TestCase):
+
+    def test_orden_por_puntaje_x_y_registro(self):
+        board = MemoriaLeaderboard()
+        entradas = [
+            {'id': 1, 'deportista_id': 10, 'categoria_id': 5, 'puntaje_total': '90.00', 'x_count': 1},
+            {'id': 2, 'deportista_id': 20, 'categoria_id': 5, 'puntaje_total': '90.00', 'x_count': 3},
+            {'id': 3, 'deportista_id': 30, 'categoria_id': 5, 'puntaje_total': '95.50', 'x_count': 0},
+            {'id': 4, 'deportista_id': 40, 'categoria_id': 5, 'puntaje_total': '90.00', 'x_count': 1},
+        ]
+        board.cargar(1, entradas)
+        self.assertEqual([e['id'] for e in board.top(1, 5, 10)], [3, 2, 1, 4])
+
+        # Cambio de categoría: sale de la tabla anterior
+        board.actualizar(1, dict(entradas[0], categoria_id=None, puntaje_total='10.00'))
+        self.assertEqual(board.total(1, 5), 3)
+        self.assertEqual(board.posicion_deportista(1, 10)['posicion'], 1)
+        self.assertEqual(board.posicion_deportista(1, 40)['posicion'], 3)
+
+
+class ScoreBroadcasterTestCase(TestCase):
+
+    @override_settings(SCORE_BROADCAST_TICK_MS=60000)
+    def test_agrupa_y_deduplica_por_ventana(self):
+        channel_layer = get_channel_layer()
+        canal = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)("competencia_77", canal)
+
+        broadcaster = ScoreBroadcaster()
+        broadcaster.publicar(77, [{'id': 1, 'puntaje_total': '10.00', 'is_update': False}])
+        broadcaster.publicar(77, [{'id': 1, 'puntaje_total': '12.00', 'is_update': True},
+                                  {'id': 2, 'puntaje_total': '9.00', 'is_update': True}])
+        broadcaster.vaciar(77)
+
+        frame = json.loads(async_to_sync(channel_layer.receive)(canal)['text'])
+        self.assertEqual(frame['type'], 'score_batch')
+        self.assertEqual(
+            [(d['id'], d['puntaje_total'], d['is_update']) for d in frame['payload']],
+            [(1, '12.00', False), (2, '9.00', True)]
+        )
+
+    @override_settings(DEBUG=False)
+    def test_prueba_de_carga_no_escribe_sin_permiso(self):
+        with self.assertRaisesMessage(CommandError, '--allow-db-writes'):
+            call_command('loadtest_ws', clientes=1, envios=1, stdout=io.StringIO())
+        self.assertFalse(Competencia.objects.exists())
+
+    @override_settings(SCORE_BROADCAST_TICK_MS=0)
+    def test_falla_de_redis_no_propaga_el_error(self):
+        log = mock.Mock()
+        log.registrar.side_effect = ConnectionError('redis caído')
+        with mock.patch('competencias.broadcast.get_delta_log', return_value=log), \
+                self.assertLogs('competencias.broadcast', 'WARNING'):
+            ScoreBroadcaster().publicar(78, [{'id': 1, 'puntaje_total': '10.00', 'is_update': False}])
+
+
+class DeltaLogTestCase(TestCase):
+
+    def test_reenvio_y_hueco_mayor_que_el_buffer(self):
+        log = MemoriaDeltaLog(capacidad=3)
+        for i in range(1, 6):
+            self.assertEqual(log.registrar(1, [{'id': i}]), i)
+
+        self.assertEqual(log.desde(1, 5), (5, []))
+        actual, deltas = log.desde(1, 3)
+        self.assertEqual([seq for seq, _ in deltas], [4, 5])
+        # Se pidió desde la 1 pero el buffer empieza en la 3: hace falta snapshot
+        self.assertEqual(log.desde(1, 1), (5, None))
+
+    def test_cliente_adelantado_tras_reinicio_recibe_snapshot(self):
+        # Log recién creado (reinicio del proceso o secuencia de Redis perdida)
+        log = MemoriaDeltaLog(capacidad=3)
+        self.assertEqual(log.desde(1, 57), (0, None))
+        log.registrar(1, [{'id': 1}])
+        self.assertEqual(log.desde(1, 57), (1, None))
+        self.assertEqual(log.desde(1, 1), (1, []))
+
+    def test_consumer_reenvia_deltas_perdidos(self):
+        log = get_delta_log()
+        base = log.registrar(4242, [{'id': 1}])
+        log.registrar(4242, [{'id': 2}])
+
+        async def conectar():
+            communicator = WebsocketCommunicator(
+                CompetenciaConsumer.as_asgi(), f"/ws/competencia/4242/?since={base}"
+            )
+            communicator.scope['url_route'] = {'kwargs': {'competencia_id': '4242'}}
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            frame = json.loads(await communicator.receive_from())
+            await communicator.disconnect()
+            return frame
+
+        frame = async_to_sync(conectar)()
+        self.assertEqual((frame['type'], frame['seq'], frame['payload']), ('score_batch', base + 1, [{'id': 2}]))
+
+    def test_consumer_msgpack_por_subprotocolo(self):
+        log = get_delta_log()
+        base = log.registrar(4343, [{'id': 1}])
+        log.registrar(4343, [{'id': 2, 'puntaje_total': '95.50', 'is_update': False}])
+
+        async def conectar():
+            communicator = WebsocketCommunicator(
+                CompetenciaConsumer.as_asgi(), f"/ws/competencia/4343/?since={base}",
+                subprotocols=[SUBPROTOCOLO_MSGPACK]
+            )
+            communicator.scope['url_route'] = {'kwargs': {'competencia_id': '4343'}}
+            connected, subprotocolo = await communicator.connect()
+            frame = await communicator.receive_output()
+            await communicator.disconnect()
+            return connected, subprotocolo, frame
+
+        connected, subprotocolo, frame = async_to_sync(conectar)()
+        self.assertTrue(connected)
+        self.assertEqual(subprotocolo, SUBPROTOCOLO_MSGPACK)
+        datos = msgpack.unpackb(frame['bytes'])
+        self.assertEqual(datos, {'t': 'b', 's': base + 1, 'p': [{'i': 2, 'pt': '95.50', 'u': False}]})
+
+
+class MatrizPreciosTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        modalidad = Modalidad.objects.create(name="Pistola")
+        self.cat_cara = Categoria.objects.create(name="Fuego Central", modalidad=modalidad)
+        self.cat_base = Categoria.objects.create(name="Standard", modalidad=modalidad)
+        self.competencia = Competencia.objects.create(
+            name="Copa Precios", start_date=date(2025, 6, 1), costo_inscripcion_base=Decimal('50.00')
+        )
+        self.cc = CategoriaCompetencia.objects.create(
+            competencia=self.competencia, categoria=self.cat_cara, costo_especifico=Decimal('80.00')
+        )
+        CategoriaCompetencia.objects.create(competencia=self.competencia, categoria=self.cat_base)
+        self.inscripciones = []
+        for i in range(3):
+            deportista = Deportista.objects.create(
+                first_name=f"Tirador{i}", apellido_paterno="Precio",
+                fecha_nacimiento=date(1990, 1, 1), ci=f"PRE{i}"
+            )
+            self.inscripciones.append(Inscripcion.objects.create(competencia=self.competencia, deportista=deportista))
+        # bulk_create: sin señales de recálculo
+        Participacion.objects.bulk_create([
+            Participacion(inscripcion=ins, modalidad=modalidad, categoria=cat)
+            for ins in self.inscripciones for cat in (self.cat_cara, self.cat_base)
+        ])
+
+    def test_totales_en_lote_y_anotacion(self):
+        with self.assertNumQueries(3):
+            totales = precios.costos_totales(self.inscripciones)
+        self.assertEqual(set(totales.values()), {Decimal('130.00')})
+
+        # La matriz ya está en caché: solo la consulta de participaciones
+        with self.assertNumQueries(1):
+            self.assertEqual(self.inscripciones[0].costo_total, Decimal('130.00'))
+
+        anotadas = Inscripcion.objects.filter(competencia=self.competencia).con_costo_total()
+        self.assertEqual({i.costo_total for i in anotadas}, {Decimal('130.00')})
+
+    def test_cambio_de_costo_invalida_la_matriz(self):
+        precios.get_matriz(self.competencia.id)
+        self.cc.costo_especifico = Decimal('100.00')
+        self.cc.save()
+        self.assertEqual(self.inscripciones[0].costo_total, Decimal('150.00'))
+
+    def test_total_guardado_se_recalcula_una_vez_al_commit(self):
+        ins = self.inscripciones[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            Participacion.objects.filter(inscripcion=ins, categoria=self.cat_base).delete()
+            Participacion.objects.create(inscripcion=ins, modalidad=self.cat_base.modalidad, categoria=self.cat_cara)
+            ins.refresh_from_db()
+            # Todavía sin recalcular: el UPDATE espera al commit
+            self.assertEqual(ins.costo_inscripcion, Decimal('0.00'))
+        ins.refresh_from_db()
+        self.assertEqual(ins.costo_inscripcion, Decimal('160.00'))
+
+    def test_bulk_create_programa_el_recalculo(self):
+        ins = self.inscripciones[1]
+        with self.captureOnCommitCallbacks(execute=True):
+            Participacion.objects.bulk_create([
+                Participacion(inscripcion=ins, modalidad=self.cat_base.modalidad, categoria=self.cat_base)
+            ])
+        ins.refresh_from_db()
+        self.assertEqual(ins.costo_inscripcion, Decimal('180.00'))
+
+
+class NominaClubTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.club = Club.objects.create(name="Club Nómina")
+        modalidad = Modalidad.objects.create(name="Pistola")
+        self.categoria = Categoria.objects.create(name="Standard", modalidad=modalidad)
+        self.competencia = Competencia.objects.create(
+            name="Copa Nómina", start_date=date(2025, 7, 1), costo_inscripcion_base=Decimal('40.00')
+        )
+        CategoriaCompetencia.objects.create(competencia=self.competencia, categoria=self.categoria)
+        self.activo = Deportista.objects.create(
+            first_name="Activo", apellido_paterno="Nomina", fecha_nacimiento=date(1990, 1, 1),
+            ci="NOM1", club=self.club, status='ACTIVO'
+        )
+        self.pendiente = Deportista.objects.create(
+            first_name="Pendiente", apellido_paterno="Nomina", fecha_nacimiento=date(1990, 1, 1),
+            ci="NOM2", club=self.club
+        )
+        self.data = {
+            'competencia': self.competencia.id,
+            'inscripciones': [
+                {'deportista': self.activo.id, 'categorias': [self.categoria.id]},
+                {'deportista': self.pendiente.id, 'categorias': [self.categoria.id]},
+            ],
+        }
+
+    def test_errores_por_fila_sin_crear_nada(self):
+        resultado = InscripcionService.inscribir_nomina(self.data, user=None)
+        self.assertEqual(resultado['creadas'], [])
+        self.assertEqual([e['fila'] for e in resultado['errores']], [1])
+        self.assertFalse(Inscripcion.objects.exists())
+
+    def test_parcial_crea_las_filas_validas(self):
+        resultado = InscripcionService.inscribir_nomina(dict(self.data, parcial=True), user=None)
+        self.assertEqual(len(resultado['creadas']), 1)
+        inscripcion = Inscripcion.objects.get(deportista=self.activo)
+        self.assertEqual(inscripcion.costo_inscripcion, Decimal('40.00'))
+        self.assertEqual(inscripcion.club_id, self.club.id)
+        self.assertEqual(inscripcion.participaciones.count(), 1)
+
+    def test_representante_sin_club_no_inscribe(self):
+        sin_club = User.objects.create_user(username='club_sin_asignar', password='x', role=User.Roles.CLUB)
+        client = APIClient()
+        client.force_authenticate(sin_club)
+        respuesta = client.post('/api/competencias/inscripciones/roster/', dict(self.data, parcial=True), format='json')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertFalse(Inscripcion.objects.exists())
+
+        otro = User.objects.create_user(username='club_ajeno', password='x', role=User.Roles.CLUB,
+                                        club=Club.objects.create(name="Club Ajeno"))
+        resultado = InscripcionService.inscribir_nomina(dict(self.data, parcial=True), user=otro)
+        self.assertEqual(resultado['creadas'], [])
+
+
+class ReportePoligonoTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='poligono1', password='x')
+        self.poligono = Poligono.objects.create(name='Polígono Central', user=self.user)
+        self.comp = Competencia.objects.create(name='Copa Anual', start_date=date(2025, 3, 1), poligono=self.poligono)
+        Competencia.objects.create(name='Copa Vacía', start_date=date(2025, 6, 1), poligono=self.poligono)
+        Competencia.objects.create(name='Otro Año', start_date=date(2024, 6, 1), poligono=self.poligono)
+        modalidad = Modalidad.objects.create(name='Pistola')
+        categoria = Categoria.objects.create(name='Mayores', modalidad=modalidad)
+        for i in range(3):
+            deportista = Deportista.objects.create(
+                first_name=f'Rep{i}', apellido_paterno='Poligono', fecha_nacimiento=date(1990, 1, 1), ci=f'REP{i}'
+            )
+            ins = Inscripcion.objects.create(competencia=self.comp, deportista=deportista, monto_pagado=Decimal('50.00'))
+            arma = Arma.objects.create(deportista=deportista, tipo='Corta', marca='CZ', modelo='75', calibre='9mm', serie=f'REP{i}')
+            Participacion.objects.create(inscripcion=ins, modalidad=modalidad, categoria=categoria, arma_utilizada=arma)
+            Participacion.objects.create(inscripcion=ins, modalidad=modalidad, categoria=categoria)
+        self.user = User.objects.select_related('poligono_administrado').get(pk=self.user.pk)
+
+    def test_una_consulta_y_cache_por_anio(self):
+        with self.assertNumQueries(1):
+            reporte = ReportService.get_poligono_report(self.user, 2025)
+        self.assertEqual(reporte['stats'], {
+            'total_competencias': 2, 'total_inscritos': 3,
+            'ingresos_generados': Decimal('150.00'), 'armas_utilizadas': 3
+        })
+        self.assertEqual([c['name'] for c in reporte['detalle_competencias']], ['Copa Vacía', 'Copa Anual'])
+        with self.assertNumQueries(0):
+            ReportService.get_poligono_report(self.user, 2025)
+
+    def test_pago_invalida_el_anio_de_la_competencia(self):
+        ReportService.get_poligono_report(self.user, 2025)
+        otro = ReportService.get_poligono_report(self.user, 2024)
+
+        ins = Inscripcion.objects.filter(competencia=self.comp).first()
+        ins.monto_pagado = Decimal('80.00')
+        ins.save()
+
+        self.assertEqual(ReportService.get_poligono_report(self.user, 2025)['stats']['ingresos_generados'], Decimal('180.00'))
+        with self.assertNumQueries(0):
+            self.assertEqual(ReportService.get_poligono_report(self.user, 2024), otro)
+
+
+class ResumenFinancieroTestCase(TestCase):
+
+    def setUp(self):
+        # El resumen se recalcula al commit: una sola vez para todo el setUp
+        with self.captureOnCommitCallbacks(execute=True):
+            self.marzo = Competencia.objects.create(name='Copa Marzo', start_date=date(2025, 3, 10))
+            self.mayo = Competencia.objects.create(name='Copa Mayo', start_date=date(2025, 5, 4))
+            for i, comp in enumerate([self.marzo, self.marzo, self.mayo]):
+                deportista = Deportista.objects.create(
+                    first_name=f'Fin{i}', apellido_paterno='Resumen', fecha_nacimiento=date(1990, 1, 1), ci=f'FIN{i}'
+                )
+                Inscripcion.objects.create(competencia=comp, deportista=deportista, monto_pagado=Decimal('100.00'))
+            Gasto.objects.create(competencia=self.marzo, descripcion='Platos', monto=Decimal('30.00'))
+
+    def test_resumen_se_actualiza_con_pagos_y_gastos(self):
+        fila = ResumenFinancieroMensual.objects.get(competencia=self.marzo)
+        self.assertEqual((fila.mes, fila.ingresos, fila.gastos, fila.inscripciones),
+                         (date(2025, 3, 1), Decimal('200.00'), Decimal('30.00'), 2))
+
+        ins = Inscripcion.objects.filter(competencia=self.marzo).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            ins.monto_pagado = Decimal('150.00')
+            ins.save()
+            Gasto.objects.filter(competencia=self.marzo).delete()
+        actualizada = ResumenFinancieroMensual.objects.get(competencia=self.marzo)
+        self.assertEqual((actualizada.ingresos, actualizada.gastos), (Decimal('250.00'), Decimal('0.00')))
+        # Se actualiza en el lugar (upsert), sin borrar y volver a crear la fila
+        self.assertEqual(actualizada.pk, fila.pk)
+
+        # Cambio de fecha: la fila pasa al mes nuevo
+        self.mayo.start_date = date(2025, 7, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.mayo.save()
+        self.assertEqual(list(ResumenFinancieroMensual.objects.filter(competencia=self.mayo).values_list('mes', flat=True)),
+                         [date(2025, 7, 1)])
+
+    def test_reportes_leen_las_filas_precalculadas(self):
+        with self.assertNumQueries(1):
+            trimestre = ReportService.get_quarterly_report(2025, 1)
+        self.assertEqual(trimestre['competencias_realizadas'], 1)
+        self.assertEqual(trimestre['resumen_financiero']['balance_neto'], Decimal('170.00'))
+
+        anual = ReportService.get_annual_report(2025)
+        self.assertEqual(anual['resumen_financiero']['ingresos_brutos'], Decimal('300.00'))
+        self.assertEqual([m['mes'] for m in anual['por_mes']], [date(2025, 3, 1), date(2025, 5, 1)])
+        with self.assertRaises(ValueError):
+            ReportService.get_quarterly_report(2025, 5)
+
+    def test_anio_invalido_responde_400(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username='admin_fin', password='x', role=User.Roles.ADMIN))
+        self.assertEqual(client.get('/api/competencias/reports/anual/', {'year': '0'}).status_code, 400)
+        self.assertEqual(client.get('/api/competencias/reports/anual/', {'year': '2025'}).status_code, 200)
+
+
+@override_settings(PDF_WORKERS=0)
+class TrabajosPDFTestCase(TestCase):
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=self.media.name))
+        self.user = User.objects.create_user(username='tesorero', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        competencia = Competencia.objects.create(name='Copa Recibos', start_date=date(2025, 4, 1))
+        deportista = Deportista.objects.create(
+            first_name='Ivo', apellido_paterno='Paz', fecha_nacimiento=date(1990, 1, 1), ci='PDF1'
+        )
+        self.inscripcion = Inscripcion.objects.create(competencia=competencia, deportista=deportista, monto_pagado=Decimal('70.00'))
+        self.url = f'/api/competencias/inscripciones/{self.inscripcion.id}/print_receipt/'
+
+    def test_encola_y_luego_sirve_el_archivo_cacheado(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.client.get(self.url)
+            # Mientras se genera, otra solicitud reutiliza el mismo trabajo
+            self.assertEqual(self.client.get(self.url).data['id'], respuesta.data['id'])
+        self.assertEqual(respuesta.status_code, 202)
+        self.assertEqual(TrabajoPDF.objects.count(), 1)
+
+        trabajo = self.client.get(f"/api/competencias/trabajos-pdf/{respuesta.data['id']}/").data
+        self.assertEqual(trabajo['estado'], 'LISTO')
+        descarga = self.client.get(trabajo['descarga'])
+        self.assertEqual(descarga.status_code, 200)
+        self.assertTrue(b''.join(descarga.streaming_content).startswith(b'%PDF'))
+
+        repetida = self.client.get(self.url)
+        self.assertEqual((repetida.status_code, repetida['Content-Type']), (200, 'application/pdf'))
+        self.assertEqual(TrabajoPDF.objects.count(), 1)
+
+    def test_cambio_de_datos_genera_otro_documento_y_drenar_lo_procesa(self):
+        primera = trabajos.solicitar('recibo', {'inscripcion': self.inscripcion.id})
+        self.inscripcion.monto_pagado = Decimal('90.00')
+        self.inscripcion.save()
+        segunda = trabajos.solicitar('recibo', {'inscripcion': self.inscripcion.id})
+        self.assertNotEqual(primera.trabajo.clave, segunda.trabajo.clave)
+
+        # Sin commit nadie los despachó: el comando los toma de la cola
+        self.assertEqual(trabajos.drenar(), 2)
+        self.assertFalse(TrabajoPDF.objects.exclude(estado=TrabajoPDF.Estados.LISTO).exists())
+        self.assertTrue(trabajos.solicitar('recibo', {'inscripcion': self.inscripcion.id}).listo)
+
+    @override_settings(PDF_WORKERS=0)
+    def test_trabajo_atascado_se_reencola_al_pedirlo(self):
+        trabajo = trabajos.solicitar('recibo', {'inscripcion': self.inscripcion.id}).trabajo
+        # Proceso caído a mitad del render
+        TrabajoPDF.objects.filter(pk=trabajo.pk).update(
+            estado=TrabajoPDF.Estados.PROCESANDO, iniciado_en=timezone.now() - timedelta(hours=1)
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            solicitud = trabajos.solicitar('recibo', {'inscripcion': self.inscripcion.id})
+        self.assertEqual(solicitud.trabajo.pk, trabajo.pk)
+        trabajo.refresh_from_db()
+        self.assertEqual((trabajo.estado, trabajo.intentos), (TrabajoPDF.Estados.LISTO, 1))
+
+
+class CredencialesLoteTestCase(TestCase):
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=self.media.name, PDF_WORKERS=0))
+        self.enterContext(mock.patch.object(trabajos, 'CREDENCIALES_POR_LOTE', 4))
+        get_cache_imagenes().limpiar()
+        self.admin = User.objects.create_user(username='federacion', password='x', role=User.Roles.ADMIN)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.club = Club.objects.create(name='Club Credenciales')
+        otro = Club.objects.create(name='Otro Club')
+        os.makedirs(os.path.join(self.media.name, 'fotos_deportistas'))
+        Image.new('RGB', (600, 600), (200, 100, 50)).save(os.path.join(self.media.name, 'fotos_deportistas', 'f.jpg'))
+        for i in range(6):
+            Deportista.objects.create(
+                first_name=f'Cred{i}', apellido_paterno=f'Ape{i}', fecha_nacimiento=date(2000, 1, 1), ci=f'CRED{i}',
+                club=self.club, foto='fotos_deportistas/f.jpg' if i == 0 else None,
+            )
+        Deportista.objects.create(first_name='Ajeno', apellido_paterno='X', fecha_nacimiento=date(2000, 1, 1), ci='CRED9', club=otro)
+        self.url = '/api/competencias/reports/credenciales/'
+
+    def test_lotes_por_club_cacheados_y_comando(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.client.get(self.url, {'club': self.club.id, 'hoja': 'carta'})
+        self.assertEqual(respuesta.status_code, 202)
+        self.assertEqual(respuesta.data['total'], 6)
+        self.assertEqual([l['nombre_archivo'] for l in respuesta.data['lotes']],
+                         [f'Credenciales_club_{self.club.id}_1.pdf', f'Credenciales_club_{self.club.id}_2.pdf'])
+
+        # Segunda vez: todo en caché, mismos trabajos
+        repetida = self.client.get(self.url, {'club': self.club.id, 'hoja': 'carta'})
+        self.assertEqual(repetida.status_code, 200)
+        self.assertEqual([l['id'] for l in repetida.data['lotes']], [l['id'] for l in respuesta.data['lotes']])
+        descarga = self.client.get(repetida.data['lotes'][0]['descarga'])
+        self.assertEqual(b''.join(descarga.streaming_content).count(b'/Type /Page\n'), 1)
+
+        salida = os.path.join(self.media.name, 'salida')
+        call_command('imprimir_credenciales', club=self.club.id, hoja='carta', salida=salida, stdout=io.StringIO())
+        self.assertEqual(len(os.listdir(salida)), 2)
+        self.assertEqual(TrabajoPDF.objects.count(), 2)
+
+        self.assertEqual(self.client.get(self.url, {'hoja': 'A3'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'ids': '999'}).status_code, 404)
+
+    def test_varias_credenciales_por_hoja(self):
+        filas = [{'nombre': f'Atleta {i}', 'ci': str(i), 'club': None, 'categoria': None, 'vence': date(2027, 1, 1),
+                  'foto': 'fotos_deportistas/f.jpg'} for i in range(25)]
+        destino = io.BytesIO()
+        self.assertEqual(generar_credenciales_pdf(destino, filas), 25)
+        # 2x5 por hoja A4; la foto se decodifica una sola vez
+        self.assertEqual(destino.getvalue().count(b'/Type /Page\n'), 3)
+        self.assertEqual(len(get_cache_imagenes()), 1)
+
+
+class DiplomasCompetenciaTestCase(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='secretaria', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.competencia = Competencia.objects.create(name='Copa Diplomas', start_date=date(2025, 8, 1))
+        modalidad = Modalidad.objects.create(name='Carabina')
+        self.categoria = Categoria.objects.create(name='Juvenil', modalidad=modalidad)
+        for i in range(5):
+            deportista = Deportista.objects.create(
+                first_name=f'Dip{i}', apellido_paterno=f'Ape{i}', fecha_nacimiento=date(2000, 1, 1), ci=f'DIP{i}'
+            )
+            ins = Inscripcion.objects.create(competencia=self.competencia, deportista=deportista)
+            participacion = Participacion.objects.create(inscripcion=ins, modalidad=modalidad, categoria=self.categoria)
+            Resultado.objects.create(
+                inscripcion=ins, participacion=participacion, puntaje=Decimal(90 + i), codigo_verificacion=f'DIP-{i}'
+            )
+
+    def _descargar(self, **params):
+        with warnings.catch_warnings():
+            # El cliente de pruebas es síncrono y consume el iterador asíncrono de una vez
+            warnings.simplefilter('ignore')
+            respuesta = self.client.get(f'/api/competencias/competencias/{self.competencia.id}/diplomas/', params)
+            return respuesta, b''.join(respuesta) if respuesta.streaming else None
+
+    def test_pdf_multipagina_con_filtro_de_podio(self):
+        respuesta, contenido = self._descargar(podio=1, categoria=self.categoria.id)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(contenido.startswith(b'%PDF'))
+        self.assertEqual(contenido.count(b'/Type /Page\n'), 3)
+
+    def test_zip_un_pdf_por_diploma_y_una_consulta(self):
+        filas = ResultsService.get_filas_diplomas(self.competencia)
+        with self.assertNumQueries(1):
+            contenido = b''.join(zip_diplomas(self.competencia.name, filas, firmas=[]))
+        with zipfile.ZipFile(io.BytesIO(contenido)) as zf:
+            nombres = zf.namelist()
+        self.assertEqual(len(nombres), 5)
+        self.assertTrue(nombres[0].endswith('_Ape4.pdf'))
+
+        respuesta, _ = self._descargar(formato='zip')
+        self.assertEqual(respuesta['Content-Type'], 'application/zip')
+        self.assertEqual(self._descargar(formato='doc')[0].status_code, 400)
+
+
+class RankingPDFTestCase(TestCase):
+
+    def setUp(self):
+        self.competencia = Competencia.objects.create(name='Copa <Ranking>', start_date=date(2025, 9, 1))
+        modalidad = Modalidad.objects.create(name='Pistola')
+        for c, nombre in enumerate(['Mayores', 'Juvenil']):
+            categoria = Categoria.objects.create(name=nombre, modalidad=modalidad)
+            for i in range(3):
+                deportista = Deportista.objects.create(
+                    first_name=f'Rk{c}{i}', apellido_paterno='Ape', fecha_nacimiento=date(2000, 1, 1), ci=f'RK{c}{i}'
+                )
+                ins = Inscripcion.objects.create(competencia=self.competencia, deportista=deportista)
+                participacion = Participacion.objects.create(inscripcion=ins, modalidad=modalidad, categoria=categoria)
+                Resultado.objects.create(inscripcion=ins, participacion=participacion, puntaje=Decimal(80 + i))
+    
+    def test_una_consulta_agrupada_por_categoria(self):
+        with self.assertNumQueries(1):
+            filas = list(RankingService.get_ranking_competencia_pdf(self.competencia)['items'])
+        self.assertEqual([f['categoria_nombre'] for f in filas], ['Juvenil'] * 3 + ['Mayores'] * 3)
+        self.assertEqual([f['posicion'] for f in filas[:3]], [1, 2, 3])
+        self.assertEqual(filas[0]['first_name'], 'Rk12')
+
+        destino = io.BytesIO()
+        generar_pdf_ranking(destino, self.competencia, RankingService.get_ranking_competencia_pdf(self.competencia), firmas=[])
+        self.assertTrue(destino.getvalue().startswith(b'%PDF'))
+
+    def test_miles_de_filas_en_varias_paginas(self):
+        filas = [
+            {'categoria_id': i // 1500, 'categoria_nombre': f'Cat {i // 1500}', 'posicion': i % 1500 + 1,
+             'puntaje': Decimal('95.50'), 'x_count': 3, 'first_name': f'Atleta{i}', 'apellido_paterno': 'Prueba', 'club': None}
+            for i in range(3000)
+        ]
+        destino = io.BytesIO()
+        generar_pdf_ranking(destino, self.competencia, {'items': iter(filas)}, firmas=[])
+        self.assertGreater(destino.getvalue().count(b'/Type /Page\n'), 50)
+
+
+class CacheImagenesTestCase(TestCase):
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=self.media.name))
+        os.makedirs(os.path.join(self.media.name, 'firmas'))
+        for i in range(3):
+            Image.new('RGBA', (800, 400), (0, 0, 0, 0)).save(os.path.join(self.media.name, 'firmas', f'f{i}.png'))
+        cache.clear()
+        invalidar_firmas()
+        self.autoridad = AutoridadFirma.objects.create(nombre='Ana Flores', cargo='Presidenta', firma='firmas/f0.png')
+
+    def test_firmas_se_decodifican_una_vez_y_se_invalidan(self):
+        primera = firmas_activas()
+        with self.assertNumQueries(0):
+            segunda = firmas_activas()
+        self.assertIs(primera[0][2], segunda[0][2])
+        # Reducida al tamaño de dibujo
+        self.assertEqual(primera[0][2].getSize(), (600, 300))
+
+        self.autoridad.cargo = 'Vicepresidenta'
+        self.autoridad.firma = 'firmas/f1.png'
+        self.autoridad.save()
+        with self.assertNumQueries(1):
+            tercera = firmas_activas()
+        self.assertEqual(tercera[0][1], 'Vicepresidenta')
+        self.assertIsNot(tercera[0][2], primera[0][2])
+
+    def test_lru_acotado_por_bytes(self):
+        # 600x300 RGBA = 720000 bytes por entrada: caben dos
+        lru = CacheImagenes(max_bytes=1500000)
+        lectores = [lru.obtener(f'firmas/f{i}.png', 600) for i in range(3)]
+        self.assertEqual(len(lru), 2)
+        self.assertIsNot(lru.obtener('firmas/f0.png', 600), lectores[0])
+        self.assertIs(lru.obtener('firmas/f2.png', 600), lectores[2])
+        self.assertIsNone(lru.obtener('firmas/no_existe.png'))
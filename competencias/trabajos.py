@@ -0,0 +1,353 @@
+"""
+Generación de PDFs en segundo plano, sin broker externo.
+
+Cada tipo de documento registra un GeneradorPDF con tres funciones:
+'datos' (lo que entra al documento, leído con una consulta liviana),
+'render' (escribe el PDF en un archivo abierto) y 'nombre' (nombre de descarga).
+
+solicitar() calcula el SHA-256 de los datos de entrada:
+- si MEDIA_ROOT/pdf_cache/<tipo>/<hash>.pdf ya existe se sirve tal cual;
+- si no, se crea (o reutiliza) un TrabajoPDF y se encola al confirmar la
+  transacción en un ThreadPoolExecutor local (settings.PDF_WORKERS hilos).
+
+La tabla TrabajoPDF es la cola: un trabajo se toma con un UPDATE condicional,
+así que el pool del proceso web y el comando procesar_trabajos_pdf pueden
+convivir sin generar dos veces el mismo documento.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Callable, Dict, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from reportlab.lib.pagesizes import A4, letter
+
+from deportistas.models import Deportista
+
+from .models import AutoridadFirma, Competencia, Inscripcion, Resultado, TrabajoPDF
+
+logger = logging.getLogger(__name__)
+
+# Subir al cambiar el diseño de algún PDF: los archivos cacheados dejan de coincidir
+VERSION_PLANTILLAS = 2
+DIRECTORIO_CACHE = 'pdf_cache'
+# Minutos en PROCESANDO tras los cuales se asume que el proceso murió
+ATASCADOS_MIN = 15
+
+
+@dataclass
+class GeneradorPDF:
+    tipo: str
+    datos: Callable[[Dict[str, Any]], Any]
+    render: Callable[[Any, Dict[str, Any]], None]
+    nombre: Callable[[Dict[str, Any]], str]
+
+
+@dataclass
+class Solicitud:
+    """Resultado de solicitar(): el archivo listo o el trabajo encolado."""
+    ruta: str
+    nombre: str
+    trabajo: Optional[TrabajoPDF] = None
+
+    @property
+    def listo(self) -> bool:
+        return self.trabajo is None or self.trabajo.estado == TrabajoPDF.Estados.LISTO
+
+
+_generadores: Dict[str, GeneradorPDF] = {}
+
+
+def registrar(tipo: str, datos, render, nombre) -> None:
+    _generadores[tipo] = GeneradorPDF(tipo, datos, render, nombre)
+
+
+def get_generador(tipo: str) -> GeneradorPDF:
+    try:
+        return _generadores[tipo]
+    except KeyError:
+        raise ValueError(f"Tipo de PDF desconocido: {tipo}")
+
+
+def calcular_clave(tipo: str, datos: Any) -> str:
+    crudo = json.dumps([tipo, VERSION_PLANTILLAS, datos], sort_keys=True, default=str)
+    return hashlib.sha256(crudo.encode('utf-8')).hexdigest()
+
+
+def ruta_absoluta(relativa: str) -> str:
+    return os.path.join(settings.MEDIA_ROOT, relativa)
+
+
+# --- SOLICITUD ---
+
+def solicitar(tipo: str, parametros: Dict[str, Any], user=None) -> Solicitud:
+    generador = get_generador(tipo)
+    clave = calcular_clave(tipo, generador.datos(parametros))
+    relativa = os.path.join(DIRECTORIO_CACHE, tipo, f"{clave}.pdf")
+    nombre = generador.nombre(parametros)
+    if os.path.exists(ruta_absoluta(relativa)):
+        return Solicitud(ruta_absoluta(relativa), nombre)
+
+    # El mismo documento pedido varias veces mientras se genera: un solo trabajo.
+    # Si quedó atascado (proceso caído a mitad), vuelve a la cola y se despacha de nuevo.
+    en_curso = TrabajoPDF.objects.filter(clave=clave, tipo=tipo)
+    if reencolar_atascados(en_curso):
+        for trabajo_id in en_curso.filter(estado=TrabajoPDF.Estados.PENDIENTE).values_list('id', flat=True):
+            encolar(trabajo_id)
+    trabajo = en_curso.filter(
+        estado__in=[TrabajoPDF.Estados.PENDIENTE, TrabajoPDF.Estados.PROCESANDO]
+    ).first()
+    if trabajo is None:
+        trabajo = TrabajoPDF.objects.create(
+            tipo=tipo, parametros=parametros, clave=clave, nombre_archivo=nombre, archivo=relativa,
+            solicitado_por=user if user is not None and user.is_authenticated else None,
+        )
+        encolar(trabajo.id)
+        # Con PDF_WORKERS=0 y sin transacción abierta ya quedó generado
+        trabajo.refresh_from_db()
+    return Solicitud(ruta_absoluta(relativa), nombre, trabajo)
+
+
+# --- POOL LOCAL ---
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=settings.PDF_WORKERS, thread_name_prefix='pdf')
+        return _pool
+
+
+def encolar(trabajo_id) -> None:
+    """Despacha el trabajo al confirmar la transacción (si se revierte, no existe)."""
+    transaction.on_commit(lambda: _despachar(trabajo_id))
+
+
+def _despachar(trabajo_id) -> None:
+    if getattr(settings, 'PDF_WORKERS', 2) <= 0:
+        procesar(trabajo_id)
+    else:
+        _get_pool().submit(_procesar_en_hilo, trabajo_id)
+
+
+def _procesar_en_hilo(trabajo_id) -> None:
+    try:
+        procesar(trabajo_id)
+    finally:
+        close_old_connections()
+
+
+def procesar(trabajo_id) -> bool:
+    """Toma el trabajo si sigue pendiente, genera el PDF y lo deja en su ruta final."""
+    tomado = TrabajoPDF.objects.filter(pk=trabajo_id, estado=TrabajoPDF.Estados.PENDIENTE).update(
+        estado=TrabajoPDF.Estados.PROCESANDO, iniciado_en=timezone.now(), intentos=F('intentos') + 1
+    )
+    if not tomado:
+        return False
+    trabajo = TrabajoPDF.objects.get(pk=trabajo_id)
+    destino = ruta_absoluta(trabajo.archivo)
+    temporal = f"{destino}.{uuid.uuid4().hex}.tmp"
+    try:
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        with open(temporal, 'wb') as archivo:
+            get_generador(trabajo.tipo).render(archivo, trabajo.parametros)
+        # Reemplazo atómico: nadie sirve un PDF a medio escribir
+        os.replace(temporal, destino)
+    except Exception as e:
+        logger.exception("Falló la generación del PDF %s (%s)", trabajo.id, trabajo.tipo)
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        TrabajoPDF.objects.filter(pk=trabajo_id).update(
+            estado=TrabajoPDF.Estados.ERROR, error=str(e)[:1000], terminado_en=timezone.now()
+        )
+        return False
+    TrabajoPDF.objects.filter(pk=trabajo_id).update(estado=TrabajoPDF.Estados.LISTO, terminado_en=timezone.now())
+    return True
+
+
+# --- MANTENIMIENTO (comando procesar_trabajos_pdf) ---
+
+def reencolar_atascados(trabajos=None, atascados_min: int = ATASCADOS_MIN) -> int:
+    """Devuelve a PENDIENTE los trabajos en PROCESANDO hace más de 'atascados_min' (proceso caído)."""
+    trabajos = TrabajoPDF.objects.all() if trabajos is None else trabajos
+    return trabajos.filter(
+        estado=TrabajoPDF.Estados.PROCESANDO, iniciado_en__lt=timezone.now() - timedelta(minutes=atascados_min)
+    ).update(estado=TrabajoPDF.Estados.PENDIENTE)
+
+
+def drenar(limite: Optional[int] = None, atascados_min: int = ATASCADOS_MIN) -> int:
+    """
+    Procesa en este hilo los trabajos pendientes, los más viejos primero.
+    Los que quedaron en PROCESANDO más de 'atascados_min' (proceso caído) vuelven a la cola.
+    """
+    reencolar_atascados(atascados_min=atascados_min)
+    pendientes = TrabajoPDF.objects.filter(estado=TrabajoPDF.Estados.PENDIENTE).order_by('creado_en').values_list('id', flat=True)
+    if limite:
+        pendientes = pendientes[:limite]
+    return sum(1 for trabajo_id in list(pendientes) if procesar(trabajo_id))
+
+
+def purgar(dias: int) -> int:
+    """Borra los PDFs cacheados y los trabajos terminados con más de 'dias' de antigüedad."""
+    limite = time.time() - dias * 86400
+    borrados = 0
+    for raiz, _, archivos in os.walk(ruta_absoluta(DIRECTORIO_CACHE)):
+        for nombre in archivos:
+            ruta = os.path.join(raiz, nombre)
+            if os.path.getmtime(ruta) < limite:
+                os.remove(ruta)
+                borrados += 1
+    TrabajoPDF.objects.filter(
+        estado__in=[TrabajoPDF.Estados.LISTO, TrabajoPDF.Estados.ERROR],
+        creado_en__lt=timezone.now() - timedelta(days=dias)
+    ).delete()
+    return borrados
+
+
+# --- GENERADORES DE COMPETENCIAS ---
+# 'datos' devuelve todo lo que se imprime: si algo cambia, cambia el hash.
+
+def _firmas():
+    return list(AutoridadFirma.objects.filter(activo=True).values_list('id', 'nombre', 'cargo', 'firma')[:3])
+
+
+def _datos_ranking(p):
+    from .services import RankingService
+    return {
+        'competencia': Competencia.objects.filter(pk=p['competencia']).values('name', 'start_date', 'status').first(),
+        'filas': list(RankingService.get_filas_ranking_pdf(p['competencia']).values_list(
+            'categoria_nombre', 'posicion', 'puntaje', 'x_count', 'first_name', 'apellido_paterno', 'club'
+        )),
+        'firmas': _firmas(),
+    }
+
+
+def _render_ranking(archivo, p):
+    from .reports import generar_pdf_ranking
+    from .services import RankingService
+    competencia = Competencia.objects.get(pk=p['competencia'])
+    generar_pdf_ranking(archivo, competencia, RankingService.get_ranking_competencia_pdf(competencia))
+
+
+def _datos_diploma(p):
+    return {
+        'resultado': Resultado.objects.filter(pk=p['resultado']).values(
+            'puntaje', 'codigo_verificacion', 'inscripcion__deportista__first_name',
+            'inscripcion__deportista__apellido_paterno', 'inscripcion__competencia__name'
+        ).first(),
+        'firmas': _firmas(),
+    }
+
+
+def _render_diploma(archivo, p):
+    from .reports import generar_diploma_pdf
+    generar_diploma_pdf(archivo, Resultado.objects.select_related(
+        'inscripcion__deportista', 'inscripcion__competencia'
+    ).get(pk=p['resultado']))
+
+
+def _datos_recibo(p):
+    return Inscripcion.objects.filter(pk=p['inscripcion']).values(
+        'fecha_inscripcion', 'monto_pagado', 'deportista__first_name', 'deportista__apellido_paterno', 'competencia__name'
+    ).first()
+
+
+def _render_recibo(archivo, p):
+    from .reports import generar_recibo_pdf
+    generar_recibo_pdf(archivo, Inscripcion.objects.select_related('deportista', 'competencia').get(pk=p['inscripcion']))
+
+
+# --- CREDENCIALES POR LOTES ---
+# Una temporada completa son miles de credenciales: se parten en lotes de
+# CREDENCIALES_POR_LOTE deportistas, cada uno un trabajo (y un PDF cacheado)
+# propio, así el pool y los procesos procesar_trabajos_pdf los generan en paralelo
+# y un deportista modificado solo regenera su lote.
+
+CREDENCIALES_POR_LOTE = 200
+HOJAS = {'A4': A4, 'carta': letter}
+_ORDEN_CREDENCIALES = ('club__name', 'apellido_paterno', 'apellido_materno', 'first_name', 'id')
+
+
+def seleccionar_credenciales(club_id=None, status=None, ids=None):
+    """Ids de deportistas (no históricos) a imprimir, en el orden de impresión."""
+    qs = Deportista.objects.filter(es_historico=False)
+    if club_id:
+        qs = qs.filter(club_id=club_id)
+    if status:
+        qs = qs.filter(status=status)
+    if ids:
+        qs = qs.filter(id__in=ids)
+    return list(qs.order_by(*_ORDEN_CREDENCIALES).values_list('id', flat=True))
+
+
+def _filas_credenciales(ids):
+    return Deportista.objects.filter(id__in=ids).order_by(*_ORDEN_CREDENCIALES).values(
+        'id', 'first_name', 'apellido_paterno', 'ci', 'tipo_modalidad', 'vencimiento_credencial', 'foto',
+        'updated_at', club_nombre=F('club__name'),
+    )
+
+
+def _datos_credenciales(p):
+    return {'hoja': p['hoja'], 'filas': list(_filas_credenciales(p['ids']))}
+
+
+def _render_credenciales(archivo, p):
+    from .reports import generar_credenciales_pdf
+    modalidades = dict(Deportista.TIPO_MODALIDAD_CHOICES)
+    filas = (
+        {
+            'nombre': f"{f['first_name']} {f['apellido_paterno']}", 'ci': f['ci'], 'club': f['club_nombre'],
+            'categoria': modalidades.get(f['tipo_modalidad']), 'vence': f['vencimiento_credencial'], 'foto': f['foto'],
+        }
+        for f in _filas_credenciales(p['ids']).iterator(chunk_size=CREDENCIALES_POR_LOTE)
+    )
+    generar_credenciales_pdf(archivo, filas, HOJAS[p['hoja']])
+
+
+def solicitar_credenciales(ids, hoja='A4', etiqueta='seleccion', user=None):
+    """
+    Solicita las credenciales de 'ids' (ya ordenados) en lotes. Devuelve un
+    TrabajoPDF por lote; los lotes ya cacheados vuelven como trabajos LISTO.
+    """
+    if hoja not in HOJAS:
+        raise ValueError(f"Hoja desconocida: {hoja}")
+    lotes = []
+    for parte, inicio in enumerate(range(0, len(ids), CREDENCIALES_POR_LOTE), 1):
+        parametros = {'ids': list(ids[inicio:inicio + CREDENCIALES_POR_LOTE]), 'hoja': hoja,
+                      'etiqueta': etiqueta, 'parte': parte}
+        solicitud = solicitar('credenciales', parametros, user)
+        trabajo = solicitud.trabajo
+        if trabajo is None:
+            # PDF ya en caché: se devuelve (o registra) un trabajo terminado para poder descargarlo
+            clave = os.path.splitext(os.path.basename(solicitud.ruta))[0]
+            trabajo = TrabajoPDF.objects.filter(tipo='credenciales', clave=clave, estado=TrabajoPDF.Estados.LISTO).first()
+            if trabajo is None:
+                trabajo = TrabajoPDF.objects.create(
+                    tipo='credenciales', parametros=parametros, clave=clave, nombre_archivo=solicitud.nombre,
+                    archivo=os.path.relpath(solicitud.ruta, settings.MEDIA_ROOT),
+                    estado=TrabajoPDF.Estados.LISTO, terminado_en=timezone.now(),
+                    solicitado_por=user if user is not None and user.is_authenticated else None,
+                )
+        lotes.append(trabajo)
+    return lotes
+
+
+registrar('ranking', _datos_ranking, _render_ranking, lambda p: f"Ranking_{p['competencia']}.pdf")
+registrar('diploma', _datos_diploma, _render_diploma, lambda p: f"Diploma_{p['resultado']}.pdf")
+registrar('recibo', _datos_recibo, _render_recibo, lambda p: f"Recibo_{p['inscripcion']}.pdf")
+registrar('credenciales', _datos_credenciales, _render_credenciales,
+          lambda p: f"Credenciales_{p['etiqueta']}_{p['parte']}.pdf")
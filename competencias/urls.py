@@ -3,8 +3,9 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     CompetenciaViewSet, InscripcionViewSet, ResultadoViewSet, 
     PoligonoViewSet, JuezViewSet, ModalidadViewSet, CategoriaViewSet,
-    GastoViewSet, InscripcionCreateAPIView, ScoreSubmissionAPIView,
+    GastoViewSet, InscripcionCreateAPIView, ScoreSubmissionAPIView, ScoreBulkSubmissionAPIView,
     ReportViewSet, # Importamos el nuevo ViewSet de reportes
+    TrabajoPDFViewSet,
     AnnualRankingView, ClubRankingView, DepartmentalRecordsView
 )
 
@@ -22,6 +23,8 @@ router.register(r'gastos', GastoViewSet)
 # NUEVA RUTA: Reportes Avanzados
 # 'basename' es obligatorio aquí porque ReportViewSet no tiene un 'queryset' directo
 router.register(r'reports', ReportViewSet, basename='reports')
+# Estado y descarga de PDFs generados en segundo plano
+router.register(r'trabajos-pdf', TrabajoPDFViewSet, basename='trabajos-pdf')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -29,6 +32,7 @@ urlpatterns = [
     # Endpoints de acción específica
     path('inscripciones/create/', InscripcionCreateAPIView.as_view(), name='inscripcion-create'),
     path('submit-score/', ScoreSubmissionAPIView.as_view(), name='submit-score'),
+    path('submit-scores/bulk/', ScoreBulkSubmissionAPIView.as_view(), name='submit-scores-bulk'),
     
     # Endpoints Legacy (Mantenidos por compatibilidad)
     path('rankings/annual/', AnnualRankingView.as_view(), name='annual-ranking'),
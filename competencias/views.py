@@ -1,8 +1,12 @@
-from django.http import HttpResponse
+import itertools
+import tempfile
+
+from django.http import FileResponse, StreamingHttpResponse
 from django.core.exceptions import ValidationError
+from django.db import IntegrityError
 
 # DRF Imports
-from rest_framework import viewsets, generics, status
+from rest_framework import mixins, viewsets, generics, status
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -11,7 +15,8 @@ from rest_framework.views import APIView
 # Modelos
 from .models import (
     Competencia, Modalidad, Categoria, Poligono, Juez, 
-    Inscripcion, Resultado, Gasto, CategoriaCompetencia # <--- Importamos modelo intermedio
+    Inscripcion, Resultado, Gasto, CategoriaCompetencia, # <--- Importamos modelo intermedio
+    TrabajoPDF
 )
 
 # Serializadores
@@ -20,7 +25,8 @@ from .serializers import (
     PoligonoSerializer, JuezSerializer, InscripcionSerializer, 
     InscripcionCreateSerializer, ScoreSubmissionSerializer, 
     ResultadoSerializer, GastoSerializer,
-    CategoriaCompetenciaInfoSerializer # <--- Importamos nuevo serializer
+    CategoriaCompetenciaInfoSerializer, # <--- Importamos nuevo serializer
+    TrabajoPDFSerializer
 )
 
 # Capa de Servicios
@@ -28,9 +34,23 @@ from .services import (
     CompetitionService, 
     ResultsService, 
     RankingService, 
-    ReportService
+    ReportService,
+    InscripcionService
 )
-from .reports import generar_pdf_ranking, generar_recibo_pdf, generar_diploma_pdf
+from . import trabajos
+from .reports import bloques_archivo, cargar_firmas, generar_diplomas_pdf, iterar_async, zip_diplomas
+
+def respuesta_pdf(request, tipo, parametros):
+    """
+    PDF ya generado con los mismos datos: se sirve directo desde MEDIA_ROOT.
+    Si no, se encola y se responde 202 con el trabajo para consultar su estado.
+    """
+    solicitud = trabajos.solicitar(tipo, parametros, request.user)
+    if solicitud.listo:
+        return FileResponse(open(solicitud.ruta, 'rb'), as_attachment=True,
+                            filename=solicitud.nombre, content_type='application/pdf')
+    data = TrabajoPDFSerializer(solicitud.trabajo, context={'request': request}).data
+    return Response(data, status=status.HTTP_202_ACCEPTED)
 
 # --- VIEWSETS PRINCIPALES ---
 
@@ -40,17 +60,32 @@ class InscripcionViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Inscripcion.objects.select_related('deportista', 'competencia', 'club')
+        return Inscripcion.objects.select_related('deportista', 'competencia', 'club').prefetch_related(
+            'participaciones__modalidad', 'participaciones__categoria'
+        ).con_costo_total()
 
     @action(detail=True, methods=['get'])
     def print_receipt(self, request, pk=None):
-        """Genera el recibo de inscripción en PDF."""
+        """Recibo de inscripción en PDF (cacheado o encolado)."""
         inscripcion = self.get_object()
-        response = HttpResponse(content_type='application/pdf')
-        filename = f"Recibo_{inscripcion.id}.pdf"
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        generar_recibo_pdf(response, inscripcion)
-        return response
+        return respuesta_pdf(request, 'recibo', {'inscripcion': inscripcion.id})
+
+    @action(detail=False, methods=['post'])
+    def roster(self, request):
+        """
+        Inscribe la nómina de un club en una sola transacción:
+        {"competencia": id, "inscripciones": [{"deportista", "categorias", "arma"}], "parcial": false}
+        """
+        try:
+            resultado = InscripcionService.inscribir_nomina(request.data, request.user)
+        except ValidationError as e:
+            return Response({"detail": e.messages}, status=400)
+        except IntegrityError:
+            return Response({"detail": "Otra solicitud inscribió a alguno de estos deportistas. Reintente."}, status=409)
+
+        if resultado['errores'] and not resultado['creadas']:
+            return Response(resultado, status=400)
+        return Response(resultado, status=status.HTTP_201_CREATED)
 
 
 class CompetenciaViewSet(viewsets.ModelViewSet):
@@ -70,20 +105,79 @@ class CompetenciaViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['get'])
     def generate_report(self, request, pk=None):
-        """Genera el ranking preliminar en PDF."""
+        """Ranking preliminar en PDF (cacheado o encolado)."""
         competencia = self.get_object()
-        ranking_data = RankingService.get_ranking_competencia_pdf(competencia)
-        
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="Ranking_{competencia.id}.pdf"'
-        generar_pdf_ranking(response, competencia, ranking_data)
+        return respuesta_pdf(request, 'ranking', {'competencia': competencia.id})
+
+    @action(detail=True, methods=['get'])
+    def diplomas(self, request, pk=None):
+        """
+        Todos los diplomas de la competencia en un documento:
+        ?formato=pdf (multipágina, por defecto) o zip (un PDF por diploma),
+        ?categoria=<id> y ?podio=1 para limitar a los tres primeros.
+        """
+        competencia = self.get_object()
+        formato = request.query_params.get('formato', 'pdf')
+        if formato not in ('pdf', 'zip'):
+            return Response({"detail": "'formato' debe ser 'pdf' o 'zip'."}, status=400)
+        categoria = request.query_params.get('categoria')
+        if categoria is not None and not categoria.isdigit():
+            return Response({"detail": "'categoria' debe ser un id."}, status=400)
+        podio = request.query_params.get('podio', '').lower() in ('1', 'true', 'si')
+
+        filas = ResultsService.get_filas_diplomas(competencia, int(categoria) if categoria else None, podio)
+        primera = next(filas, None)
+        if primera is None:
+            return Response({"detail": "No hay resultados para generar diplomas."}, status=404)
+        filas = itertools.chain([primera], filas)
+        firmas = cargar_firmas()
+
+        if formato == 'zip':
+            response = StreamingHttpResponse(iterar_async(zip_diplomas(competencia.name, filas, firmas)),
+                                             content_type='application/zip')
+            response['Content-Disposition'] = f'attachment; filename="Diplomas_{competencia.id}.zip"'
+            return response
+
+        # ReportLab escribe el PDF al final (tabla xref): se arma en un temporal que pasa
+        # a disco si crece y se envía por bloques
+        archivo = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+        generar_diplomas_pdf(archivo, competencia.name, filas, firmas)
+        response = StreamingHttpResponse(iterar_async(bloques_archivo(archivo)), content_type='application/pdf')
+        response['Content-Disposition'] = f'attachment; filename="Diplomas_{competencia.id}.pdf"'
         return response
 
     @action(detail=True, methods=['get'])
     def official_results(self, request, pk=None):
-        """Obtiene JSON con resultados oficiales para el frontend."""
+        """
+        Obtiene JSON con resultados oficiales para el frontend.
+        Con ?top=N (y opcionalmente ?categoria=<id>|general) se sirve el top-N
+        por categoría desde el leaderboard en vivo, sin consultar la base de datos.
+        """
         competencia = self.get_object()
-        data = ResultsService.get_official_results_data(competencia)
+        top = request.query_params.get('top')
+        if top is None:
+            return Response(ResultsService.get_official_results_data(competencia))
+
+        if not top.isdigit() or int(top) < 1:
+            return Response({"detail": "'top' debe ser un entero positivo."}, status=400)
+        categoria = request.query_params.get('categoria')
+        categoria_ids = None
+        if categoria:
+            if categoria != 'general' and not categoria.isdigit():
+                return Response({"detail": "Categoría inválida."}, status=400)
+            categoria_ids = [None if categoria == 'general' else int(categoria)]
+        data = RankingService.get_leaderboard_top(competencia, min(int(top), 500), categoria_ids)
+        return Response(data)
+
+    @action(detail=True, methods=['get'])
+    def athlete_rank(self, request, pk=None):
+        """Posición en vivo de un deportista en su categoría. Uso: ?deportista=<id>"""
+        competencia = self.get_object()
+        deportista = request.query_params.get('deportista')
+        if not deportista or not deportista.isdigit():
+            return Response({"detail": "Falta 'deportista'."}, status=400)
+        data = RankingService.get_posicion_deportista(competencia, int(deportista))
+        if not data: return Response({"detail": "El deportista no tiene resultados en esta competencia."}, status=404)
         return Response(data)
 
     # --- NUEVO ENDPOINT PARA COSTOS ---
@@ -106,12 +200,29 @@ class ResultadoViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['get'])
     def print_diploma(self, request, pk=None):
-        """Genera diploma de participación."""
+        """Diploma de participación en PDF (cacheado o encolado)."""
         resultado = self.get_object()
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="Diploma_{resultado.id}.pdf"'
-        generar_diploma_pdf(response, resultado)
-        return response
+        return respuesta_pdf(request, 'diploma', {'resultado': resultado.id})
+
+class TrabajoPDFViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """Estado y descarga de los PDFs encolados por respuesta_pdf."""
+    queryset = TrabajoPDF.objects.all()
+    serializer_class = TrabajoPDFSerializer
+    permission_classes = [IsAuthenticated]
+
+    @action(detail=True, methods=['get'])
+    def descargar(self, request, pk=None):
+        trabajo = self.get_object()
+        if trabajo.estado == TrabajoPDF.Estados.ERROR:
+            return Response({"detail": "No se pudo generar el documento.", "error": trabajo.error}, status=500)
+        if trabajo.estado != TrabajoPDF.Estados.LISTO:
+            return Response(self.get_serializer(trabajo).data, status=status.HTTP_202_ACCEPTED)
+        ruta = trabajos.ruta_absoluta(trabajo.archivo)
+        try:
+            archivo = open(ruta, 'rb')
+        except FileNotFoundError:
+            return Response({"detail": "El documento fue depurado; vuelva a solicitarlo."}, status=410)
+        return FileResponse(archivo, as_attachment=True, filename=trabajo.nombre_archivo, content_type='application/pdf')
 
 # --- VIEWSETS DE REPORTES ---
 
@@ -153,6 +264,43 @@ class ReportViewSet(viewsets.ViewSet):
             return Response(data)
         except ValueError: return Response({"detail": "Parámetros inválidos."}, status=400)
 
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def anual(self, request):
+        year = request.query_params.get('year')
+        if not year or not year.isdigit(): return Response({"detail": "Falta 'year'."}, status=400)
+        try:
+            return Response(ReportService.get_annual_report(int(year)))
+        except ValueError: return Response({"detail": "Parámetros inválidos."}, status=400)
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def credenciales(self, request):
+        """
+        Credenciales de un club o de una selección (?club, ?status, ?ids=1,2,3),
+        varias por hoja (?hoja=A4|carta). Responde un trabajo por lote:
+        200 si todos están listos, 202 si alguno sigue en la cola.
+        """
+        params = request.query_params
+        hoja = params.get('hoja', 'A4')
+        if hoja not in trabajos.HOJAS:
+            return Response({"detail": "Hoja inválida (A4 o carta)."}, status=400)
+        try:
+            club_id = int(params['club']) if params.get('club') else None
+            ids = [int(i) for i in params['ids'].split(',') if i.strip()] if params.get('ids') else None
+        except ValueError:
+            return Response({"detail": "Parámetros inválidos."}, status=400)
+
+        seleccion = trabajos.seleccionar_credenciales(club_id, params.get('status'), ids)
+        if not seleccion:
+            return Response({"detail": "No hay deportistas para esa selección."}, status=404)
+        etiqueta = f"club_{club_id}" if club_id else 'seleccion'
+        lotes = trabajos.solicitar_credenciales(seleccion, hoja, etiqueta, request.user)
+        listos = all(t.estado == TrabajoPDF.Estados.LISTO for t in lotes)
+        return Response({
+            "total": len(seleccion),
+            "hoja": hoja,
+            "lotes": TrabajoPDFSerializer(lotes, many=True, context={'request': request}).data,
+        }, status=status.HTTP_200_OK if listos else status.HTTP_202_ACCEPTED)
+
 # --- API VIEWS ESPECIALIZADAS ---
 
 class ScoreSubmissionAPIView(APIView):
@@ -171,6 +319,22 @@ class ScoreSubmissionAPIView(APIView):
             print(f"Error procesando puntajes: {e}")
             return Response({"detail": "Error interno.", "error": str(e)}, status=500)
 
+class ScoreBulkSubmissionAPIView(APIView):
+    """Recibe la planilla completa de una tanda: una lista de {inscripcion, series}."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        if not isinstance(request.data, list):
+            return Response({"detail": "Se esperaba una lista de puntajes."}, status=400)
+        try:
+            resultados = ResultsService.procesar_envio_puntajes_lote(
+                data=request.data,
+                context={'request': request}
+            )
+            return Response(ResultadoSerializer(resultados, many=True).data, status=200)
+        except ValidationError as e:
+            return Response({"detail": e.messages}, status=400)
+
 class InscripcionCreateAPIView(generics.CreateAPIView): 
     queryset = Inscripcion.objects.all()
     serializer_class = InscripcionCreateSerializer
@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Deportista, Arma, DocumentoDeportista, PrestamoArma
+from django.db.models import Q
+from .models import Deportista, DeportistaQuerySet, Arma, DocumentoDeportista, PrestamoArma
+from .busqueda import buscar_ids
 
 # --- INLINES ---
 # Esto permite ver y editar Armas y Documentos dentro de la pantalla del Deportista
@@ -13,6 +15,20 @@ class DocumentoInline(admin.TabularInline):
     extra = 0
     readonly_fields = ('uploaded_at',)
 
+# --- FILTROS ---
+class ElegibilidadFilter(admin.SimpleListFilter):
+    """Filtra por el código de elegibilidad calculado en SQL (con_elegibilidad)."""
+    title = 'Elegibilidad'
+    parameter_name = 'elegibilidad'
+
+    def lookups(self, request, model_admin):
+        return DeportistaQuerySet.CODIGOS_ELEGIBILIDAD
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(elegibilidad=self.value())
+        return queryset
+
 # --- ADMIN PRINCIPAL ---
 @admin.register(Deportista)
 class DeportistaAdmin(admin.ModelAdmin):
@@ -25,10 +41,11 @@ class DeportistaAdmin(admin.ModelAdmin):
         'club', 
         'tipo_modalidad', 
         'status',
+        'elegibilidad_display',
         'get_edad_display' # Usamos un método wrapper para mostrar la edad
     )
     
-    list_filter = ('status', 'tipo_modalidad', 'club', 'es_invitado', 'departamento_origen')
+    list_filter = (ElegibilidadFilter, 'status', 'tipo_modalidad', 'club', 'es_invitado', 'departamento_origen')
     
     search_fields = ('first_name', 'apellido_paterno', 'apellido_materno', 'ci', 'codigo_unico')
     
@@ -55,6 +72,23 @@ class DeportistaAdmin(admin.ModelAdmin):
 
     inlines = [DocumentoInline, ArmaInline]
     
+    def get_queryset(self, request):
+        # La elegibilidad viaja en la misma consulta del listado
+        return super().get_queryset(request).con_elegibilidad()
+
+    def get_search_results(self, request, queryset, search_term):
+        # Además de search_fields, nombres parciales sin tildes vía el índice de búsqueda
+        base = queryset
+        queryset, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        ids = buscar_ids(search_term, limite=500) if search_term else []
+        if ids:
+            queryset = base.filter(Q(pk__in=queryset.values('pk')) | Q(pk__in=ids))
+        return queryset, may_have_duplicates
+
+    @admin.display(description='Elegibilidad', ordering='elegibilidad')
+    def elegibilidad_display(self, obj):
+        return dict(DeportistaQuerySet.CODIGOS_ELEGIBILIDAD).get(obj.elegibilidad, obj.elegibilidad)
+
     # Método para mostrar la edad en la lista (wrapper del modelo)
     @admin.display(description='Edad', ordering='fecha_nacimiento')
     def get_edad_display(self, obj):
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class DeportistasConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'deportistas'
+
+    def ready(self):
+        # Importar señales cuando la app arranca
+        import deportistas.signals
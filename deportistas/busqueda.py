@@ -0,0 +1,154 @@
+"""
+Búsqueda de deportistas por nombre parcial, CI o código único.
+
+Los nombres se normalizan (minúsculas, sin tildes ni signos) en
+Deportista.nombre_normalizado. En Postgres con pg_trgm se filtra por similitud
+de palabra (operador %>, umbral pg_trgm.word_similarity_threshold) con el
+índice GIN de trigramas; así un fragmento inicial como 'gonz' encuentra
+'gonzalez' y tolera errores de tipeo. En cualquier otro motor (SQLite en
+desarrollo) se usa un índice de prefijos de token en memoria del proceso, que
+se reconstruye cuando cambia el sello de versión que las señales guardan en la caché.
+
+Orden del resultado: CI/código exacto, luego coincidencias de token completo
+(o mayor similitud de trigramas) y por último apellido.
+"""
+import threading
+import unicodedata
+import uuid
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+
+from .models import Deportista
+
+_CLAVE_VERSION = "deportistas_busqueda_version"
+_MAX_TOKEN = '\U0010ffff'
+
+
+def normalizar(texto: Optional[str]) -> str:
+    """'  Péréz-Ñuñez ' -> 'perez nunez' (sin tildes, minúsculas, solo alfanuméricos)."""
+    if not texto:
+        return ''
+    plano = ''.join(
+        c for c in unicodedata.normalize('NFKD', texto) if not unicodedata.combining(c)
+    ).lower()
+    return ' '.join(''.join(c if c.isalnum() else ' ' for c in plano).split())
+
+
+def texto_busqueda(first_name, apellido_paterno, apellido_materno, ci, codigo_unico) -> str:
+    """Texto normalizado que se guarda en Deportista.nombre_normalizado."""
+    return normalizar(' '.join(filter(None, [first_name, apellido_paterno, apellido_materno, ci, codigo_unico])))
+
+
+def invalidar_indice() -> None:
+    """Marca el índice en memoria como viejo en todos los procesos."""
+    cache.set(_CLAVE_VERSION, uuid.uuid4().hex, None)
+
+
+class IndicePrefijos:
+    """Lista ordenada (token, id) para búsquedas por prefijo con bisect."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.version = None
+        self._tokens: List[Tuple[str, int]] = []
+        self._docs: Dict[int, Tuple[frozenset, str, str]] = {}
+
+    def construir(self, version) -> None:
+        tokens, docs = [], {}
+        filas = Deportista.objects.values_list(
+            'id', 'first_name', 'apellido_paterno', 'apellido_materno', 'ci', 'codigo_unico'
+        )
+        for pk, nombre, paterno, materno, ci, codigo in filas:
+            propios = frozenset(texto_busqueda(nombre, paterno, materno, ci, codigo).split())
+            tokens.extend((t, pk) for t in propios)
+            docs[pk] = (propios, normalizar(ci), normalizar(codigo))
+        tokens.sort()
+        with self._lock:
+            self._tokens, self._docs, self.version = tokens, docs, version
+
+    def _prefijo(self, token: str) -> set:
+        inicio = bisect_left(self._tokens, (token,))
+        fin = bisect_left(self._tokens, (token + _MAX_TOKEN,))
+        return {pk for _, pk in self._tokens[inicio:fin]}
+
+    def buscar(self, consulta: str, limite: int) -> List[int]:
+        tokens = consulta.split()
+        if not tokens:
+            return []
+        with self._lock:
+            candidatos = None
+            for token in tokens:
+                ids = self._prefijo(token)
+                candidatos = ids if candidatos is None else candidatos & ids
+                if not candidatos:
+                    return []
+            puntajes = []
+            for pk in candidatos:
+                propios, ci, codigo = self._docs[pk]
+                exacto = consulta in (ci, codigo)
+                completos = sum(1 for t in tokens if t in propios)
+                puntajes.append((-int(exacto), -completos, pk))
+        puntajes.sort()
+        return [pk for _, _, pk in puntajes[:limite]]
+
+
+_indice = IndicePrefijos()
+_trigramas: Optional[bool] = None
+
+
+def _usa_trigramas() -> bool:
+    """Postgres con la extensión pg_trgm instalada (se consulta una vez por proceso)."""
+    global _trigramas
+    if _trigramas is None:
+        _trigramas = False
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+                _trigramas = cursor.fetchone() is not None
+    return _trigramas
+
+
+def _buscar_trigramas(consulta: str, limite: int) -> List[int]:
+    from django.contrib.postgres.search import TrigramWordSimilarity
+
+    # El filtro es el operador %> (trigram_word_similar), que usa el índice GIN;
+    # la similitud anotada solo ordena las filas que ya pasaron el filtro.
+    filas = Deportista.objects.filter(nombre_normalizado__trigram_word_similar=consulta).annotate(
+        similitud=TrigramWordSimilarity(consulta, 'nombre_normalizado'),
+        exacto=Case(
+            When(Q(ci__iexact=consulta) | Q(codigo_unico__iexact=consulta), then=Value(1)),
+            default=Value(0), output_field=IntegerField()
+        ),
+    ).order_by(
+        '-exacto', '-similitud', 'apellido_paterno', 'first_name'
+    ).values_list('id', flat=True)[:limite]
+    return list(filas)
+
+
+def buscar_ids(q: str, limite: int = 20) -> List[int]:
+    """Ids de deportistas ordenados por relevancia para el texto 'q'."""
+    consulta = normalizar(q)
+    if not consulta:
+        return []
+    if _usa_trigramas():
+        return _buscar_trigramas(consulta, limite)
+
+    version = cache.get(_CLAVE_VERSION)
+    if version is None:
+        cache.add(_CLAVE_VERSION, uuid.uuid4().hex, None)
+        version = cache.get(_CLAVE_VERSION)
+    if _indice.version is None or _indice.version != version:
+        _indice.construir(version)
+    return _indice.buscar(consulta, limite)
+
+
+def buscar(q: str, limite: int = 20, queryset=None) -> List[Deportista]:
+    """Deportistas ordenados por relevancia (una consulta para traerlos)."""
+    ids = buscar_ids(q, limite)
+    queryset = queryset if queryset is not None else Deportista.objects.all()
+    por_id = queryset.in_bulk(ids)
+    return [por_id[pk] for pk in ids if pk in por_id]
@@ -0,0 +1,30 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from deportistas.services import GestionDeportistaService
+
+
+class Command(BaseCommand):
+    help = 'Recalcula en bloque el vencimiento de credencial de todos los deportistas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fecha', help='Fecha de referencia AAAA-MM-DD (por defecto hoy).')
+        parser.add_argument('--chunk', type=int, default=1000, help='Filas por bulk_update.')
+        parser.add_argument('--dry-run', action='store_true', help='Solo contar los cambios, sin escribir.')
+
+    def handle(self, *args, **options):
+        try:
+            fecha = date.fromisoformat(options['fecha']) if options['fecha'] else None
+        except ValueError:
+            raise CommandError('--fecha debe tener formato AAAA-MM-DD.')
+        if options['chunk'] < 1:
+            raise CommandError('--chunk debe ser mayor que cero.')
+
+        resumen = GestionDeportistaService.recalcular_vencimientos(
+            fecha=fecha, chunk_size=options['chunk'], dry_run=options['dry_run']
+        )
+        prefijo = '[dry-run] ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefijo}{resumen['revisados']} deportistas revisados, {resumen['actualizados']} credenciales actualizadas."
+        ))
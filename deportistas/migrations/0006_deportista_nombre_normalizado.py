@@ -0,0 +1,61 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:54
+
+import unicodedata
+
+from django.db import DatabaseError, migrations, models, transaction
+
+
+def _normalizar(texto):
+    plano = ''.join(c for c in unicodedata.normalize('NFKD', texto) if not unicodedata.combining(c)).lower()
+    return ' '.join(''.join(c if c.isalnum() else ' ' for c in plano).split())
+
+
+def poblar_nombres(apps, schema_editor):
+    """Llena nombre_normalizado para los deportistas existentes."""
+    Deportista = apps.get_model('deportistas', 'Deportista')
+    pendientes = []
+    for deportista in Deportista.objects.only(
+        'id', 'first_name', 'apellido_paterno', 'apellido_materno', 'ci', 'codigo_unico'
+    ).iterator(chunk_size=2000):
+        partes = [deportista.first_name, deportista.apellido_paterno, deportista.apellido_materno,
+                  deportista.ci, deportista.codigo_unico]
+        deportista.nombre_normalizado = _normalizar(' '.join(filter(None, partes)))
+        pendientes.append(deportista)
+    Deportista.objects.bulk_update(pendientes, ['nombre_normalizado'], batch_size=1000)
+
+
+def crear_indice_trigramas(apps, schema_editor):
+    """Solo en Postgres: pg_trgm + índice GIN. Si no hay permisos, se usa el índice en memoria."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            schema_editor.execute(
+                "CREATE INDEX IF NOT EXISTS deportista_nombre_trgm_idx "
+                "ON deportistas_deportista USING gin (nombre_normalizado gin_trgm_ops)"
+            )
+    except DatabaseError:
+        pass
+
+
+def borrar_indice_trigramas(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS deportista_nombre_trgm_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deportistas', '0005_deportista_tipo_modalidad_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deportista',
+            name='nombre_normalizado',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=400),
+        ),
+        migrations.RunPython(poblar_nombres, migrations.RunPython.noop),
+        migrations.RunPython(crear_indice_trigramas, borrar_indice_trigramas),
+    ]
@@ -6,6 +6,61 @@ from datetime import date
 from clubs.models import Club
 from adtdcbba_backend.validators import validate_file_integrity
 
+class DeportistaQuerySet(models.QuerySet):
+    # Códigos de elegibilidad, en el orden en que se evalúan
+    HABILITADO = 'HABILITADO'
+    SUSPENDIDO = 'SUSPENDIDO'
+    INACTIVO = 'INACTIVO'
+    PENDIENTE = 'PENDIENTE'
+    SIN_CLUB = 'SIN_CLUB'
+    CREDENCIAL_VENCIDA = 'CREDENCIAL_VENCIDA'
+    LICENCIA_B_VENCIDA = 'LICENCIA_B_VENCIDA'
+
+    CODIGOS_ELEGIBILIDAD = (
+        (HABILITADO, 'Habilitado'),
+        (SUSPENDIDO, 'Suspendido'),
+        (INACTIVO, 'Inactivo / Baja'),
+        (PENDIENTE, 'Pendiente de validación'),
+        (SIN_CLUB, 'Sin club'),
+        (CREDENCIAL_VENCIDA, 'Credencial vencida'),
+        (LICENCIA_B_VENCIDA, 'Licencia B vencida'),
+    )
+
+    def con_elegibilidad(self, fecha=None):
+        """
+        Anota 'elegibilidad' con un código calculado en SQL (una sola consulta
+        para miles de deportistas). Mismas reglas que validar_para_competencia,
+        más credencial vencida y Licencia B vigente para mayores de edad en FUEGO/MIXTA.
+        """
+        fecha = fecha or date.today()
+        try:
+            corte_mayoria = fecha.replace(year=fecha.year - 18)
+        except ValueError:
+            corte_mayoria = fecha.replace(year=fecha.year - 18, day=28)
+        licencia_vigente = DocumentoDeportista.objects.filter(
+            deportista=models.OuterRef('pk'), document_type='Licencia B', expiration_date__gte=fecha
+        )
+        return self.annotate(
+            elegibilidad=models.Case(
+                models.When(status='SUSPENDIDO', then=models.Value(self.SUSPENDIDO)),
+                models.When(status='INACTIVO', then=models.Value(self.INACTIVO)),
+                models.When(status='PENDIENTE', then=models.Value(self.PENDIENTE)),
+                models.When(club__isnull=True, es_invitado=False, then=models.Value(self.SIN_CLUB)),
+                models.When(vencimiento_credencial__lt=fecha, then=models.Value(self.CREDENCIAL_VENCIDA)),
+                models.When(
+                    ~models.Exists(licencia_vigente),
+                    fecha_nacimiento__lte=corte_mayoria,
+                    tipo_modalidad__in=['FUEGO', 'MIXTA'],
+                    then=models.Value(self.LICENCIA_B_VENCIDA)
+                ),
+                default=models.Value(self.HABILITADO),
+                output_field=models.CharField(max_length=20),
+            )
+        )
+
+    def habilitados(self, fecha=None):
+        return self.con_elegibilidad(fecha).filter(elegibilidad=self.HABILITADO)
+
 class Deportista(models.Model):
     STATUS_CHOICES = (('PENDIENTE', 'Pendiente'), ('ACTIVO', 'Activo'), ('SUSPENDIDO', 'Suspendido'), ('INACTIVO', 'Inactivo'))
     
@@ -39,6 +94,9 @@ class Deportista(models.Model):
     suspension_indefinida = models.BooleanField(default=False)
     fin_suspension = models.DateField(blank=True, null=True)
     
+    # Nombre, CI y código sin tildes ni mayúsculas para la búsqueda (ver busqueda.py)
+    nombre_normalizado = models.CharField(max_length=400, blank=True, default='', editable=False, db_index=True)
+
     es_historico = models.BooleanField(default=False)
     force_password_change = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -47,6 +105,8 @@ class Deportista(models.Model):
     archivo_responsabilidad = models.FileField("Carta de Responsabilidad", upload_to='responsabilidades/', blank=True, null=True, validators=[validate_file_integrity])
     foto = models.ImageField("Foto de Perfil", upload_to='fotos_deportistas/', blank=True, null=True, validators=[validate_file_integrity])
 
+    objects = DeportistaQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Deportista"
         verbose_name_plural = "Deportistas"
@@ -58,6 +118,16 @@ class Deportista(models.Model):
             full_name += f" {self.apellido_materno}"
         return full_name
 
+    def save(self, *args, **kwargs):
+        from .busqueda import texto_busqueda
+        self.nombre_normalizado = texto_busqueda(
+            self.first_name, self.apellido_paterno, self.apellido_materno, self.ci, self.codigo_unico
+        )
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'nombre_normalizado'}
+        super().save(*args, **kwargs)
+
     def get_edad(self):
         if not self.fecha_nacimiento: return 0
         today = date.today()
@@ -95,7 +165,7 @@ class Deportista(models.Model):
                 # Si no tiene licencia vigente, no actualizamos (o podríamos invalidar)
                 pass 
 
-        self.save()
+        self.save(update_fields=['vencimiento_credencial', 'updated_at'])
 
 class Arma(models.Model):
     TIPO_CHOICES = (('Corta', 'Arma Corta'), ('Larga', 'Arma Larga'), ('Escopeta', 'Escopeta'))
@@ -11,7 +11,19 @@ class DocumentoDeportistaSerializer(serializers.ModelSerializer):
         model = DocumentoDeportista
         fields = '__all__'
 
-class DeportistaSerializer(serializers.ModelSerializer):
+class CamposDinamicosMixin:
+    """
+    Sparse fieldsets: si el contexto trae 'fields' (lista de nombres), el
+    serializer solo construye esos campos y se evita armar los anidados.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        campos = self.context.get('fields')
+        if campos:
+            for nombre in set(self.fields) - set(campos):
+                self.fields.pop(nombre)
+
+class DeportistaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     club_nombre = serializers.CharField(source='club.name', read_only=True)
     armas = ArmaSerializer(many=True, read_only=True)
     documentos = DocumentoDeportistaSerializer(many=True, read_only=True)
@@ -21,6 +33,18 @@ class DeportistaSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ('user', 'status', 'created_at', 'updated_at')
 
+class DeportistaCompactSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    """Solo las columnas de las tablas del frontend (?view=compact)."""
+    club_nombre = serializers.CharField(source='club.name', read_only=True, default=None)
+
+    class Meta:
+        model = Deportista
+        fields = (
+            'id', 'codigo_unico', 'first_name', 'apellido_paterno', 'apellido_materno', 'ci',
+            'club', 'club_nombre', 'status', 'tipo_modalidad', 'vencimiento_credencial', 'es_invitado'
+        )
+        read_only_fields = fields
+
 class PrestamoArmaSerializer(serializers.ModelSerializer):
     arma_detalle = serializers.CharField(source='arma.__str__', read_only=True)
     propietario_nombre = serializers.CharField(source='deportista_propietario.__str__', read_only=True)
@@ -2,7 +2,9 @@
 from datetime import date
 from django.core.exceptions import ValidationError
 from django.db import transaction, models
-from .models import Deportista
+from django.db.models import Max, Q
+from django.utils import timezone
+from .models import Deportista, DeportistaQuerySet
 # Importamos Inscripcion dentro de los métodos o usamos string para evitar dependencias circulares si fuera necesario,
 # pero aquí como es un servicio, lo ideal es importar el modelo directamente.
 from competencias.models import Inscripcion
@@ -103,4 +105,77 @@ class GestionDeportistaService:
         if not deportista.club and not deportista.es_invitado:
             raise ValidationError("El deportista no tiene un Club asignado. Debe afiliarse para competir.")
             
-        return True
\ No newline at end of file
+        return True
+
+    @staticmethod
+    def motivo_no_elegible(deportista):
+        """
+        Mensaje de rechazo para un deportista cargado con
+        Deportista.objects.con_elegibilidad(), o None si está habilitado.
+        """
+        codigo = deportista.elegibilidad
+        if codigo == DeportistaQuerySet.HABILITADO:
+            return None
+        if codigo == DeportistaQuerySet.SUSPENDIDO:
+            msg = f"Deportista suspendido. Motivo: {deportista.motivo_suspension}."
+            if deportista.fin_suspension:
+                msg += f" Hasta: {deportista.fin_suspension}"
+            return msg
+        return {
+            DeportistaQuerySet.INACTIVO: "El deportista está marcado como INACTIVO/BAJA.",
+            DeportistaQuerySet.PENDIENTE: "El deportista aún está PENDIENTE de validación por la Asociación.",
+            DeportistaQuerySet.SIN_CLUB: "El deportista no tiene un Club asignado. Debe afiliarse para competir.",
+            DeportistaQuerySet.CREDENCIAL_VENCIDA: f"La credencial del deportista venció el {deportista.vencimiento_credencial}.",
+            DeportistaQuerySet.LICENCIA_B_VENCIDA: "El deportista no tiene una Licencia B vigente para armas de fuego.",
+        }.get(codigo, "El deportista no está habilitado para competir.")
+
+    @staticmethod
+    def recalcular_vencimientos(fecha=None, chunk_size=1000, dry_run=False):
+        """
+        Versión masiva de Deportista.actualizar_vencimiento_credencial.
+        Lee todos los deportistas con su última Licencia B en una sola consulta
+        agrupada y escribe solo las filas que cambian, con bulk_update por bloques.
+
+        - FUEGO/MIXTA mayores de edad: vencimiento = última Licencia B si está vigente.
+        - AIRE o menores de edad: 3 años desde hoy, solo si aún no tienen vencimiento
+          (recalcular en masa no debe renovar credenciales ya emitidas).
+        """
+        hoy = fecha or date.today()
+        try:
+            corte_mayoria = hoy.replace(year=hoy.year - 18)
+            tres_anios = hoy.replace(year=hoy.year + 3)
+        except ValueError:
+            corte_mayoria = hoy.replace(year=hoy.year - 18, day=28)
+            tres_anios = hoy.replace(year=hoy.year + 3, month=2, day=28)
+
+        filas = Deportista.objects.annotate(
+            ultima_licencia=Max('documentos__expiration_date', filter=Q(documentos__document_type='Licencia B'))
+        ).values_list('id', 'fecha_nacimiento', 'tipo_modalidad', 'vencimiento_credencial', 'ultima_licencia')
+
+        ahora = timezone.now()
+        revisados, actualizados, bloque = 0, 0, []
+
+        def escribir(bloque):
+            if not dry_run:
+                Deportista.objects.bulk_update(bloque, ['vencimiento_credencial', 'updated_at'])
+
+        for pk, nacimiento, modalidad, actual, licencia in filas.iterator(chunk_size=chunk_size):
+            revisados += 1
+            es_menor = nacimiento is not None and nacimiento > corte_mayoria
+            if es_menor or modalidad == 'AIRE':
+                nuevo = actual or tres_anios
+            elif licencia and licencia >= hoy:
+                nuevo = licencia
+            else:
+                nuevo = actual
+
+            if nuevo != actual:
+                bloque.append(Deportista(pk=pk, vencimiento_credencial=nuevo, updated_at=ahora))
+                actualizados += 1
+                if len(bloque) >= chunk_size:
+                    escribir(bloque)
+                    bloque = []
+        if bloque:
+            escribir(bloque)
+
+        return {'revisados': revisados, 'actualizados': actualizados}
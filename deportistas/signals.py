@@ -0,0 +1,14 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .busqueda import invalidar_indice
+from .models import Deportista
+
+
+@receiver(post_save, sender=Deportista)
+@receiver(post_delete, sender=Deportista)
+def invalidar_indice_busqueda(sender, instance, **kwargs):
+    """El índice de prefijos en memoria se reconstruye en la próxima búsqueda."""
+    invalidar_indice()
+    transaction.on_commit(invalidar_indice)
@@ -1,11 +1,16 @@
 from django.test import TestCase
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.contrib.auth.models import User
 from datetime import date
 
+from rest_framework.test import APIClient
+
 from clubs.models import Club
-from .models import Deportista
+from users.models import User as Usuario
+from .models import Deportista, DocumentoDeportista
 from .services import GestionDeportistaService
+from .busqueda import buscar, normalizar
 
 class ReglasNegocioDeportistaTest(TestCase):
     
@@ -75,4 +80,127 @@ class ReglasNegocioDeportistaTest(TestCase):
         
         self.assertEqual(self.deportista.status, 'SUSPENDIDO')
         self.assertEqual(self.deportista.motivo_suspension, "Sanción Disciplinaria")
-        self.assertEqual(self.deportista.fecha_suspension, date.today())
\ No newline at end of file
+        self.assertEqual(self.deportista.fecha_suspension, date.today())
+
+class ElegibilidadQuerySetTest(TestCase):
+
+    def setUp(self):
+        self.club = Club.objects.create(name="Club Beta")
+        base = dict(fecha_nacimiento=date(1990, 1, 1), club=self.club, status='ACTIVO')
+        self.casos = {
+            'HABILITADO': Deportista.objects.create(first_name="A", apellido_paterno="Ok", ci="EL1", **base),
+            'SUSPENDIDO': Deportista.objects.create(first_name="B", apellido_paterno="Sus", ci="EL2", **dict(base, status='SUSPENDIDO')),
+            'SIN_CLUB': Deportista.objects.create(first_name="C", apellido_paterno="Libre", ci="EL3", **dict(base, club=None)),
+            'CREDENCIAL_VENCIDA': Deportista.objects.create(
+                first_name="D", apellido_paterno="Venc", ci="EL4", vencimiento_credencial=date(2020, 1, 1), **base
+            ),
+            'LICENCIA_B_VENCIDA': Deportista.objects.create(
+                first_name="E", apellido_paterno="Fuego", ci="EL5", tipo_modalidad='FUEGO', **base
+            ),
+        }
+        # Un menor en FUEGO no necesita Licencia B
+        self.menor = Deportista.objects.create(
+            first_name="F", apellido_paterno="Menor", ci="EL6", tipo_modalidad='FUEGO',
+            **dict(base, fecha_nacimiento=date.today().replace(year=date.today().year - 12, day=1))
+        )
+
+    def test_codigos_en_una_consulta(self):
+        with self.assertNumQueries(1):
+            codigos = dict(Deportista.objects.con_elegibilidad().values_list('ci', 'elegibilidad'))
+        for codigo, deportista in self.casos.items():
+            self.assertEqual(codigos[deportista.ci], codigo)
+        self.assertEqual(codigos[self.menor.ci], 'HABILITADO')
+
+    def test_motivo_coincide_con_la_validacion_individual(self):
+        suspendido = Deportista.objects.con_elegibilidad().get(pk=self.casos['SUSPENDIDO'].pk)
+        self.assertIn("suspendido", GestionDeportistaService.motivo_no_elegible(suspendido).lower())
+        self.assertEqual(
+            set(Deportista.objects.habilitados().values_list('ci', flat=True)),
+            {self.casos['HABILITADO'].ci, self.menor.ci}
+        )
+
+
+class DeportistaListadoTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(Usuario.objects.create_user(username='admin_lista', password='x'))
+        club = Club.objects.create(name="Club Lista")
+        for i in range(5):
+            Deportista.objects.create(
+                first_name=f"N{i}", apellido_paterno=f"Ap{i}", fecha_nacimiento=date(1990, 1, 1),
+                ci=f"LIS{i}", club=club
+            )
+
+    def test_compacto_paginado_y_sin_n_mas_1(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/deportistas/', {'view': 'compact', 'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+        self.assertEqual(response.data['results'][0]['club_nombre'], "Club Lista")
+        self.assertNotIn('armas', response.data['results'][0])
+
+    def test_sparse_fieldset(self):
+        response = self.client.get('/api/deportistas/', {'fields': 'id,ci', 'page_size': 2})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'ci'})
+
+    def test_sin_parametros_de_paginacion_devuelve_lista(self):
+        response = self.client.get('/api/deportistas/')
+        self.assertIsInstance(response.data, list)
+        self.assertEqual(len(response.data), 5)
+
+
+class BusquedaDeportistaTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        Deportista.objects.create(first_name="José Luis", apellido_paterno="Ñuñez", fecha_nacimiento=date(1990, 1, 1), ci="7001")
+        Deportista.objects.create(first_name="Josefina", apellido_paterno="Pérez", fecha_nacimiento=date(1990, 1, 1), ci="7002")
+        Deportista.objects.create(first_name="Ana", apellido_paterno="Nunez", fecha_nacimiento=date(1990, 1, 1), ci="JOSE")
+
+    def test_normaliza_tildes_y_prefijos(self):
+        self.assertEqual(normalizar("  Péréz-Ñuñez "), "perez nunez")
+        nombres = [d.first_name for d in buscar("jose nun")]
+        self.assertEqual(nombres, ["José Luis", "Ana"])
+        # CI exacto primero, luego token completo, luego prefijo
+        self.assertEqual([d.ci for d in buscar("jose")], ["JOSE", "7001", "7002"])
+
+    def test_indice_se_invalida_al_guardar(self):
+        self.assertEqual(buscar("rodri"), [])
+        Deportista.objects.create(first_name="Rodrigo", apellido_paterno="Vaca", fecha_nacimiento=date(1990, 1, 1), ci="7004")
+        self.assertEqual([d.first_name for d in buscar("rodri")], ["Rodrigo"])
+
+    def test_endpoint_search(self):
+        client = APIClient()
+        client.force_authenticate(Usuario.objects.create_user(username='mesa', password='x'))
+        response = client.get('/api/deportistas/search/', {'q': 'perez'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([d['ci'] for d in response.data], ["7002"])
+
+
+class RecalculoCredencialesTest(TestCase):
+
+    def test_lote_con_una_consulta_y_solo_cambios(self):
+        base = dict(fecha_nacimiento=date(1990, 1, 1), status='ACTIVO')
+        fuego = Deportista.objects.create(first_name="F", apellido_paterno="Uno", ci="CR1", tipo_modalidad='FUEGO', **base)
+        aire = Deportista.objects.create(first_name="A", apellido_paterno="Dos", ci="CR2", **base)
+        aire_vigente = Deportista.objects.create(
+            first_name="V", apellido_paterno="Tres", ci="CR3", vencimiento_credencial=date(2027, 5, 5), **base
+        )
+        # bulk_create: sin disparar el recálculo individual de DocumentoDeportista.save
+        DocumentoDeportista.objects.bulk_create([
+            DocumentoDeportista(deportista=fuego, document_type='Licencia B', file='l1.pdf', expiration_date=date(2026, 1, 1)),
+            DocumentoDeportista(deportista=fuego, document_type='Licencia B', file='l2.pdf', expiration_date=date(2030, 1, 1)),
+        ])
+
+        with self.assertNumQueries(2):
+            resumen = GestionDeportistaService.recalcular_vencimientos(fecha=date(2025, 3, 1))
+        self.assertEqual(resumen, {'revisados': 3, 'actualizados': 2})
+
+        fuego.refresh_from_db(); aire.refresh_from_db(); aire_vigente.refresh_from_db()
+        self.assertEqual(fuego.vencimiento_credencial, date(2030, 1, 1))
+        self.assertEqual(aire.vencimiento_credencial, date(2028, 3, 1))
+        self.assertEqual(aire_vigente.vencimiento_credencial, date(2027, 5, 5))
+
+        self.assertEqual(GestionDeportistaService.recalcular_vencimientos(fecha=date(2025, 3, 1))['actualizados'], 0)
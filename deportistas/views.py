@@ -1,18 +1,89 @@
 from rest_framework import viewsets
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.pagination import CursorPagination
 from .models import Deportista, Arma, DocumentoDeportista, PrestamoArma
+from .busqueda import buscar
 # CORRECCIÓN: Importamos los nombres exactos que definimos en serializers.py
 from .serializers import (
     DeportistaSerializer, 
+    DeportistaCompactSerializer,
     ArmaSerializer, 
     DocumentoDeportistaSerializer, # <--- Nombre corregido
     PrestamoArmaSerializer
 )
 
+class DeportistaCursorPagination(CursorPagination):
+    """Paginación por cursor: estable y sin COUNT(*) sobre toda la tabla."""
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = ('apellido_paterno', 'apellido_materno', 'first_name', 'id')
+
 class DeportistaViewSet(viewsets.ModelViewSet):
     queryset = Deportista.objects.all()
     serializer_class = DeportistaSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = DeportistaCursorPagination
+
+    @property
+    def paginator(self):
+        """
+        Paginación por cursor solo si se pide (?cursor, ?page_size o ?view=compact):
+        sin parámetros el listado sigue siendo una lista, como lo espera el frontend.
+        """
+        params = self.request.query_params if self.request else {}
+        if not ('cursor' in params or 'page_size' in params or self._es_compacto()):
+            return None
+        return super().paginator
+
+    def _campos_pedidos(self):
+        """?fields=id,ci,club_nombre -> lista de campos (None = todos)."""
+        fields = self.request.query_params.get('fields') if self.request else None
+        return [f.strip() for f in fields.split(',') if f.strip()] if fields else None
+
+    def _es_compacto(self):
+        return self.action == 'list' and self.request.query_params.get('view') == 'compact'
+
+    def get_serializer_class(self):
+        if self._es_compacto():
+            return DeportistaCompactSerializer
+        return DeportistaSerializer
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.request and self.request.method == 'GET':
+            context['fields'] = self._campos_pedidos()
+        return context
+
+    def get_queryset(self):
+        queryset = Deportista.objects.all()
+        if self.request is None or self.request.method != 'GET':
+            return queryset
+        # Solo se cargan las relaciones que el serializer realmente va a leer
+        campos = self._campos_pedidos()
+        pide = lambda nombre: campos is None or nombre in campos
+        if pide('club_nombre'):
+            queryset = queryset.select_related('club')
+        if not self._es_compacto():
+            prefetch = [nombre for nombre in ('armas', 'documentos') if pide(nombre)]
+            if prefetch:
+                queryset = queryset.prefetch_related(*prefetch)
+        return queryset
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Búsqueda rápida por nombre parcial, CI o código (mesa de inscripción, autocompletado).
+        ?q=texto&limit=20 -> lista ordenada por relevancia.
+        """
+        try:
+            limite = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+        except ValueError:
+            limite = 20
+        deportistas = buscar(request.query_params.get('q', ''), limite, Deportista.objects.select_related('club'))
+        return Response(DeportistaCompactSerializer(deportistas, many=True, context={'fields': self._campos_pedidos()}).data)
 
 class ArmaViewSet(viewsets.ModelViewSet):
     queryset = Arma.objects.all()
@@ -1,6 +1,35 @@
+import logging
+import uuid
+
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed, TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
 from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# --- CACHÉ DE USUARIOS AUTENTICADOS ---
+# Cada usuario tiene un sello de versión; la entrada cacheada guarda (versión, usuario)
+# y solo es válida si coincide con el sello vigente. Invalidar = cambiar el sello,
+# así una lectura concurrente de la BD nunca deja un usuario viejo como válido.
+
+def _clave_version(user_id):
+    return f"auth_user_version:{user_id}"
+
+
+def _clave_usuario(user_id):
+    return f"auth_user:{user_id}"
+
+
+def invalidar_usuario_cache(user_id):
+    """Invalida el usuario cacheado (lo llaman las señales de users)."""
+    try:
+        cache.set(_clave_version(user_id), uuid.uuid4().hex, None)
+    except Exception:
+        logger.warning("No se pudo invalidar el usuario %s en caché", user_id, exc_info=True)
+
 
 class CustomJWTAuthentication(JWTAuthentication):
     def authenticate(self, request):
@@ -27,4 +56,50 @@ class CustomJWTAuthentication(JWTAuthentication):
             # CRÍTICO: Si el token está malformado o expirado, no lanzamos error.
             # Retornamos None para que Django trate al usuario como "no logueado"
             # y permita el acceso a vistas públicas (como Login o Refresh)
-            return None
\ No newline at end of file
+            return None
+
+    def get_user(self, validated_token):
+        """
+        Resuelve el usuario desde la caché (una sola lectura get_many) y solo
+        consulta users_user si la entrada falta o su versión quedó vieja.
+        """
+        ttl = getattr(settings, 'AUTH_USER_CACHE_TTL', 120)
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None or ttl <= 0:
+            return super().get_user(validated_token)
+
+        clave_version, clave_usuario = _clave_version(user_id), _clave_usuario(user_id)
+        try:
+            valores = cache.get_many([clave_version, clave_usuario])
+        except Exception:
+            # Caché caída: se autentica contra la BD como antes
+            logger.warning("Caché de usuarios no disponible", exc_info=True)
+            return super().get_user(validated_token)
+        version = valores.get(clave_version)
+        entrada = valores.get(clave_usuario)
+
+        if version is not None and entrada is not None and entrada[0] == version:
+            user = entrada[1]
+            self._verificar_usuario(user, validated_token)
+            return user
+
+        if version is None:
+            # El sello se fija antes de leer la BD: si alguien invalida en medio,
+            # lo que guardemos abajo ya no coincidirá
+            cache.add(clave_version, uuid.uuid4().hex, None)
+            version = cache.get(clave_version)
+
+        user = super().get_user(validated_token)
+        if version is not None:
+            cache.set(clave_usuario, (version, user), ttl)
+        return user
+
+    @staticmethod
+    def _verificar_usuario(user, validated_token):
+        # Mismas reglas que JWTAuthentication.get_user para el camino cacheado
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed("The user's password has been changed.", code="password_changed")
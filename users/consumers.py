@@ -0,0 +1,33 @@
+import json
+from channels.generic.websocket import AsyncWebsocketConsumer
+
+from .services import GRUPO_NOTIFICACIONES_GLOBALES, grupo_usuario
+
+class NotificacionConsumer(AsyncWebsocketConsumer):
+    """
+    Canal ws/notificaciones/: cada usuario autenticado queda en su grupo
+    'user_<id>' (alertas personales) y en el grupo de alertas globales.
+    Reemplaza el polling a /api/auth/notifications/.
+    """
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            # 4401: código propio para "no autenticado" (el frontend reintenta tras login)
+            await self.close(code=4401)
+            return
+
+        self.grupos = [grupo_usuario(user.id), GRUPO_NOTIFICACIONES_GLOBALES]
+        for grupo in self.grupos:
+            await self.channel_layer.group_add(grupo, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        for grupo in getattr(self, 'grupos', []):
+            await self.channel_layer.group_discard(grupo, self.channel_name)
+
+    # Alerta nueva publicada por NotificationService.publicar
+    async def notificacion_nueva(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'notification',
+            'payload': event['data']
+        }))
@@ -0,0 +1,21 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.services import NotificationService
+
+
+class Command(BaseCommand):
+    help = 'Genera la tabla diaria de notificaciones (licencias, armas y competencias).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fecha', help='Fecha de referencia AAAA-MM-DD (por defecto hoy).')
+
+    def handle(self, *args, **options):
+        try:
+            fecha = date.fromisoformat(options['fecha']) if options['fecha'] else None
+        except ValueError:
+            raise CommandError('--fecha debe tener formato AAAA-MM-DD.')
+
+        total = NotificationService.materializar(fecha)
+        self.stdout.write(self.style.SUCCESS(f"{total} notificaciones materializadas."))
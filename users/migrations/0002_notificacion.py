@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notificacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(help_text="Identificador estable de la alerta, p. ej. 'lic-exp-12'.", max_length=60)),
+                ('tipo', models.CharField(choices=[('info', 'Información'), ('success', 'Éxito'), ('warning', 'Advertencia'), ('danger', 'Peligro')], default='info', max_length=10)),
+                ('titulo', models.CharField(max_length=100)),
+                ('mensaje', models.TextField()),
+                ('link', models.CharField(blank=True, max_length=200)),
+                ('fecha', models.DateField(help_text='Día de la última materialización que generó la alerta.')),
+                ('creada_en', models.DateTimeField(auto_now_add=True)),
+                ('leida', models.BooleanField(default=False)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='notificaciones', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Notificación',
+                'verbose_name_plural': 'Notificaciones',
+                'indexes': [models.Index(fields=['user', '-fecha', '-id'], name='notificacion_user_fecha_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'clave'), name='notificacion_user_clave_uniq')],
+            },
+        ),
+    ]
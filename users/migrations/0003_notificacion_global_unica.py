@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:25
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def borrar_globales_duplicadas(apps, schema_editor):
+    """Materializaciones concurrentes pudieron duplicar alertas globales: queda la más antigua."""
+    Notificacion = apps.get_model('users', 'Notificacion')
+    globales = Notificacion.objects.filter(user__isnull=True)
+    conservar = globales.values('clave').annotate(primera=Min('id')).values_list('primera', flat=True)
+    globales.exclude(id__in=list(conservar)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_notificacion'),
+    ]
+
+    operations = [
+        migrations.RunPython(borrar_globales_duplicadas, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='notificacion',
+            constraint=models.UniqueConstraint(condition=models.Q(('user__isnull', True)), fields=('clave',), name='notificacion_global_clave_uniq'),
+        ),
+    ]
@@ -31,4 +31,44 @@ class User(AbstractUser):
 
     def __str__(self):
         role_label = self.get_role_display()
-        return f"{self.username} | {role_label}"
\ No newline at end of file
+        return f"{self.username} | {role_label}"
+
+class Notificacion(models.Model):
+    """
+    Alerta materializada por NotificationService.materializar (una vez al día).
+    Las de user NULL son globales (competencias) y las ven todos los usuarios.
+    """
+    TIPOS = [
+        ('info', 'Información'),
+        ('success', 'Éxito'),
+        ('warning', 'Advertencia'),
+        ('danger', 'Peligro'),
+    ]
+
+    user = models.ForeignKey(
+        'users.User', on_delete=models.CASCADE, null=True, blank=True, related_name='notificaciones'
+    )
+    clave = models.CharField(max_length=60, help_text="Identificador estable de la alerta, p. ej. 'lic-exp-12'.")
+    tipo = models.CharField(max_length=10, choices=TIPOS, default='info')
+    titulo = models.CharField(max_length=100)
+    mensaje = models.TextField()
+    link = models.CharField(max_length=200, blank=True)
+    fecha = models.DateField(help_text="Día de la última materialización que generó la alerta.")
+    creada_en = models.DateTimeField(auto_now_add=True)
+    leida = models.BooleanField(default=False)
+
+    class Meta:
+        verbose_name = "Notificación"
+        verbose_name_plural = "Notificaciones"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'clave'], name='notificacion_user_clave_uniq'),
+            # Con user NULL la restricción anterior no aplica: una sola fila por alerta global
+            models.UniqueConstraint(fields=['clave'], condition=models.Q(user__isnull=True),
+                                    name='notificacion_global_clave_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-fecha', '-id'], name='notificacion_user_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.clave} -> {self.user_id or 'todos'}"
@@ -0,0 +1,7 @@
+from django.urls import re_path
+from . import consumers
+
+websocket_urlpatterns = [
+    # Ruta: ws://host/ws/notificaciones/
+    re_path(r'ws/notificaciones/$', consumers.NotificacionConsumer.as_asgi()),
+]
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from .models import User
+from .models import Notificacion, User
 
 User = get_user_model()
 
@@ -11,4 +11,15 @@ class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ('id', 'username', 'email', 'first_name', 'last_name', 'role', 'role_display', 'club', 'club_nombre', 'ci', 'phone')
-        read_only_fields = ('role', 'club') # Por seguridad, el rol no se edita por API directa
\ No newline at end of file
+        read_only_fields = ('role', 'club') # Por seguridad, el rol no se edita por API directa
+
+class NotificacionSerializer(serializers.ModelSerializer):
+    """Mismo formato que consumía el frontend: id, type, title, message, link."""
+    id = serializers.CharField(source='clave')
+    type = serializers.CharField(source='tipo')
+    title = serializers.CharField(source='titulo')
+    message = serializers.CharField(source='mensaje')
+
+    class Meta:
+        model = Notificacion
+        fields = ('id', 'type', 'title', 'message', 'link', 'leida', 'fecha')
@@ -1,111 +1,294 @@
 # users/services.py
+import logging
 from datetime import date, timedelta
-from django.db.models import Q
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max, Q
+
 from competencias.models import Competencia
-from deportistas.models import Deportista, Arma
+from clubs.models import Club
+from deportistas.models import Deportista, DocumentoDeportista, Arma
+from .models import Notificacion, User
+from .serializers import NotificacionSerializer
+
+logger = logging.getLogger(__name__)
+
+# Grupos del canal ws/notificaciones/ (ver consumers.py)
+GRUPO_NOTIFICACIONES_GLOBALES = "notificaciones_globales"
+
+def grupo_usuario(user_id: int) -> str:
+    return f"user_{user_id}"
 
 class NotificationService:
     """
     Servicio encargado de centralizar todas las alertas y notificaciones
     del sistema para los usuarios.
+
+    Las alertas se generan una vez al día (materializar) con consultas agrupadas
+    y se guardan en Notificacion; las vistas solo leen esa tabla.
     """
-    
+
+    DIAS_AVISO = 90 # Alerta con 3 meses de anticipación
+    DIAS_EVENTOS = 30 # Las alertas por evento (confirmaciones) se conservan un mes
+    _CLAVE_DIA = "notificaciones_materializadas"
+    _CLAVE_BLOQUEO = "notificaciones_materializando"
+    # Prefijos que regenera materializar; el resto son alertas por evento
+    _PREFIJOS_DIARIOS = ('lic-', 'arma-')
+
     @staticmethod
-    def get_user_notifications(user):
-        notifications = []
-        today = date.today()
-        warning_date = today + timedelta(days=90) # Alerta con 3 meses de anticipación
+    def _destinatarios(club_ids: Optional[Iterable[int]] = None,
+                       deportista_ids: Optional[Iterable[int]] = None) -> Tuple[Dict[int, Set[int]], Dict[int, Set[int]]]:
+        """
+        Usuarios interesados en cada club y en cada deportista:
+        representantes de club (User.club o Club.user) y el propio deportista.
+        Sin filtros devuelve los de todo el sistema.
+        """
+        usuarios = User.objects.filter(club__isnull=False, is_active=True)
+        clubes = Club.objects.filter(user__isnull=False)
+        deportistas = Deportista.objects.filter(user__isnull=False).order_by()
+        if club_ids is not None:
+            usuarios = usuarios.filter(club_id__in=club_ids)
+            clubes = clubes.filter(id__in=club_ids)
+        if deportista_ids is not None:
+            deportistas = deportistas.filter(id__in=deportista_ids)
+
+        por_club: Dict[int, Set[int]] = {}
+        for user_id, club_id in usuarios.values_list('id', 'club_id'):
+            por_club.setdefault(club_id, set()).add(user_id)
+        for club_id, user_id in clubes.values_list('id', 'user_id'):
+            por_club.setdefault(club_id, set()).add(user_id)
+
+        por_deportista: Dict[int, Set[int]] = {}
+        for dep_id, user_id in deportistas.values_list('id', 'user_id'):
+            por_deportista.setdefault(dep_id, set()).add(user_id)
+        return por_club, por_deportista
+
+    @staticmethod
+    def generar_alertas(hoy: date) -> Dict[Tuple[int, str], Dict]:
+        """
+        Alertas personales de licencias e inspecciones para todos los usuarios:
+        una consulta agrupada para licencias y una para armas.
+        """
+        limite = hoy + timedelta(days=NotificationService.DIAS_AVISO)
+        por_club, por_deportista = NotificationService._destinatarios()
+        alertas: Dict[Tuple[int, str], Dict] = {}
+        if not por_club and not por_deportista:
+            return alertas
 
-        # --- 1. NOTIFICACIONES GLOBALES (Competencias) ---
-        
+        def usuarios(dep_id, club_id):
+            return por_deportista.get(dep_id, set()) | por_club.get(club_id, set())
+
+        def agregar(dep_id, club_id, clave, **datos):
+            for user_id in usuarios(dep_id, club_id):
+                alertas[(user_id, clave)] = datos
+
+        alcance = Q(deportista__club_id__in=por_club.keys()) | Q(deportista_id__in=por_deportista.keys())
+
+        # A. Vencimiento de Licencias (Tipo B): la más reciente por deportista
+        licencias = DocumentoDeportista.objects.filter(alcance, document_type='Licencia B').values(
+            'deportista_id', 'deportista__club_id', 'deportista__first_name', 'deportista__apellido_paterno'
+        ).annotate(ultima=Max('expiration_date')).filter(ultima__lte=limite)
+
+        for lic in licencias:
+            dep_id, club_id = lic['deportista_id'], lic['deportista__club_id']
+            days_left = (lic['ultima'] - hoy).days
+            if days_left < 0:
+                agregar(dep_id, club_id, f'lic-exp-{dep_id}',
+                        tipo='danger', titulo='Licencia Vencida', link='/mi-perfil',
+                        mensaje=f"ATENCIÓN: La licencia de {lic['deportista__first_name']} {lic['deportista__apellido_paterno']} ha caducado. Debe renovarla para competir en Fuego.")
+            else:
+                agregar(dep_id, club_id, f'lic-warn-{dep_id}',
+                        tipo='warning', titulo='Renovación Próxima', link='/mi-perfil',
+                        mensaje=f"La licencia de {lic['deportista__first_name']} vence en {days_left} días ({lic['ultima'].strftime('%d/%m')}).")
+
+        # B. Inspección de Armas (Solo Armas de Fuego)
+        armas = Arma.objects.filter(alcance, es_aire_comprimido=False, fecha_inspeccion__lte=limite).values(
+            'id', 'marca', 'modelo', 'fecha_inspeccion', 'deportista_id', 'deportista__club_id'
+        )
+        for arma in armas:
+            dep_id, club_id = arma['deportista_id'], arma['deportista__club_id']
+            if arma['fecha_inspeccion'] < hoy:
+                agregar(dep_id, club_id, f"arma-exp-{arma['id']}",
+                        tipo='danger', titulo='Inspección Caducada', link='/mi-perfil',
+                        mensaje=f"El arma {arma['marca']} ({arma['modelo']}) requiere inspección inmediata.")
+            else:
+                agregar(dep_id, club_id, f"arma-warn-{arma['id']}",
+                        tipo='warning', titulo='Inspección Próxima', link='/mi-perfil',
+                        mensaje=f"Inspección para {arma['marca']} vence el {arma['fecha_inspeccion'].strftime('%d/%m')}.")
+        return alertas
+
+    @staticmethod
+    def generar_globales(hoy: date) -> Dict[str, Dict]:
+        """Alertas de competencias, comunes a todos los usuarios."""
+        globales = {}
         # A. Competencias Próximas
-        proximas = Competencia.objects.filter(
-            status='Próxima', 
-            start_date__gte=today
-        ).order_by('start_date')
-        
-        for comp in proximas:
-            notifications.append({
-                'id': f'new-{comp.id}',
-                'type': 'info',
-                'title': 'Nueva Competencia',
-                'message': f"{comp.name} programada para el {comp.start_date.strftime('%d/%m/%Y')}.",
-                'link': '/admin/competencias'
-            })
-        
+        for comp in Competencia.objects.filter(status='Abierta', start_date__gte=hoy).order_by('start_date'):
+            globales[f'new-{comp.id}'] = dict(
+                tipo='info', titulo='Nueva Competencia', link='/admin/competencias',
+                mensaje=f"{comp.name} programada para el {comp.start_date.strftime('%d/%m/%Y')}."
+            )
         # B. Resultados Recientes (Publicados hace menos de 3 días)
-        recent_final = Competencia.objects.filter(
-            status='Finalizada', 
-            end_date__gte=today - timedelta(days=3)
+        for comp in Competencia.objects.filter(status='Finalizada', end_date__gte=hoy - timedelta(days=3)):
+            globales[f'res-{comp.id}'] = dict(
+                tipo='success', titulo='Resultados Disponibles', link=f'/admin/resultados/{comp.id}',
+                mensaje=f"Ya puedes consultar los resultados de {comp.name}."
+            )
+        return globales
+
+    @staticmethod
+    def _q_diarias() -> Q:
+        """Alertas que regenera materializar (no los eventos de registrar)."""
+        diarias = Q()
+        for prefijo in NotificationService._PREFIJOS_DIARIOS:
+            diarias |= Q(clave__startswith=prefijo)
+        return diarias
+
+    @staticmethod
+    def materializar(hoy: date = None) -> int:
+        """
+        Regenera la tabla de notificaciones del día. Las alertas que siguen vigentes
+        conservan su estado 'leida'; las que dejaron de aplicar se eliminan.
+        """
+        hoy = hoy or date.today()
+        alertas = NotificationService.generar_alertas(hoy)
+        globales = NotificationService.generar_globales(hoy)
+
+        diarias = NotificationService._q_diarias()
+
+        with transaction.atomic():
+            # Las que no existían se empujan por WebSocket (p. ej. una licencia que entra en aviso)
+            previas = set(Notificacion.objects.filter(diarias, user__isnull=False).values_list('user_id', 'clave'))
+            if alertas:
+                Notificacion.objects.bulk_create(
+                    [Notificacion(user_id=user_id, clave=clave, fecha=hoy, **datos)
+                     for (user_id, clave), datos in alertas.items()],
+                    batch_size=1000,
+                    update_conflicts=True,
+                    unique_fields=['user', 'clave'],
+                    update_fields=['tipo', 'titulo', 'mensaje', 'link', 'fecha'],
+                )
+            Notificacion.objects.filter(diarias, user__isnull=False, fecha__lt=hoy).delete()
+            Notificacion.objects.filter(
+                user__isnull=False, fecha__lt=hoy - timedelta(days=NotificationService.DIAS_EVENTOS)
+            ).delete()
+            NotificationService.publicar(
+                Notificacion(user_id=user_id, clave=clave, fecha=hoy, **datos)
+                for (user_id, clave), datos in alertas.items() if (user_id, clave) not in previas
+            )
+
+            # Globales (user NULL): pocas filas, se reemplazan conservando las que siguen
+            existentes = set(Notificacion.objects.filter(user__isnull=True).values_list('clave', flat=True))
+            Notificacion.objects.filter(user__isnull=True).exclude(clave__in=globales.keys()).delete()
+            Notificacion.objects.filter(user__isnull=True, clave__in=existentes).update(fecha=hoy)
+            # Si otra materialización ya la insertó, la restricción global la descarta
+            nuevas = Notificacion.objects.bulk_create([
+                Notificacion(user=None, clave=clave, fecha=hoy, **datos)
+                for clave, datos in globales.items() if clave not in existentes
+            ], ignore_conflicts=True)
+            NotificationService.publicar(nuevas)
+
+        cache.set(NotificationService._CLAVE_DIA, hoy.isoformat(), 60 * 60 * 26)
+        return len(alertas) + len(globales)
+
+    @staticmethod
+    def asegurar_materializado() -> None:
+        """Materializa si hoy todavía no se hizo (por si el cron no corrió)."""
+        hoy = date.today()
+        if cache.get(NotificationService._CLAVE_DIA) == hoy.isoformat():
+            return
+        # Solo cuentan las alertas diarias: un evento registrado hoy no prueba que se materializó
+        if Notificacion.objects.filter(NotificationService._q_diarias(), fecha=hoy).exists():
+            cache.set(NotificationService._CLAVE_DIA, hoy.isoformat(), 60 * 60 * 26)
+            return
+        # Un solo request materializa; los concurrentes leen lo que ya hay
+        if not cache.add(NotificationService._CLAVE_BLOQUEO, hoy.isoformat(), 60 * 5):
+            return
+        try:
+            NotificationService.materializar(hoy)
+        finally:
+            cache.delete(NotificationService._CLAVE_BLOQUEO)
+
+    @staticmethod
+    def notificaciones_de(user):
+        """Queryset de notificaciones visibles para el usuario (propias + globales)."""
+        return Notificacion.objects.filter(Q(user=user) | Q(user__isnull=True))
+
+    @staticmethod
+    def get_user_notifications(user):
+        NotificationService.asegurar_materializado()
+        return [
+            {'id': n.clave, 'type': n.tipo, 'title': n.titulo, 'message': n.mensaje, 'link': n.link}
+            for n in NotificationService.notificaciones_de(user).order_by('-fecha', '-id')
+        ]
+
+    # --- TIEMPO REAL (ws/notificaciones/) ---
+
+    @staticmethod
+    def publicar(notificaciones: Iterable[Notificacion]) -> None:
+        """
+        Empuja las alertas a los grupos 'user_<id>' (o al global si user es NULL)
+        al confirmarse la transacción, para no anunciar algo que luego se revierte.
+        """
+        mensajes = [
+            (grupo_usuario(n.user_id) if n.user_id else GRUPO_NOTIFICACIONES_GLOBALES, NotificacionSerializer(n).data)
+            for n in notificaciones
+        ]
+        if mensajes:
+            transaction.on_commit(lambda: NotificationService._enviar(mensajes))
+
+    @staticmethod
+    def _enviar(mensajes) -> None:
+        layer = get_channel_layer()
+        if layer is None:
+            return
+        enviar = async_to_sync(layer.group_send)
+        for grupo, data in mensajes:
+            try:
+                enviar(grupo, {"type": "notificacion.nueva", "data": data})
+            except Exception:
+                # El canal es un extra: la alerta ya quedó guardada para el polling
+                logger.warning("No se pudo publicar la notificación en %s", grupo, exc_info=True)
+
+    @staticmethod
+    def registrar(user_ids: Iterable[int], clave: str, **datos) -> None:
+        """Guarda (o actualiza) una alerta por evento para varios usuarios y la publica."""
+        hoy = date.today()
+        notificaciones = [Notificacion(user_id=user_id, clave=clave, fecha=hoy, **datos) for user_id in set(user_ids)]
+        if not notificaciones:
+            return
+        Notificacion.objects.bulk_create(
+            notificaciones,
+            update_conflicts=True,
+            unique_fields=['user', 'clave'],
+            update_fields=['tipo', 'titulo', 'mensaje', 'link', 'fecha', 'leida'],
+        )
+        NotificationService.publicar(notificaciones)
+
+    @staticmethod
+    def notificar_inscripcion_confirmada(inscripcion) -> None:
+        dep = inscripcion.deportista
+        por_club, por_deportista = NotificationService._destinatarios(
+            club_ids=[dep.club_id] if dep.club_id else [], deportista_ids=[dep.id]
+        )
+        NotificationService.registrar(
+            por_deportista.get(dep.id, set()) | por_club.get(dep.club_id, set()),
+            f'ins-ok-{inscripcion.id}',
+            tipo='success', titulo='Inscripción Confirmada', link='/mi-perfil',
+            mensaje=f"La inscripción de {dep.first_name} {dep.apellido_paterno} en {inscripcion.competencia.name} fue confirmada.",
+        )
+
+    @staticmethod
+    def notificar_resultados_publicados(competencia) -> None:
+        """Alerta global 'res-<id>' (la misma que mantiene materializar por 3 días)."""
+        datos = NotificationService.generar_globales(date.today()).get(f'res-{competencia.id}') or dict(
+            tipo='success', titulo='Resultados Disponibles', link=f'/admin/resultados/{competencia.id}',
+            mensaje=f"Ya puedes consultar los resultados de {competencia.name}."
+        )
+        notificacion, _ = Notificacion.objects.update_or_create(
+            user=None, clave=f'res-{competencia.id}', defaults=dict(fecha=date.today(), **datos)
         )
-        
-        for comp in recent_final:
-            notifications.append({
-                'id': f'res-{comp.id}',
-                'type': 'success',
-                'title': 'Resultados Disponibles',
-                'message': f"Ya puedes consultar los resultados de {comp.name}.",
-                'link': f'/admin/resultados/{comp.id}'
-            })
-
-        # --- 2. NOTIFICACIONES PERSONALES (Deportistas y Clubes) ---
-        
-        # Detectamos qué deportistas están asociados a este usuario
-        deps = []
-        if hasattr(user, 'club'):
-            # Si es un Club, revisamos a TODOS sus deportistas
-            deps = Deportista.objects.filter(club=user.club)
-        elif hasattr(user, 'deportista'):
-            # Si es un Deportista, se revisa a sí mismo
-            deps = [user.deportista]
-
-        for dep in deps:
-            # A. Vencimiento de Licencias (Tipo B)
-            # Buscamos la licencia más reciente
-            licencia = dep.documentos.filter(document_type='Licencia B').order_by('-expiration_date').first()
-            
-            if licencia and licencia.expiration_date:
-                days_left = (licencia.expiration_date - today).days
-                
-                if days_left < 0:
-                    notifications.append({
-                        'id': f'lic-exp-{dep.id}',
-                        'type': 'danger',
-                        'title': 'Licencia Vencida',
-                        'message': f"ATENCIÓN: La licencia de {dep.first_name} {dep.apellido_paterno} ha caducado. Debe renovarla para competir en Fuego.",
-                        'link': '/mi-perfil'
-                    })
-                elif days_left <= 90:
-                    notifications.append({
-                        'id': f'lic-warn-{dep.id}',
-                        'type': 'warning',
-                        'title': 'Renovación Próxima',
-                        'message': f"La licencia de {dep.first_name} vence en {days_left} días ({licencia.expiration_date.strftime('%d/%m')}).",
-                        'link': '/mi-perfil'
-                    })
-
-            # B. Inspección de Armas (Solo Armas de Fuego)
-            armas = Arma.objects.filter(deportista=dep, es_aire_comprimido=False)
-            
-            for arma in armas:
-                if arma.fecha_inspeccion:
-                    days_left = (arma.fecha_inspeccion - today).days
-                    
-                    if days_left < 0:
-                        notifications.append({
-                            'id': f'arma-exp-{arma.id}',
-                            'type': 'danger',
-                            'title': 'Inspección Caducada',
-                            'message': f"El arma {arma.marca} ({arma.modelo}) requiere inspección inmediata.",
-                            'link': '/mi-perfil'
-                        })
-                    elif days_left <= 90:
-                        notifications.append({
-                            'id': f'arma-warn-{arma.id}',
-                            'type': 'warning',
-                            'title': 'Inspección Próxima',
-                            'message': f"Inspección para {arma.marca} vence el {arma.fecha_inspeccion.strftime('%d/%m')}.",
-                            'link': '/mi-perfil'
-                        })
-
-        return notifications
\ No newline at end of file
+        NotificationService.publicar([notificacion])
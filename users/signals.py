@@ -0,0 +1,68 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from competencias.models import Competencia, Inscripcion
+from .authentication import invalidar_usuario_cache
+from .models import User
+
+
+def _invalidar(user_id):
+    # Se invalida ya y otra vez al confirmar la transacción, para que una lectura
+    # concurrente no vuelva a cachear el estado anterior al commit
+    invalidar_usuario_cache(user_id)
+    transaction.on_commit(lambda: invalidar_usuario_cache(user_id))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidar_cache_usuario(sender, instance, **kwargs):
+    _invalidar(instance.pk)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def invalidar_cache_por_permisos(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear', 'pre_clear'):
+        return
+    if not reverse:
+        _invalidar(instance.pk)
+    elif action == 'pre_clear':
+        # group.user_set.clear(): pk_set no viene informado
+        for user_id in instance.user_set.values_list('pk', flat=True):
+            _invalidar(user_id)
+    else:
+        for user_id in pk_set or ():
+            _invalidar(user_id)
+
+
+# --- NOTIFICACIONES EN TIEMPO REAL ---
+# pre_save solo consulta el estado anterior cuando el nuevo es el que se anuncia.
+
+@receiver(pre_save, sender=Inscripcion)
+def detectar_confirmacion(sender, instance, **kwargs):
+    instance._confirmada_ahora = instance.estado == 'CONFIRMADA' and (
+        instance.pk is None
+        or Inscripcion.objects.filter(pk=instance.pk).exclude(estado='CONFIRMADA').exists()
+    )
+
+
+@receiver(post_save, sender=Inscripcion)
+def notificar_confirmacion(sender, instance, **kwargs):
+    if getattr(instance, '_confirmada_ahora', False):
+        from .services import NotificationService
+        NotificationService.notificar_inscripcion_confirmada(instance)
+
+
+@receiver(pre_save, sender=Competencia)
+def detectar_publicacion_resultados(sender, instance, **kwargs):
+    instance._finalizada_ahora = instance.status == 'Finalizada' and instance.pk is not None and (
+        Competencia.objects.filter(pk=instance.pk).exclude(status='Finalizada').exists()
+    )
+
+
+@receiver(post_save, sender=Competencia)
+def notificar_resultados(sender, instance, **kwargs):
+    if getattr(instance, '_finalizada_ahora', False):
+        from .services import NotificationService
+        NotificationService.notificar_resultados_publicados(instance)
@@ -1,3 +1,175 @@
+from datetime import date, timedelta
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
 from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from clubs.models import Club
+from adtdcbba_backend.middleware import TokenAuthMiddleware
+from competencias.models import Competencia, Inscripcion
+from deportistas.models import Arma, Deportista, DocumentoDeportista
+from .authentication import CustomJWTAuthentication
+from .consumers import NotificacionConsumer
+from .models import Notificacion, User
+from .services import NotificationService
+
+
+class CacheUsuarioJWTTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='juez1', password='x', role=User.Roles.JUEZ)
+        self.auth = CustomJWTAuthentication()
+        self.token = self.auth.get_validated_token(str(AccessToken.for_user(self.user)))
+
+    def test_segunda_resolucion_no_consulta_la_bd(self):
+        with self.assertNumQueries(1):
+            self.auth.get_user(self.token)
+        with self.assertNumQueries(0):
+            user = self.auth.get_user(self.token)
+        self.assertEqual(user.pk, self.user.pk)
+
+    def test_save_y_cambio_de_grupos_invalidan(self):
+        self.auth.get_user(self.token)
+
+        self.user.role = User.Roles.DEPORTISTA
+        self.user.save()
+        with self.assertNumQueries(1):
+            user = self.auth.get_user(self.token)
+        self.assertEqual(user.role, User.Roles.DEPORTISTA)
+
+        grupo = Group.objects.create(name='Jueces')
+        self.user.groups.add(grupo)
+        with self.assertNumQueries(1):
+            self.auth.get_user(self.token)
+
+
+class NotificacionesMaterializadasTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.hoy = date.today()
+        self.club = Club.objects.create(name='Club Norte')
+        self.encargado = User.objects.create_user(username='club1', password='x', role=User.Roles.CLUB, club=self.club)
+        self.otro = User.objects.create_user(username='club2', password='x', role=User.Roles.CLUB)
+        for i in range(5):
+            dep = Deportista.objects.create(
+                first_name=f'Dep{i}', apellido_paterno='Prueba', fecha_nacimiento=date(1990, 1, 1),
+                ci=f'N{i}', club=self.club
+            )
+            DocumentoDeportista.objects.create(
+                deportista=dep, document_type='Licencia B', file='docs_deportistas/x.pdf',
+                expiration_date=self.hoy - timedelta(days=1) if i % 2 else self.hoy + timedelta(days=400)
+            )
+        Arma.objects.create(
+            deportista=dep, tipo='Corta', marca='Glock', modelo='17', calibre='9mm', serie='S1',
+            fecha_inspeccion=self.hoy + timedelta(days=10)
+        )
+        Competencia.objects.create(name='Apertura', start_date=self.hoy + timedelta(days=5), status='Abierta')
+
+    def test_materializar_usa_consultas_agrupadas(self):
+        # Destinatarios (3) + licencias + armas + competencias (2) + escritura (9 con savepoint): no crece con los deportistas
+        with self.assertNumQueries(16):
+            NotificationService.materializar(self.hoy)
+
+        claves = set(Notificacion.objects.filter(user=self.encargado).values_list('clave', flat=True))
+        self.assertEqual(claves, {'lic-exp-%d' % d.id for d in Deportista.objects.filter(first_name__in=['Dep1', 'Dep3'])}
+                         | {'arma-warn-%d' % Arma.objects.get().id})
+        self.assertFalse(Notificacion.objects.filter(user=self.otro).exists())
+        self.assertTrue(Notificacion.objects.filter(user__isnull=True, clave__startswith='new-').exists())
+
+        # Re-materializar conserva el estado 'leida' de las alertas vigentes
+        Notificacion.objects.filter(user=self.encargado).update(leida=True)
+        NotificationService.materializar(self.hoy + timedelta(days=1))
+        self.assertFalse(Notificacion.objects.filter(user=self.encargado, leida=False).exists())
+
+    def test_evento_del_dia_no_saltea_la_materializacion(self):
+        NotificationService.registrar([self.encargado.id], 'ins-ok-1', tipo='success', titulo='Inscripción confirmada',
+                                      mensaje='-', link='/')
+        NotificationService.asegurar_materializado()
+        claves = set(Notificacion.objects.filter(user=self.encargado).values_list('clave', flat=True))
+        self.assertIn('ins-ok-1', claves)
+        self.assertIn('arma-warn-%d' % Arma.objects.get().id, claves)
+
+    def test_globales_sin_duplicados_y_materializacion_bloqueada(self):
+        NotificationService.materializar(self.hoy)
+        global_ = Notificacion.objects.filter(user__isnull=True).first()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Notificacion.objects.create(user=None, clave=global_.clave, fecha=self.hoy, titulo='x', mensaje='x')
+
+        # Con el bloqueo tomado por otro request, el GET no materializa
+        cache.clear()
+        Notificacion.objects.all().delete()
+        cache.add(NotificationService._CLAVE_BLOQUEO, 'x')
+        NotificationService.asegurar_materializado()
+        self.assertFalse(Notificacion.objects.exists())
+
+    def test_vista_paginada_con_cursor(self):
+        client = APIClient()
+        client.force_authenticate(self.encargado)
+        respuesta = client.get('/api/auth/notifications/', {'page_size': 2})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(respuesta.data['results']), 2)
+        self.assertIsNotNone(respuesta.data['next'])
+        self.assertEqual(set(respuesta.data['results'][0]), {'id', 'type', 'title', 'message', 'link', 'leida', 'fecha'})
+
+        client.force_authenticate(self.otro)
+        ids = [n['id'] for n in client.get('/api/auth/notifications/').data['results']]
+        self.assertTrue(ids and all(i.startswith('new-') for i in ids))
+
+
+class CanalNotificacionesTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.club = Club.objects.create(name='Club Sur')
+        self.encargado = User.objects.create_user(username='club3', password='x', role=User.Roles.CLUB, club=self.club)
+        deportista = Deportista.objects.create(
+            first_name='Lia', apellido_paterno='Rojas', fecha_nacimiento=date(1995, 1, 1), ci='WSN1', club=self.club
+        )
+        self.competencia = Competencia.objects.create(name='Copa Sur', start_date=date.today())
+        self.inscripcion = Inscripcion.objects.create(competencia=self.competencia, deportista=deportista)
+
+    def _conectar(self, query=''):
+        async def conectar():
+            communicator = WebsocketCommunicator(TokenAuthMiddleware(NotificacionConsumer.as_asgi()), f"/ws/notificaciones/{query}")
+            connected, codigo = await communicator.connect()
+            await communicator.disconnect()
+            return connected, codigo
+        return async_to_sync(conectar)()
+
+    def test_conexion_requiere_jwt(self):
+        self.assertEqual(self._conectar(), (False, 4401))
+        connected, _ = self._conectar(f"?token={AccessToken.for_user(self.encargado)}")
+        self.assertTrue(connected)
+
+    def test_confirmacion_y_resultados_se_publican_al_commit(self):
+        channel_layer = get_channel_layer()
+        canal = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)(f"user_{self.encargado.id}", canal)
+        async_to_sync(channel_layer.group_add)("notificaciones_globales", canal)
+
+        self.inscripcion.estado = 'CONFIRMADA'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.inscripcion.save()
+        mensaje = async_to_sync(channel_layer.receive)(canal)
+        self.assertEqual(mensaje['type'], 'notificacion.nueva')
+        self.assertEqual(mensaje['data']['id'], f'ins-ok-{self.inscripcion.id}')
+        self.assertTrue(Notificacion.objects.filter(user=self.encargado, clave=f'ins-ok-{self.inscripcion.id}').exists())
+
+        # Guardar de nuevo sin cambio de estado no repite el aviso
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.inscripcion.save()
+        self.assertFalse([c for c in callbacks if 'NotificationService' in c.__qualname__])
 
-# Create your tests here.
+        self.competencia.status = 'Finalizada'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.competencia.save()
+        mensaje = async_to_sync(channel_layer.receive)(canal)
+        self.assertEqual(mensaje['data']['id'], f'res-{self.competencia.id}')
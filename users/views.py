@@ -3,6 +3,8 @@ from django.middleware.csrf import get_token
 from django.views.decorators.csrf import ensure_csrf_cookie
 from django.utils.decorators import method_decorator
 from rest_framework.views import APIView
+from rest_framework.generics import ListAPIView
+from rest_framework.pagination import CursorPagination
 from rest_framework.response import Response
 from rest_framework import status, permissions
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
@@ -10,6 +12,9 @@ from rest_framework_simplejwt.serializers import TokenRefreshSerializer
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from django.contrib.auth import authenticate, logout
 
+from .serializers import NotificacionSerializer
+from .services import NotificationService
+
 # --- 1. LOGIN CON COOKIES ---
 class CookieTokenObtainPairView(TokenObtainPairView):
     def post(self, request, *args, **kwargs):
@@ -108,15 +113,25 @@ class UserInfoView(APIView):
             'is_superuser': user.is_superuser,
             'force_password_change': False # Puedes agregar lógica aquí
         })
-# ... (tus imports anteriores)
+class NotificacionCursorPagination(CursorPagination):
+    """Las más recientes primero; el cursor evita COUNT(*) en cada consulta."""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-fecha', '-id')
 
-class UserNotificationsView(APIView):
+class UserNotificationsView(ListAPIView):
+    """
+    Alertas del usuario (propias + globales) leídas de la tabla que
+    NotificationService materializa una vez al día.
+    """
     permission_classes = [permissions.IsAuthenticated]
+    serializer_class = NotificacionSerializer
+    pagination_class = NotificacionCursorPagination
 
-    def get(self, request):
-        # Retornamos una lista vacía para que el frontend esté feliz
-        # En el futuro, aquí puedes conectar un modelo real de Notificaciones
-        return Response([])
+    def get_queryset(self):
+        NotificationService.asegurar_materializado()
+        return NotificationService.notificaciones_de(self.request.user)
     
 @method_decorator(ensure_csrf_cookie, name='dispatch')
 class GetCSRFToken(APIView):